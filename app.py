@@ -1,19 +1,67 @@
-from flask import Flask
+import time
+from flask import Flask, Request, request, g
 from flask_restful import Api
-from routes.ai_routes import InitialGreetingV2, UploadFileStream, ChatWithLlamaStream
-from config.database import DatabaseConnection
+from routes.ai_routes import remember_session, InitialGreetingV2, UploadFileStream, ChatWithLlamaStream, CacheStats, OCRJobStatus, OCRStats, OllamaStats, GenerationStats, WriteBehindStats, FAQAdmin, Metrics
+from services.name_index import NameIndex
+from services.metrics import HTTP_IN_FLIGHT, HTTP_REQUESTS, HTTP_REQUEST_SECONDS
+from services.tracing import TRACE_HEADER, configure_logging, get_trace_id, new_trace_id
+from services.upload_ingest import UploadSpool, max_content_length
 from flask_cors import CORS
 
+
+class UploadRequest(Request):
+    """Request whose uploaded files are streamed into an UploadSpool while the body is parsed"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return UploadSpool.from_env()
+
+
+def instrument(app):
+    """Trace id, in-flight count and duration of every request; streamed responses are timed until their last byte"""
+    @app.before_request
+    def start_trace():
+        new_trace_id(request.headers.get(TRACE_HEADER))
+        g.request_start = time.perf_counter()
+        g.endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        HTTP_IN_FLIGHT.labels(g.endpoint).inc()
+
+    @app.after_request
+    def finish_trace(response):
+        response.headers[TRACE_HEADER] = get_trace_id()
+        endpoint, start, status = g.endpoint, g.request_start, str(response.status_code)
+
+        def done():
+            HTTP_IN_FLIGHT.labels(endpoint).dec()
+            HTTP_REQUESTS.labels(endpoint, status).inc()
+            HTTP_REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - start)
+        response.call_on_close(done)
+        return response
+
+
 def create_app():
+    configure_logging()
     app = Flask(__name__)
-    CORS(app)
+    app.request_class = UploadRequest
+    app.config['MAX_CONTENT_LENGTH'] = max_content_length()
+    CORS(app, expose_headers=["X-Session-Id", TRACE_HEADER])
     api = Api(app)
-    
-    db = DatabaseConnection()
+    instrument(app)
+    app.after_request(remember_session)
+
+    # the database engine, the Ollama clients and the OCR libraries are all created on first use
+    NameIndex.get()
 
     api.add_resource(InitialGreetingV2, "/initial-greeting")
     api.add_resource(UploadFileStream, "/upload-file-stream")
     api.add_resource(ChatWithLlamaStream, "/chat-stream")
+    api.add_resource(CacheStats, "/cache-stats")
+    api.add_resource(OCRJobStatus, "/ocr-jobs/<string:job_id>")
+    api.add_resource(OCRStats, "/ocr-stats")
+    api.add_resource(OllamaStats, "/ollama-stats")
+    api.add_resource(GenerationStats, "/generation-stats")
+    api.add_resource(WriteBehindStats, "/write-behind-stats")
+    api.add_resource(FAQAdmin, "/admin/faq")
+    api.add_resource(Metrics, "/metrics")
 
     return app
 
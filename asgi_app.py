@@ -0,0 +1,265 @@
+"""
+Async serving mode. Same routes and JSON/SSE contracts as app.py, but LLM calls go
+through ollama.AsyncClient and OCR/PDF/DB work runs in executors, so one worker
+can hold many sessions open while the model generates.
+
+    hypercorn --config hypercorn.toml asgi_app:app
+"""
+import asyncio
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from quart import Quart, Request, request, Response
+
+from services.async_ai_service import AsyncOllama
+from services.name_index import NameIndex
+from services.ocr_pool import OCRQueueFull, OCRTimeout
+from services.ollama_manager import OllamaClient
+from services.sse import astream_events, SSE_HEADERS
+from services.metrics import REGISTRY, HTTP_IN_FLIGHT, HTTP_REQUESTS, HTTP_REQUEST_SECONDS
+from services.tracing import TRACE_HEADER, configure_logging, in_context, new_trace_id
+from routes.ai_routes import SESSION_COOKIE, SESSION_HEADER, UploadFileStream
+from services.upload_ingest import UploadSpool, max_content_length, upload_kind, discard_upload
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
+
+# Waiting on the OCR pool and DB calls block, none of them may run on the loop
+BLOCKING_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("ASGI_BLOCKING_THREADS", (os.cpu_count() or 1) * 4)),
+    thread_name_prefix="blocking"
+)
+
+
+async def run_blocking(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(BLOCKING_EXECUTOR, in_context(fn), *args)
+
+
+async def get_session_id(data=None):
+    session_id = request.headers.get(SESSION_HEADER)
+    if not session_id and request.mimetype == 'multipart/form-data':
+        session_id = (await request.form).get('session_id')
+    if not session_id and data:
+        session_id = data.get('session_id')
+    return session_id or request.cookies.get(SESSION_COOKIE) or uuid.uuid4().hex
+
+
+def sse_response(events, session_id):
+    return Response(events, mimetype='text/event-stream', headers={**SSE_HEADERS, SESSION_HEADER: session_id})
+
+
+class UploadRequest(Request):
+    """Request whose uploaded files are streamed into an UploadSpool while the body is parsed"""
+
+    def make_form_data_parser(self):
+        return self.form_data_parser_class(
+            max_content_length=self.max_content_length,
+            max_form_memory_size=self.max_form_memory_size,
+            max_form_parts=self.max_form_parts,
+            cls=self.parameter_storage_class,
+            stream_factory=UploadSpool.from_env,
+        )
+
+
+class TracingMiddleware:
+    """
+    Trace id, in-flight count and duration of every HTTP request, timed until the
+    last body chunk so streamed responses are measured whole. Requests are labelled
+    with the rule of the route they match, like app.py does, so ids in the path do
+    not each make a new series.
+    """
+
+    def __init__(self, app, url_map):
+        self.app = app
+        self.url_map = url_map
+
+    def endpoint(self, scope):
+        try:
+            rule, _ = self.url_map.bind("").match(scope['path'], scope['method'], return_rule=True)
+        except HTTPException:
+            return "unmatched"
+        return rule.rule
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get('headers') or [])
+        trace_id = new_trace_id(headers.get(TRACE_HEADER.lower().encode(), b"").decode() or None)
+        endpoint = self.endpoint(scope)
+        start = time.perf_counter()
+        status = "500"
+        HTTP_IN_FLIGHT.labels(endpoint).inc()
+
+        async def traced_send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = str(message['status'])
+                message = {**message, 'headers': list(message.get('headers', [])) + [(TRACE_HEADER.encode(), trace_id.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, traced_send)
+        finally:
+            HTTP_IN_FLIGHT.labels(endpoint).dec()
+            HTTP_REQUESTS.labels(endpoint, status).inc()
+            HTTP_REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - start)
+
+
+def create_app():
+    configure_logging()
+    app = Quart(__name__)
+    app.request_class = UploadRequest
+    app.config['MAX_CONTENT_LENGTH'] = max_content_length()
+    app.asgi_app = TracingMiddleware(app.asgi_app, app.url_map)
+
+    @app.before_serving
+    async def preload():
+        await run_blocking(NameIndex.get)
+        if os.environ.get("OLLAMA_WARMUP", "1") != "0":
+            client = OllamaClient()
+            await run_blocking(client.warmup, AsyncOllama.MODEL)
+            client.start_keep_alive(AsyncOllama.MODEL)
+
+    @app.after_request
+    async def cors(response):
+        response.headers['Access-Control-Allow-Origin'] = '*'
+        response.headers['Access-Control-Allow-Headers'] = f'Content-Type, {SESSION_HEADER}'
+        response.headers['Access-Control-Expose-Headers'] = f'{SESSION_HEADER}, {TRACE_HEADER}'
+        return response
+
+    @app.after_request
+    async def remember_session(response):
+        session_id = response.headers.get(SESSION_HEADER)
+        if session_id and request.cookies.get(SESSION_COOKIE) != session_id:
+            response.set_cookie(SESSION_COOKIE, session_id, max_age=int(os.environ.get("SESSION_TTL", 1800)),
+                                httponly=True, samesite='Lax')
+        return response
+
+    @app.get("/metrics")
+    async def metrics():
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+    @app.post("/initial-greeting")
+    async def initial_greeting():
+        try:
+            data = await request.get_json()
+            stream_mode = data.get('stream', False)
+            session_id = await get_session_id(data)
+
+            ollama_agent = AsyncOllama()
+
+            if stream_mode:
+                return sse_response(astream_events(ollama_agent.initial_greeting_stream()), session_id)
+
+            greeting = await ollama_agent.initial_greeting()
+            return {
+                'message': 'Greeting generated successfully',
+                'data': {
+                    'greeting': greeting,
+                    'session_id': session_id
+                }
+            }, 201, {SESSION_HEADER: session_id}
+
+        except Exception as e:
+            return {'error': str(e)}, 500
+
+    @app.post("/upload-file-stream")
+    async def upload_file_stream():
+        try:
+            files = await request.files
+            if 'file' not in files:
+                return {'error': 'No file uploaded'}, 400
+
+            file = files['file']
+            if file.filename == '':
+                return {'error': 'No selected file'}, 400
+
+            if upload_kind(file) is None:
+                discard_upload(file)
+                return {'error': 'Invalid file type. Only PDF and JPG are allowed'}, 400
+
+            form = await request.form
+            session_id = await get_session_id()
+            stream_mode = form.get('stream', '').lower() in ('1', 'true')
+            llama_agent = AsyncOllama()
+
+            try:
+                kind, result, client_name = await run_blocking(UploadFileStream.process_document, file, session_id)
+            finally:
+                discard_upload(file)
+
+            status_generator = llama_agent.generate_file_status_message_stream(
+                client_name, session_id=session_id, use_llm=UploadFileStream.llm_status_requested(form)
+            )
+
+            if stream_mode:
+                async def events():
+                    yield {'extracted_names': result, 'session_id': session_id}
+                    async for chunk in status_generator:
+                        yield chunk
+                    yield {'done': True}
+
+                return sse_response(astream_events(events()), session_id)
+
+            status_message = "".join([chunk async for chunk in status_generator])
+            return {
+                'message': f'{kind} file uploaded successfully',
+                'data': {
+                    'extracted_names': result,
+                    'status': status_message,
+                    'session_id': session_id
+                }
+            }, 200, {SESSION_HEADER: session_id}
+
+        except RequestEntityTooLarge as e:
+            return {'error': e.description}, 413
+        except OCRQueueFull:
+            return {'error': 'Too many documents are being processed, please retry shortly'}, 503, {'Retry-After': '5'}
+        except OCRTimeout as e:
+            return {'error': str(e)}, 504
+        except Exception as e:
+            app.logger.error(f"Error generating response: {str(e)}")
+            return {'error': f'Failed to generate response: {str(e)}'}, 500
+
+    @app.post("/chat-stream")
+    async def chat_stream():
+        try:
+            data = await request.get_json()
+            if not data or 'message' not in data:
+                return {'error': 'Message is required'}, 400
+
+            message = data.get('message')
+            session_id = await get_session_id(data)
+            stream_mode = data.get('stream', False)
+
+            ollama = AsyncOllama()
+            response_generator = ollama.get_response_stream(message, session_id=session_id, faq=True)
+
+            if stream_mode:
+                async def events():
+                    async for chunk in response_generator:
+                        yield chunk
+                    yield {'done': True, 'session_id': session_id}
+
+                return sse_response(astream_events(events()), session_id)
+
+            response = "".join([chunk async for chunk in response_generator])
+
+            return {
+                'message': 'Response generated successfully',
+                'data': {
+                    'response': response,
+                    'status_update': None,
+                    'session_id': session_id
+                }
+            }, 200, {SESSION_HEADER: session_id}
+
+        except Exception as e:
+            app.logger.error(f"Error in ChatWithLlamaStream: {str(e)}")
+            return {'error': f'Failed to generate response: {str(e)}'}, 500
+
+    return app
+
+
+app = create_app()
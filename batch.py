@@ -0,0 +1,41 @@
+"""
+Processes a backlog of INE photos and bank statements without going through the API:
+
+    python batch.py /data/backlog --output results.jsonl
+    python batch.py manifest.jsonl --output results.jsonl --workers 8
+
+A directory holds one subdirectory per client (its INE and statements); a manifest
+lists one file per line, as a path or {"path": ..., "session_id": ..., "full_name": ...}.
+Results are appended to --output as JSON lines. Running the same command again after
+an interruption resumes where it stopped, and tries again the files that ended in an
+error; --restart starts over.
+"""
+import argparse
+import json
+import logging
+import os
+
+from services.batch_processor import BatchProcessor, discover
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', help="directory of documents or manifest file")
+    parser.add_argument('--output', required=True, help="JSONL results, also the checkpoint of the run")
+    parser.add_argument('--workers', type=int, help="worker processes, defaults to the available cores")
+    parser.add_argument('--chunk-size', type=int, default=8, help="clients per work unit")
+    parser.add_argument('--db-batch', type=int, default=500, help="records per database write")
+    parser.add_argument('--no-db', action='store_true', help="only write the JSONL results")
+    parser.add_argument('--preset', help="ImagePreprocessor preset, defaults to OCR_PREPROCESS")
+    parser.add_argument('--restart', action='store_true', help="ignore the results of a previous run")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(message)s")
+    processor = BatchProcessor(args.output, workers=args.workers, chunk_size=args.chunk_size,
+                               db_batch=args.db_batch, write_db=not args.no_db, preset=args.preset)
+    summary = processor.run(discover(args.source), resume=not args.restart)
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
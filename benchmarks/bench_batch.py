@@ -0,0 +1,81 @@
+"""
+Throughput of the offline batch command (services/batch_processor.py) on a generated
+backlog, for several worker counts: files/s and the speedup over one worker. Each
+client folder holds a statement, and an INE photo with --ine (needs the tesseract
+binary); without one, the manifest gives the name to look for. A second run over the
+same output checks that a finished backlog is skipped as already done.
+
+    python benchmarks/bench_batch.py --clients 64 --pages 10 --workers 1 2 4
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fixtures import jpeg_bytes, make_id_image, make_statement_pdf, random_person  # noqa: E402
+
+
+def write_backlog(folder, clients, pages, ine):
+    """One folder per client, and the manifest that names them"""
+    rng = random.Random(22)
+    manifest = folder / 'manifest.jsonl'
+    with open(manifest, 'w', encoding='utf-8') as f:
+        for client in range(clients):
+            person = random_person(rng)
+            client_folder = folder / f"client-{client:05d}"
+            client_folder.mkdir()
+            statement = client_folder / 'estado_de_cuenta.pdf'
+            statement.write_bytes(make_statement_pdf(person, pages=pages, seed=client)[0])
+            entry = {'path': str(statement), 'session_id': f"batch:client-{client:05d}"}
+            if ine:
+                photo = client_folder / 'ine.jpg'
+                photo.write_bytes(jpeg_bytes(make_id_image(person, width=1200, seed=client)))
+                f.write(json.dumps({**entry, 'path': str(photo)}) + '\n')
+            else:
+                entry['full_name'] = f"{person['first_names']} {person['last_names']}"
+            f.write(json.dumps(entry) + '\n')
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--ine', action='store_true')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--chunk-size', type=int, default=4)
+    args = parser.parse_args()
+
+    folder = Path(tempfile.mkdtemp())
+    os.environ.update({
+        'DB_BACKEND': 'sqlite',
+        'DB_URL': f"sqlite:///{folder / 'bench.db'}",
+        'LOG_LEVEL': 'WARNING',
+    })
+    from services.batch_processor import BatchProcessor, discover
+
+    documents = discover(write_backlog(folder, args.clients, args.pages, args.ine))
+    print(f"{len(documents)} files of {args.clients} clients, {args.pages} statement pages, "
+          f"{os.cpu_count()} cores")
+
+    baseline = None
+    for workers in args.workers:
+        output = folder / f"results-{workers}.jsonl"
+        summary = BatchProcessor(output, workers=workers, chunk_size=args.chunk_size).run(documents)
+        baseline = baseline or summary['files_per_second']
+        found = sum(1 for line in open(output, encoding='utf-8') if json.loads(line).get('result') not in (None, 'estimado'))
+        print(f"{workers:3d} workers  {summary['files_per_second']:7.1f} files/s  "
+              f"speedup {summary['files_per_second'] / baseline:4.2f}x  "
+              f"{summary['errors']} errors  {found}/{len(documents)} names found")
+
+    rerun = BatchProcessor(output, workers=args.workers[-1]).run(documents)
+    print(f"rerun over the same output: {rerun['files']} processed, {rerun['skipped']} skipped")
+
+
+if __name__ == '__main__':
+    main()
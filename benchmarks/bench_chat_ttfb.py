@@ -0,0 +1,77 @@
+"""
+Measures time-to-first-byte and total time of /chat-stream with the joined JSON
+reply (the old behaviour) and with the text/event-stream mode, against a local
+fake Ollama server.
+
+    python benchmarks/bench_chat_ttfb.py --requests 20 --token-delay 0.02
+"""
+import argparse
+import http.client
+import json
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_ollama import FakeOllama  # noqa: E402
+
+
+def start_app():
+    import logging
+    from werkzeug.serving import make_server
+    from app import app
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def timed_request(port, path, payload):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    start = time.perf_counter()
+    conn.request('POST', path, body=json.dumps(payload), headers={'Content-Type': 'application/json'})
+    response = conn.getresponse()
+    if response.getheader('Content-Type', '').startswith('text/event-stream'):
+        # skip heartbeats, the first byte that matters is the first data event
+        while not response.readline().startswith(b'data:'):
+            pass
+    else:
+        response.read(1)
+    ttfb = time.perf_counter() - start
+    response.read()
+    total = time.perf_counter() - start
+    conn.close()
+    return ttfb, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--token-delay', type=float, default=0.02)
+    args = parser.parse_args()
+
+    fake = FakeOllama(token_delay=args.token_delay).start()
+    from services.ollama_manager import OllamaClient
+    OllamaClient(host=fake.url)
+    server = start_app()
+
+    for label, stream in (("joined JSON (before)", False), ("SSE stream (after)", True)):
+        ttfbs, totals = [], []
+        for _ in range(args.requests):
+            ttfb, total = timed_request(server.port, '/chat-stream', {'message': 'Hola', 'stream': stream})
+            ttfbs.append(ttfb)
+            totals.append(total)
+        print(f"{label:22s} TTFB p50 {statistics.median(ttfbs) * 1000:7.1f} ms   "
+              f"total p50 {statistics.median(totals) * 1000:7.1f} ms")
+
+    server.shutdown()
+    fake.stop()
+
+
+if __name__ == '__main__':
+    main()
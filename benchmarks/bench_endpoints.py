@@ -0,0 +1,367 @@
+"""
+Benchmark suite for /initial-greeting, /upload-file-stream and /chat-stream.
+
+Replays a recorded request mix (a JSONL file, one request per line) against the
+Flask or the ASGI app. The app runs in its own process with a fake Ollama
+(fake_ollama.py, also in its own process), a throwaway SQLite database and the
+synthetic INE photos and statements of fixtures.py as uploads. Requests of a
+session are sent in order, at their recorded offsets (scaled by --speed);
+sessions run concurrently.
+
+Reports throughput, p50/p95/p99 latency per endpoint and mode, time to first
+byte of the SSE responses and the per-stage breakdown (ocr, pdf, db, llm) read
+from /metrics before and after the replay.
+
+    python benchmarks/bench_endpoints.py --generate 30 --output benchmarks/workloads/sessions.jsonl
+    python benchmarks/bench_endpoints.py --app flask --workload benchmarks/workloads/sessions.jsonl
+    python benchmarks/bench_endpoints.py --app asgi --save-baseline /tmp/baseline.json
+    python benchmarks/bench_endpoints.py --app asgi --baseline /tmp/baseline.json --tolerance 0.2
+
+A workload line looks like
+    {"t": 1.25, "session": 3, "endpoint": "/upload-file-stream", "document": "statement", "stream": true}
+with "message" instead of "document" for /chat-stream. With --baseline the run
+exits with status 1 when a latency percentile or the throughput is worse than
+the stored one by more than --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx  # noqa: E402
+from fixtures import jpeg_bytes, make_id_image, make_statement_pdf, random_person  # noqa: E402
+
+DEFAULT_WORKLOAD = Path(__file__).parent / 'workloads' / 'sessions.jsonl'
+STAGE_LINE = re.compile(r'^llm_assistant_stage_duration_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)$')
+
+QUESTIONS = [
+    "¿Qué documentos necesito para solicitar el crédito?",
+    "¿Cuánto tarda la revisión de mi solicitud?",
+    "¿Mi estado de cuenta puede ser de cualquier banco?",
+    "¿Es seguro subir mi INE?",
+    "¿Qué pasa después de subir mis documentos?",
+    "Mi INE está vencida, ¿la puedo usar?",
+]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"nothing listening on port {port} after {timeout}s")
+
+
+def generate_workload(sessions, rate, seed):
+    """
+    A mix like the one the web client produces: a greeting, a question or two,
+    the INE, the statement and a follow-up question per session, sessions
+    arriving as a Poisson process of `rate` per second
+    """
+    rng = random.Random(seed)
+    requests, start = [], 0.0
+    for session in range(sessions):
+        start += rng.expovariate(rate)
+        t = start
+        steps = [{'endpoint': '/initial-greeting'}]
+        steps += [{'endpoint': '/chat-stream', 'message': rng.choice(QUESTIONS)} for _ in range(rng.randint(1, 2))]
+        steps += [{'endpoint': '/upload-file-stream', 'document': 'ine'},
+                  {'endpoint': '/upload-file-stream', 'document': 'statement'},
+                  {'endpoint': '/chat-stream', 'message': rng.choice(QUESTIONS)}]
+        for step in steps:
+            requests.append({'t': round(t, 3), 'session': session, 'stream': rng.random() < 0.7, **step})
+            t += rng.uniform(0.5, 3.0)
+    return sorted(requests, key=lambda request: request['t'])
+
+
+def load_workload(path, skip_ine):
+    with open(path, encoding='utf-8') as f:
+        requests = [json.loads(line) for line in f if line.strip()]
+    if skip_ine:
+        requests = [request for request in requests if request.get('document') != 'ine']
+    return requests
+
+
+def make_documents(requests, pages):
+    """INE photo and statement of one synthetic person per session"""
+    documents = {}
+    for session in sorted({request['session'] for request in requests}):
+        person = random_person(random.Random(f"bench-endpoints-{session}"))
+        documents[session] = {
+            'ine': ('ine.jpg', jpeg_bytes(make_id_image(person, width=1200, seed=session)), 'image/jpeg'),
+            'statement': ('estado_de_cuenta.pdf', make_statement_pdf(person, pages=pages, seed=session)[0],
+                          'application/pdf'),
+        }
+    return documents
+
+
+def serve(args):
+    """Runs in the app process: throwaway database and caches, then the Flask or ASGI app"""
+    os.environ.update({
+        'DB_BACKEND': 'sqlite',
+        'DB_URL': f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}",
+        'EXTRACTION_CACHE_DIR': tempfile.mkdtemp(),
+        'OLLAMA_HOSTS': args.ollama_url,
+        'LOG_LEVEL': 'WARNING',
+    })
+    import logging
+    from models.id_record import IDRecord
+    from services.ocr_pool import OCRWorkerPool
+
+    # a statement is matched against its session's ID record, so every session gets one up front
+    # (with --skip-ine there is no INE upload to create it)
+    sessions = {request['session'] for request in load_workload(args.workload, skip_ine=False)}
+    IDRecord.save_many([
+        IDRecord(f"{person['first_names']} {person['last_names']}", " ".join(person['address']),
+                 session_id=f"bench-{session}")
+        for session, person in ((session, random_person(random.Random(f"bench-endpoints-{session}")))
+                                for session in sorted(sessions))
+    ])
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        if args.app == 'flask':
+            from werkzeug.serving import make_server
+            from app import create_app
+            make_server('127.0.0.1', args.port, create_app(), threaded=True).serve_forever()
+        else:
+            from hypercorn.asyncio import serve as hypercorn_serve
+            from hypercorn.config import Config
+            from asgi_app import app
+            config = Config()
+            config.bind = [f"127.0.0.1:{args.port}"]
+            config.backlog = 4096
+            config.accesslog = None
+            config.loglevel = 'WARNING'
+            asyncio.run(hypercorn_serve(app, config))
+    finally:
+        OCRWorkerPool.get_instance().shutdown()
+
+
+def stage_totals(metrics_text):
+    totals = {}
+    for line in metrics_text.splitlines():
+        match = STAGE_LINE.match(line)
+        if match:
+            kind, stage, value = match.groups()
+            totals.setdefault(stage, {'sum': 0.0, 'count': 0.0})[kind] = float(value)
+    return totals
+
+
+async def send(client, request, documents):
+    """One request of the workload; returns (key, status, latency, ttfb) with ttfb None for JSON responses"""
+    endpoint, stream = request['endpoint'], request.get('stream', False)
+    headers = {'X-Session-Id': f"bench-{request['session']}"}
+    if endpoint == '/upload-file-stream':
+        document = request['document']
+        key = f"{endpoint} {document}"
+        kwargs = {'files': {'file': documents[request['session']][document]},
+                  'data': {'stream': 'true' if stream else 'false'}}
+    elif endpoint == '/chat-stream':
+        key = endpoint
+        kwargs = {'json': {'message': request['message'], 'stream': stream}}
+    else:
+        key = endpoint
+        kwargs = {'json': {'stream': stream}}
+    key += " sse" if stream else " json"
+
+    start = time.perf_counter()
+    ttfb = None
+    async with client.stream('POST', endpoint, headers=headers, **kwargs) as response:
+        async for _ in response.aiter_raw():
+            if ttfb is None:
+                ttfb = time.perf_counter() - start
+        status = response.status_code
+    return key, status, time.perf_counter() - start, ttfb if stream else None
+
+
+async def replay(base_url, requests, documents, speed, concurrency):
+    """Every session replays its requests in order, at their recorded offsets divided by speed"""
+    sessions = {}
+    for request in requests:
+        sessions.setdefault(request['session'], []).append(request)
+    results = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=600) as client:
+        start = time.perf_counter()
+
+        async def run_session(session_requests):
+            for request in session_requests:
+                delay = start + request['t'] / speed - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                try:
+                    results.append(await send(client, request, documents))
+                except httpx.HTTPError as e:
+                    results.append((request['endpoint'] + " error", type(e).__name__, 0.0, None))
+
+        await asyncio.gather(*(run_session(session_requests) for session_requests in sessions.values()))
+        wall = time.perf_counter() - start
+
+        metrics = (await client.get('/metrics')).text
+    return results, wall, metrics
+
+
+def summarize(results, wall, stages_before, stages_after):
+    summary = {'requests': len(results), 'wall_seconds': wall,
+               'throughput': len(results) / wall, 'endpoints': {}, 'stages': {}}
+    for key in sorted({result[0] for result in results}):
+        rows = [result for result in results if result[0] == key]
+        ok = [latency for _, status, latency, _ in rows if isinstance(status, int) and status < 400]
+        ttfbs = [ttfb for _, status, _, ttfb in rows if ttfb is not None]
+        entry = {'n': len(rows), 'errors': len(rows) - len(ok),
+                 'statuses': {str(status): sum(1 for row in rows if row[1] == status) for status in {row[1] for row in rows}}}
+        if ok:
+            entry.update(p50=percentile(ok, 50), p95=percentile(ok, 95), p99=percentile(ok, 99))
+        if ttfbs:
+            entry.update(ttfb_p50=percentile(ttfbs, 50), ttfb_p95=percentile(ttfbs, 95))
+        summary['endpoints'][key] = entry
+
+    for stage, after in stages_after.items():
+        before = stages_before.get(stage, {'sum': 0.0, 'count': 0.0})
+        count, total = after['count'] - before['count'], after['sum'] - before['sum']
+        if count:
+            summary['stages'][stage] = {'count': int(count), 'seconds': total, 'mean': total / count}
+    return summary
+
+
+def report(summary):
+    print(f"{summary['requests']} requests in {summary['wall_seconds']:.2f}s, "
+          f"throughput {summary['throughput']:.2f} req/s")
+    print(f"{'endpoint':<38}{'n':>5}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'ttfb p50':>10}{'ttfb p95':>10}")
+    for key, entry in summary['endpoints'].items():
+        cells = [f"{entry[name] * 1000:10.1f}" if name in entry else f"{'-':>10}"
+                 for name in ('p50', 'p95', 'p99', 'ttfb_p50', 'ttfb_p95')]
+        print(f"{key:<38}{entry['n']:>5}{entry['errors']:>5}" + "".join(cells))
+        if entry['errors']:
+            print("   statuses " + ", ".join(f"{status}: {count}" for status, count in sorted(entry['statuses'].items())))
+
+    total = sum(stage['seconds'] for stage in summary['stages'].values()) or 1.0
+    print("stage breakdown (server side)")
+    for name, stage in sorted(summary['stages'].items(), key=lambda item: -item[1]['seconds']):
+        print(f"   {name:<8} n={stage['count']:<6} mean {stage['mean'] * 1000:8.1f} ms   "
+              f"total {stage['seconds']:8.2f}s  ({stage['seconds'] / total:5.1%})")
+
+
+def regressions(summary, baseline, tolerance, floor=0.005):
+    """
+    What got worse than the baseline by more than `tolerance` (a fraction);
+    differences under `floor` seconds are noise
+    """
+    found = []
+    for key, base in baseline['endpoints'].items():
+        current = summary['endpoints'].get(key)
+        if current is None:
+            continue
+        for name in ('p50', 'p95', 'p99', 'ttfb_p50', 'ttfb_p95'):
+            if name in base and name in current and current[name] > base[name] * (1 + tolerance) + floor:
+                found.append(f"{key} {name} {base[name] * 1000:.1f} ms -> {current[name] * 1000:.1f} ms")
+        if current['errors'] > base['errors']:
+            found.append(f"{key} errors {base['errors']} -> {current['errors']}")
+    if summary['throughput'] < baseline['throughput'] * (1 - tolerance):
+        found.append(f"throughput {baseline['throughput']:.2f} -> {summary['throughput']:.2f} req/s")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--app', choices=['flask', 'asgi'], default='flask')
+    parser.add_argument('--workload', default=str(DEFAULT_WORKLOAD))
+    parser.add_argument('--speed', type=float, default=1.0, help="replay this many times faster than recorded")
+    parser.add_argument('--concurrency', type=int, default=200, help="client connection limit")
+    parser.add_argument('--pages', type=int, default=5, help="pages of every synthetic statement")
+    parser.add_argument('--skip-ine', action='store_true', help="drop INE uploads (hosts without tesseract)")
+    parser.add_argument('--token-delay', type=float, default=0.01)
+    parser.add_argument('--prompt-delay', type=float, default=0.0)
+    parser.add_argument('--parallel', type=int, default=4, help="generations the fake model runs at once")
+    parser.add_argument('--generate', type=int, metavar='SESSIONS', help="write a synthetic workload and exit")
+    parser.add_argument('--rate', type=float, default=2.0, help="sessions per second in a generated workload")
+    parser.add_argument('--seed', type=int, default=18)
+    parser.add_argument('--output', default=str(DEFAULT_WORKLOAD))
+    parser.add_argument('--save-baseline')
+    parser.add_argument('--baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--ollama-url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    if args.generate:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            for request in generate_workload(args.generate, args.rate, args.seed):
+                f.write(json.dumps(request, ensure_ascii=False) + "\n")
+        print(f"wrote {args.output}")
+        return
+
+    requests = load_workload(args.workload, args.skip_ine)
+    documents = make_documents(requests, args.pages)
+
+    ollama_port, app_port = free_port(), free_port()
+    fake = subprocess.Popen([sys.executable, str(Path(__file__).parent / 'fake_ollama.py'), '--port', str(ollama_port),
+                             '--token-delay', str(args.token_delay), '--prompt-delay', str(args.prompt_delay),
+                             '--parallel', str(args.parallel)], stdout=subprocess.DEVNULL)
+    server = subprocess.Popen([sys.executable, __file__, '--serve', '--app', args.app, '--port', str(app_port),
+                               '--ollama-url', f"http://127.0.0.1:{ollama_port}", '--workload', args.workload])
+    try:
+        wait_for_port(ollama_port)
+        wait_for_port(app_port)
+        base_url = f"http://127.0.0.1:{app_port}"
+        stages_before = stage_totals(httpx.get(f"{base_url}/metrics").text)
+        results, wall, metrics = asyncio.run(replay(base_url, requests, documents, args.speed, args.concurrency))
+    finally:
+        server.terminate()
+        server.wait()
+        fake.terminate()
+        fake.wait()
+
+    summary = summarize(results, wall, stages_before, stage_totals(metrics))
+    print(f"{args.app} app, {Path(args.workload).name} at {args.speed}x, "
+          f"fake Ollama {args.token_delay * 1000:.0f} ms/token, {args.parallel} parallel")
+    report(summary)
+
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(summary, indent=2))
+        print(f"baseline saved to {args.save_baseline}")
+    if args.baseline:
+        found = regressions(summary, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            sys.exit(1)
+        print(f"no regression against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""
+How many /chat-stream messages the FAQ index (services/faq_index.py) answers without
+the model, on a replayed traffic log.
+
+The log is generated: phrasings of the seeded questions that are not in data/faq.json,
+written the way visitors do (no accents, no question marks, typos, a greeting in front),
+mixed with messages the FAQ does not cover and the model has to answer. For each
+threshold it reports the LLM calls avoided and the wrong answers: a vetted answer to
+another question, or to a message the FAQ does not cover. The log is then replayed
+through the Flask app against a fake Ollama server, with FAQ_CACHE=0 and =1, counting
+the model calls and the reply latency.
+
+--log replays a recorded log instead (JSON lines with a "message", such as
+benchmarks/workloads/sessions.jsonl); without labels only the avoided rate is reported.
+
+    python benchmarks/bench_faq_cache.py --messages 2000 --thresholds 0.5 0.55 0.6 0.65 0.7
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import unicodedata
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_ollama import FakeOllama  # noqa: E402
+
+PHRASINGS = {
+    'monto': [
+        "¿Cuánto dinero me prestan?", "¿Cuánto me darían de crédito?", "¿Cuál es el máximo que me pueden prestar?",
+        "¿De cuánto puede ser mi préstamo?", "Necesito 200 mil pesos, ¿me los prestan?", "¿Qué monto me pueden autorizar?",
+    ],
+    'humano': [
+        "Quiero hablar con una persona de verdad", "¿Me comunicas con un asesor humano?", "Pásame con un ejecutivo",
+        "¿Hay alguien real con quien pueda hablar?", "Prefiero hablar con un humano", "¿Puedo hablar con un agente del banco?",
+    ],
+    'privacidad': [
+        "¿Es seguro mandar mi INE por aquí?", "¿Qué van a hacer con mis datos?", "¿Mis documentos están seguros?",
+        "¿Quién puede ver mi información?", "¿Mi información se mantiene privada?", "¿Tienen aviso de privacidad?",
+    ],
+    'documentos': [
+        "¿Qué documentos ocupo?", "¿Qué requisitos piden?", "¿Qué papeles necesito para aplicar?",
+        "¿Qué tengo que subir para el crédito?", "¿Qué documentos hay que enviar?", "¿Cuáles documentos necesito?",
+    ],
+    'tipo_credito': [
+        "¿Tienen créditos para comprar casa?", "¿Manejan crédito personal?", "¿Qué tipo de créditos dan?",
+        "¿Tienen crédito para auto?", "¿Ofrecen otros créditos?",
+    ],
+    'siguiente_paso': [
+        "¿Qué sigue después de mandar mis documentos?", "¿Cuánto tardan en revisar mi solicitud?",
+        "¿En cuánto tiempo me responden?", "Ya mandé todo, ¿qué sigue?", "¿Cuándo me dicen si me aprobaron?",
+        "¿Cuánto tarda en revisarse mi solicitud?",
+    ],
+    # not in the FAQ, the model answers them
+    None: [
+        "Hola", "Buenas tardes", "Sí, quiero continuar", "Gracias", "Ok", "Ya subí mi INE",
+        "¿Mi estado de cuenta puede ser de cualquier banco?", "Mi INE está vencida, ¿la puedo usar?",
+        "¿Cuál es la tasa de interés?", "¿Cuánto cobran de comisión por apertura?", "¿Qué es el CAT?",
+        "Mi estado de cuenta está en inglés, ¿sirve?", "Tengo una empresa de transporte", "No sé cómo subir el PDF",
+        "¿Puedo subir una foto del estado de cuenta?", "Soy persona física con actividad empresarial",
+        "¿Revisan el buró de crédito?", "¿Aceptan pasaporte en lugar de INE?",
+        # close to a question in every n-gram but the negation
+        "No quiero hablar con un humano", "No necesito un asesor",
+    ],
+}
+GREETINGS = ["hola ", "buenas tardes, ", "oye ", "disculpa, ", "buen día "]
+
+
+def strip_accents(text):
+    return "".join(char for char in unicodedata.normalize("NFKD", text) if not unicodedata.combining(char))
+
+
+def as_typed(text, rng):
+    """A phrasing the way a visitor might type it"""
+    if rng.random() < 0.5:
+        text = strip_accents(text)
+    if rng.random() < 0.5:
+        text = text.lower().replace("¿", "").replace("?", "")
+    if rng.random() < 0.3:
+        text = rng.choice(GREETINGS) + text[0].lower() + text[1:]
+    if rng.random() < 0.3 and len(text) > 8:
+        # one typo: a letter dropped or two swapped
+        i = rng.randrange(1, len(text) - 2)
+        text = text[:i] + text[i + 1:] if rng.random() < 0.5 else text[:i] + text[i + 1] + text[i] + text[i + 2:]
+    return text
+
+
+def generate_log(messages, covered):
+    rng = random.Random(25)
+    intents = [intent for intent in PHRASINGS if intent is not None]
+    log = []
+    for _ in range(messages):
+        intent = rng.choice(intents) if rng.random() < covered else None
+        log.append({'message': as_typed(rng.choice(PHRASINGS[intent]), rng), 'expected': intent})
+    return log
+
+
+def sweep(log, thresholds):
+    from services.faq_index import FAQIndex
+
+    index = FAQIndex.get_instance()
+    start = time.perf_counter()
+    for entry in log:
+        index.best_entry(entry['message'])
+    lookup_us = (time.perf_counter() - start) / len(log) * 1e6
+    labelled = all('expected' in entry for entry in log)
+
+    print(f"{len(log)} messages, {lookup_us:.0f} us per lookup, {len(index.entries())} FAQ entries")
+    print("threshold  LLM calls avoided  wrong answers")
+    for threshold in thresholds:
+        answered = wrong = 0
+        for entry in log:
+            entry_id = index.best_entry(entry['message'], threshold)
+            if entry_id is not None:
+                answered += 1
+                wrong += labelled and entry_id != entry['expected']
+        print(f"{threshold:9.2f}  {answered / len(log):16.1%}  {wrong if labelled else '-':>13}")
+
+
+def replay(log, token_delay):
+    """The log through /chat-stream of the Flask app, with and without the FAQ answers"""
+    import logging
+    from app import create_app
+    from services.ollama_manager import OllamaClient
+
+    logging.getLogger().setLevel(logging.WARNING)
+    fake = FakeOllama(token_delay=token_delay).start()
+    OllamaClient(host=fake.url)
+    client = create_app().test_client()
+    for mode in ('0', '1'):
+        os.environ['FAQ_CACHE'] = mode
+        calls = fake.requests
+        times = []
+        for i, entry in enumerate(log):
+            start = time.perf_counter()
+            response = client.post('/chat-stream', json={'message': entry['message'], 'session_id': f"replay-{mode}-{i % 50}"})
+            times.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise RuntimeError(response.get_json())
+        print(f"FAQ_CACHE={mode}  {fake.requests - calls:5d} model calls for {len(log)} messages   "
+              f"reply p50 {statistics.median(times) * 1000:7.1f} ms   mean {statistics.mean(times) * 1000:7.1f} ms")
+    fake.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--covered', type=float, default=0.7, help="share of generated messages the FAQ covers")
+    parser.add_argument('--log', help="JSON lines with a message field to replay instead")
+    parser.add_argument('--thresholds', type=float, nargs='+', default=[0.5, 0.55, 0.6, 0.65, 0.7])
+    parser.add_argument('--replay', type=int, default=200, help="messages of the log sent through the app, 0 to skip")
+    parser.add_argument('--token-delay', type=float, default=0.01)
+    args = parser.parse_args()
+
+    if args.log:
+        with open(args.log, encoding='utf-8') as f:
+            log = [{'message': entry['message']} for entry in map(json.loads, f) if entry.get('message')]
+    else:
+        log = generate_log(args.messages, args.covered)
+
+    folder = tempfile.mkdtemp()
+    os.environ.update({
+        'DB_BACKEND': 'sqlite',
+        'DB_URL': f"sqlite:///{os.path.join(folder, 'bench.db')}",
+        'WRITE_BEHIND_DIR': os.path.join(folder, 'write_behind'),
+        'LOG_LEVEL': 'WARNING',
+    })
+    sweep(log, args.thresholds)
+    if args.replay:
+        replay(log[:args.replay], args.token_delay)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Replays a traffic spike (free chat, document status updates and greetings all
+arriving at once) against a fake Ollama that runs `--parallel` generations at a
+time, with the GenerationScheduler effectively off (no cap, no coalescing) and on.
+Reports latency per priority class, generations that reached the model and
+busy-message fallbacks.
+
+    python benchmarks/bench_generation_scheduler.py --chat 80 --status 20 --greetings 20
+"""
+import argparse
+import random
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_ollama import FakeOllama  # noqa: E402
+from fixtures import random_person  # noqa: E402
+from services.generation_scheduler import GenerationScheduler  # noqa: E402
+from services.ollama_manager import OllamaClient  # noqa: E402
+from services.prompts import PromptRegistry  # noqa: E402
+from services.response_cache import ResponseCache  # noqa: E402
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def spike(args, rng):
+    """(priority class, zero-argument call returning the streamed reply) for every request"""
+    from services.ai_service import Ollama
+    ollama = Ollama()
+    calls = []
+    for i in range(args.chat):
+        message = f"Pregunta {i}: ¿qué documentos necesito?"
+        calls.append(('chat', lambda m=message: ollama.get_response_stream(m)))
+    for _ in range(args.status):
+        name = random_person(rng)['first_names']
+        system_prompt = PromptRegistry.render(rng.choice(['status_jpg', 'status_both']), client_name=name)
+        calls.append(('status', lambda p=system_prompt: ollama.get_response_stream(
+            PromptRegistry.message('status'), p, cacheable=True, priority='status')))
+    for _ in range(args.greetings):
+        calls.append(('greeting', ollama.initial_greeting_stream))
+    rng.shuffle(calls)
+    return calls
+
+
+def run(args, scheduler, fake):
+    GenerationScheduler._instance = scheduler
+    ResponseCache.get_instance().clear()
+    requests_before = fake.requests
+    results = {name: [] for name in GenerationScheduler.PRIORITIES}
+    fallbacks = 0
+    lock = threading.Lock()
+
+    def one(priority, call):
+        nonlocal fallbacks
+        start = time.perf_counter()
+        reply = "".join(call())
+        elapsed = time.perf_counter() - start
+        with lock:
+            results[priority].append(elapsed)
+            if reply.startswith("En este momento"):
+                fallbacks += 1
+
+    threads = [threading.Thread(target=one, args=call) for call in spike(args, random.Random(7))]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    return results, fake.requests - requests_before, fallbacks, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--chat', type=int, default=80)
+    parser.add_argument('--status', type=int, default=20)
+    parser.add_argument('--greetings', type=int, default=20)
+    parser.add_argument('--parallel', type=int, default=4, help="generations the fake model runs at once")
+    parser.add_argument('--token-delay', type=float, default=0.01)
+    parser.add_argument('--max-concurrent', type=int, default=4)
+    parser.add_argument('--queue-timeout', type=float, default=30.0)
+    args = parser.parse_args()
+
+    fake = FakeOllama(token_delay=args.token_delay, parallel=args.parallel).start()
+    pool = OllamaClient(host=fake.url).pool
+    pool.max_concurrency = 0
+    for backend in pool.backends:
+        backend.max_concurrency = 0
+
+    configs = [
+        ("no scheduler", GenerationScheduler(max_concurrent=10 ** 6, queue_timeout=600, coalesce=False)),
+        ("scheduler", GenerationScheduler(max_concurrent=args.max_concurrent, queue_timeout=args.queue_timeout)),
+        ("scheduler, 2s timeout", GenerationScheduler(max_concurrent=args.max_concurrent, queue_timeout=2.0)),
+    ]
+    for name, scheduler in configs:
+        results, generations, fallbacks, wall = run(args, scheduler, fake)
+        print(f"{name}: {generations} generations, {fallbacks} busy fallbacks, wall {wall:.2f}s")
+        for priority, latencies in results.items():
+            print(f"   {priority:<9} n={len(latencies):<4} p50 {statistics.median(latencies) * 1000:8.1f} ms"
+                  f"   p95 {percentile(latencies, 95) * 1000:8.1f} ms")
+        waits = scheduler.stats()['wait_seconds']
+        print("   queue wait " + "  ".join(
+            f"{priority} mean {w['sum'] / w['count'] * 1000:.0f} ms" for priority, w in waits.items() if w['count']))
+
+    fake.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Cost of the instrumentation on the request path: one histogram observation,
+one counter increment, a stage_timer block, a full GenerationMetrics lifecycle
+and a /metrics render, each timed over many iterations from several threads.
+
+    python benchmarks/bench_metrics_overhead.py --iterations 200000 --threads 4
+"""
+import argparse
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.metrics import REGISTRY, STAGE_SECONDS, HTTP_REQUESTS, GenerationMetrics, stage_timer  # noqa: E402
+
+DONE_CHUNK = {'done': True, 'eval_count': 40, 'eval_duration': 800_000_000}
+
+
+def observe():
+    STAGE_SECONDS.labels("bench").observe(0.012)
+
+
+def count():
+    HTTP_REQUESTS.labels("/bench", "200").inc()
+
+
+def timed_block():
+    with stage_timer("bench"):
+        pass
+
+
+def generation():
+    metrics = GenerationMetrics()
+    metrics.chunk({'message': {'content': 'hola'}})
+    metrics.chunk(DONE_CHUNK)
+    metrics.finish()
+
+
+def measure(fn, iterations, threads):
+    per_thread = iterations // threads
+
+    def loop():
+        for _ in range(per_thread):
+            fn()
+
+    workers = [threading.Thread(target=loop) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - start) / (per_thread * threads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=200000)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    for name, fn in (("histogram observe", observe), ("counter inc", count),
+                     ("stage_timer block", timed_block), ("generation metrics", generation)):
+        print(f"{name:<20} {measure(fn, args.iterations, args.threads) * 1e6:6.2f} µs/op")
+
+    start = time.perf_counter()
+    for _ in range(100):
+        REGISTRY.render()
+    print(f"{'/metrics render':<20} {(time.perf_counter() - start) / 100 * 1e3:6.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Compares the old name lookup in OCRTextProcessor.extractIDData (re-reading the
+name files and scanning lists on every upload) with the shared NameIndex.
+
+    python benchmarks/bench_name_index.py --lines 2000
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from services.name_index import NameIndex  # noqa: E402
+
+NOISE_WORDS = ["INSTITUTO", "NACIONAL", "ELECTORAL", "CREDENCIAL", "PARA", "VOTAR", "NOMBRE", "SEXO", "H", "M"]
+OCR_SWAPS = {"I": "l", "O": "0", "S": "5", "B": "8"}
+
+
+def load_names_from_file(filename):
+    with open(ROOT / 'data' / filename, 'r', encoding='utf-8') as f:
+        return [line.strip().upper() for line in f if line.strip()]
+
+
+def corrupt(word, rng):
+    positions = [i for i, c in enumerate(word) if c in OCR_SWAPS]
+    if not positions:
+        return word
+    i = rng.choice(positions)
+    return word[:i] + OCR_SWAPS[word[i]] + word[i + 1:]
+
+
+def synthetic_lines(count, noise_rate, seed=7):
+    rng = random.Random(seed)
+    firsts = load_names_from_file('firsts.txt')
+    lasts = load_names_from_file('lasts.txt')
+    lines = []
+    for _ in range(count):
+        words = rng.sample(NOISE_WORDS, 4) + [rng.choice(lasts), rng.choice(lasts), rng.choice(firsts)]
+        words = [corrupt(w, rng) if rng.random() < noise_rate else w for w in words]
+        lines.append(" ".join(words))
+    return lines
+
+
+def old_path(lines):
+    matched = 0
+    for line in lines:
+        first_names = load_names_from_file('firsts.txt')
+        last_names = load_names_from_file('lasts.txt')
+        words = line.split()
+        matched += len([w for w in words if w in first_names]) + len([w for w in words if w in last_names])
+    return matched
+
+
+def new_path(lines):
+    matched = 0
+    for line in lines:
+        names = NameIndex.get()
+        words = line.split()
+        matched += sum(1 for w in words if names.classify(w))
+    return matched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--lines', type=int, default=2000)
+    parser.add_argument('--noise', type=float, default=0.2, help="fraction of words with an OCR swap")
+    args = parser.parse_args()
+
+    lines = synthetic_lines(args.lines, args.noise)
+    NameIndex.get()
+
+    for label, fn in (("old (files + lists)", old_path), ("new (NameIndex)", new_path)):
+        start = time.perf_counter()
+        matched = fn(lines)
+        elapsed = time.perf_counter() - start
+        print(f"{label:22s} {elapsed * 1e6 / len(lines):9.1f} us/line  {matched} words matched")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Per-image OCR latency and throughput of the OCR backends on synthetic INE photos:
+pytesseract (a tesseract process per image) against tesserocr (an engine kept
+loaded per thread). Latency is measured one image at a time, the first image
+separately since that is when tesserocr loads the language data; throughput
+with --threads threads sharing the backend, as the worker threads of one
+process would. Needs the tesseract binary, and tesserocr for the second backend.
+
+    python benchmarks/bench_ocr_backend.py --images 20 --threads 4
+"""
+import argparse
+import shutil
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fixtures import write_id_images  # noqa: E402
+from services.localOCRService import OCR_BACKENDS, get_ocr_backend, ocr_id_image  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=20)
+    parser.add_argument('--folder', default='/tmp/ine_fixtures')
+    parser.add_argument('--width', type=int, default=3000, help="pixel width of the simulated phone photo")
+    parser.add_argument('--preset', default='downscale')
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--backends', nargs='+', choices=list(OCR_BACKENDS), default=list(OCR_BACKENDS))
+    args = parser.parse_args()
+
+    if shutil.which('tesseract') is None:
+        sys.exit("the tesseract binary is not installed")
+
+    fixtures = write_id_images(args.folder, args.images, width=args.width)
+    images = [path.read_bytes() for path, _ in fixtures]
+    print(f"{len(fixtures)} images of {args.width}px, preset {args.preset}")
+
+    for name in args.backends:
+        if get_ocr_backend(name).name != name:
+            print(f"{name:<12} not available")
+            continue
+
+        latencies, first_ok = [], 0
+        for image, (_, person) in zip(images, fixtures):
+            start = time.perf_counter()
+            result = ocr_id_image(image, preset=args.preset, backend=name) or {}
+            latencies.append(time.perf_counter() - start)
+            first_ok += result.get('first_names') == person['first_names']
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            list(pool.map(lambda image: ocr_id_image(image, preset=args.preset, backend=name), images))
+        throughput = len(images) / (time.perf_counter() - start)
+
+        print(f"{name:<12} first image {latencies[0] * 1000:7.1f} ms   "
+              f"then p50 {statistics.median(latencies[1:] or latencies) * 1000:7.1f} ms   "
+              f"max {max(latencies[1:] or latencies) * 1000:7.1f} ms   "
+              f"{throughput:5.1f} images/s on {args.threads} threads   "
+              f"first names {first_ok / len(fixtures):6.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Compares the old whole-document name search of extract_name_from_EdoCta with the
+page-streaming search_name_in_pdf that replaced it, on generated 50-200 page
+statements. The upload now reads the statement with parse_statement, which streams
+the pages the same way; the name-only search is kept here as its reference.
+
+    python benchmarks/bench_pdf_search.py --pages 50 100 200
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pdfplumber  # noqa: E402
+from fixtures import make_statement_pdf, random_person  # noqa: E402
+from services.localOCRService import compile_name_patterns, open_source  # noqa: E402
+
+
+def search_name_in_pdf(pdf_source, full_name, max_pages=None, header_ratio=None):
+    """
+    The statement check the upload ran before parse_statement took its place.
+    Returns full_name if it is found in the PDF (a path or its bytes), "estimado" otherwise.
+    Pages are extracted one at a time and the search stops at the first page that matches.
+    max_pages and header_ratio (fraction of the page height, from the top) limit how much is
+    extracted, defaulting to PDF_MAX_PAGES / PDF_HEADER_RATIO.
+    """
+    if max_pages is None and os.environ.get("PDF_MAX_PAGES"):
+        max_pages = int(os.environ["PDF_MAX_PAGES"])
+    if header_ratio is None and os.environ.get("PDF_HEADER_RATIO"):
+        header_ratio = float(os.environ["PDF_HEADER_RATIO"])
+
+    exact, flexible = compile_name_patterns(full_name)
+    # the end of the previous page is kept so a name split across pages is still found
+    carry_length = len(full_name) * 2
+    carry = ""
+
+    with pdfplumber.open(open_source(pdf_source)) as pdf:
+        for page_number, page in enumerate(pdf.pages):
+            if max_pages and page_number >= max_pages:
+                break
+
+            region = page.crop((0, 0, page.width, page.height * header_ratio)) if header_ratio else page
+            text = carry + (region.extract_text() or "")
+            page.close()
+
+            if exact.search(text):
+                logging.debug(f"Found '{full_name}' in all caps in the PDF (page {page_number + 1})")
+                return full_name
+            if flexible.search(text):
+                logging.debug(f"Found '{full_name}' with some formatting variations in the PDF (page {page_number + 1})")
+                return full_name
+
+            carry = text[-carry_length:] + "\n"
+
+    logging.debug(f"Could not find '{full_name}' in the PDF")
+    return "estimado"
+
+
+def legacy_search(pdf_bytes, full_name):
+    """The search as it was: concatenate every page, print the text each time, then search"""
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        text = ""
+        for page in pdf.pages:
+            text += page.extract_text()
+            print(text)
+    if re.search(r'\b' + re.escape(full_name.upper()) + r'\b', text):
+        return full_name
+    flexible = r'\s*'.join([r'\b' + re.escape(word) + r'\b' for word in full_name.upper().split()])
+    return full_name if re.search(flexible, text) else "estimado"
+
+
+def timed(fn, *args, **kwargs):
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pages', type=int, nargs='+', default=[50, 100, 200])
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    for pages in args.pages:
+        person = random_person(rng)
+        pdf_bytes, expected = make_statement_pdf(person, pages=pages, seed=pages)
+        name = expected['full_name']
+        cases = [
+            ("legacy, name present", legacy_search, (pdf_bytes, name), {}),
+            ("streaming, name present", search_name_in_pdf, (pdf_bytes, name), {}),
+            ("streaming, header only", search_name_in_pdf, (pdf_bytes, name), {'max_pages': 2, 'header_ratio': 0.25}),
+            ("legacy, name absent", legacy_search, (pdf_bytes, "NOMBRE AUSENTE"), {}),
+            ("streaming, name absent", search_name_in_pdf, (pdf_bytes, "NOMBRE AUSENTE"), {}),
+        ]
+        print(f"{pages} pages")
+        for label, fn, fn_args, kwargs in cases:
+            elapsed, result = timed(fn, *fn_args, **kwargs)
+            print(f"  {label:26s} {elapsed * 1000:9.1f} ms  -> {result}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+OCR latency and name-extraction accuracy of every ImagePreprocessor preset, over a
+folder of synthetic INE photos generated with PIL. Needs the tesseract binary.
+
+    python benchmarks/bench_preprocessing.py --images 20 --folder /tmp/ine_fixtures
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fixtures import write_id_images  # noqa: E402
+from services.image_preprocessing import ImagePreprocessor  # noqa: E402
+from services.localOCRService import ocr_id_image  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--images', type=int, default=20)
+    parser.add_argument('--folder', default='/tmp/ine_fixtures')
+    parser.add_argument('--width', type=int, default=3000, help="pixel width of the simulated phone photo")
+    parser.add_argument('--presets', nargs='+', default=list(ImagePreprocessor.PRESETS))
+    args = parser.parse_args()
+
+    fixtures = write_id_images(args.folder, args.images, width=args.width)
+    print(f"{len(fixtures)} images of {args.width}px in {args.folder}")
+
+    for preset in args.presets:
+        latencies, first_ok, last_ok = [], 0, 0
+        for path, person in fixtures:
+            start = time.perf_counter()
+            result = ocr_id_image(path.read_bytes(), preset=preset) or {}
+            latencies.append(time.perf_counter() - start)
+            first_ok += result.get('first_names') == person['first_names']
+            last_ok += result.get('last_names') == person['last_names']
+        print(f"{preset:10s} p50 {statistics.median(latencies) * 1000:8.1f} ms  "
+              f"max {max(latencies) * 1000:8.1f} ms  "
+              f"first names {first_ok / len(fixtures):6.1%}  last names {last_ok / len(fixtures):6.1%}")
+
+
+if __name__ == '__main__':
+    main()
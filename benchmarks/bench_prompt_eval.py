@@ -0,0 +1,117 @@
+"""
+Measures prompt evaluation and model load time over a replayed mix of calls
+(greeting, chat, document status) with the old prompt layout and with the
+PromptRegistry layout, cold and after OllamaClient.warmup.
+
+The old layout is rebuilt from the registry sections in the order the inline
+prompts used: task text first, client details next, the shared rules last.
+
+Runs against a fake Ollama that only evaluates the part of a prompt not shared
+with the previous one, or against a real server with --host (use a small model,
+e.g. --model llama3.2:1b).
+
+    python benchmarks/bench_prompt_eval.py --sessions 20
+    python benchmarks/bench_prompt_eval.py --host http://localhost:11434 --model llama3.2:1b
+"""
+import argparse
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ollama import Client  # noqa: E402
+from fake_ollama import FakeOllama  # noqa: E402
+from fixtures import random_person  # noqa: E402
+from services.prompts import PromptRegistry  # noqa: E402
+
+# What one session sends, in order
+SESSION_CALLS = [
+    ('greeting_stream', 'greeting'),
+    ('chat', None),
+    ('status_jpg', 'status'),
+    ('chat', None),
+    ('status_both', 'status'),
+]
+
+CHAT_MESSAGES = [
+    "¿Qué necesito para pedir un crédito?",
+    "¿Cuánto dinero me pueden prestar?",
+    "Quiero hablar con un humano",
+    "¿Es segura mi información?",
+]
+
+
+def legacy_prompt(name, **params):
+    sections = PromptRegistry.PROMPTS[name]
+    ordered = [s for s in sections if s not in ('shared', 'client_name')]
+    if 'client_name' in sections:
+        ordered.insert(1, 'client_name')
+    ordered.append('shared')
+    return "".join(PromptRegistry.SECTIONS[s] for s in ordered).format(**params).strip()
+
+
+def replay(client, model, layout, sessions, seed):
+    rng = random.Random(seed)
+    totals = {'calls': 0, 'prompt_eval_count': 0, 'prompt_eval_ms': 0.0, 'load_ms': 0.0, 'first_call_ms': None}
+    for _ in range(sessions):
+        person = random_person(rng)
+        client_name = person['first_names']
+        for prompt_name, message_name in SESSION_CALLS:
+            system_prompt = layout(prompt_name, client_name=client_name)
+            message = PromptRegistry.message(message_name) if message_name else rng.choice(CHAT_MESSAGES)
+            response = client.chat(
+                model=model,
+                messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": message}],
+                options={'num_predict': 1, 'temperature': 0.1},
+                keep_alive="30m"
+            )
+            call_ms = (response.get('load_duration') or 0) / 1e6 + (response.get('prompt_eval_duration') or 0) / 1e6
+            if totals['first_call_ms'] is None:
+                totals['first_call_ms'] = call_ms
+            totals['calls'] += 1
+            totals['prompt_eval_count'] += response.get('prompt_eval_count') or 0
+            totals['prompt_eval_ms'] += (response.get('prompt_eval_duration') or 0) / 1e6
+            totals['load_ms'] += (response.get('load_duration') or 0) / 1e6
+    return totals
+
+
+def unload(client, model):
+    client.generate(model=model, prompt="", keep_alive=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--host', help="real Ollama server, a fake one is started when omitted")
+    parser.add_argument('--model', default='llama3.1')
+    parser.add_argument('--prompt-delay', type=float, default=0.0005, help="fake: seconds per evaluated prompt token")
+    parser.add_argument('--load-delay', type=float, default=2.0, help="fake: seconds to load the model")
+    args = parser.parse_args()
+
+    fake = None
+    host = args.host
+    if not host:
+        fake = FakeOllama(token_delay=0, prompt_delay=args.prompt_delay, load_delay=args.load_delay).start()
+        host = fake.url
+
+    from services.ollama_manager import OllamaClient
+    manager = OllamaClient(host=host)
+    client = manager.get_client()
+
+    print(f"{'layout':<10} {'start':<7} {'calls':>5} {'prompt tokens':>14} {'prompt eval':>12} {'load':>9} {'1st call':>9}")
+    for layout_name, layout in (('inline', legacy_prompt), ('registry', PromptRegistry.render)):
+        for start in ('cold', 'warm'):
+            unload(client, args.model)
+            if start == 'warm':
+                manager.warmup(args.model)
+            totals = replay(client, args.model, layout, args.sessions, seed=3)
+            print(f"{layout_name:<10} {start:<7} {totals['calls']:>5} {totals['prompt_eval_count']:>14} "
+                  f"{totals['prompt_eval_ms']:>10.1f}ms {totals['load_ms']:>7.1f}ms {totals['first_call_ms']:>7.1f}ms")
+
+    if fake:
+        fake.stop()
+
+
+if __name__ == '__main__':
+    main()
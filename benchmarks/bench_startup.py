@@ -0,0 +1,125 @@
+"""
+Cold start of the app: what `import app` costs according to `python -X importtime`
+(total, the heaviest modules and which of the OCR/DB/LLM libraries got imported)
+and the time from starting a server process to its first served /initial-greeting,
+against a fake Ollama.
+
+    python benchmarks/bench_startup.py --runs 3 --servers main gunicorn
+
+`main` is the Flask development server started by main.py (what the Dockerfile
+used to run), `gunicorn` the production entry point configured in gunicorn.conf.py
+and `hypercorn` the ASGI app.
+"""
+import argparse
+import json
+import os
+import re
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from fake_ollama import FakeOllama  # noqa: E402
+
+HEAVY = ['pytesseract', 'PIL.Image', 'pdfplumber', 'google.cloud.sql.connector', 'pymysql', 'sqlalchemy', 'ollama']
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$')
+
+SERVERS = {
+    'main': lambda port: [sys.executable, 'main.py'],
+    'gunicorn': lambda port: [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f"127.0.0.1:{port}"],
+    'hypercorn': lambda port: [sys.executable, '-m', 'hypercorn', '--bind', f"127.0.0.1:{port}", 'asgi_app:app'],
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def base_env(ollama_url):
+    return {
+        **os.environ,
+        'DB_BACKEND': 'sqlite',
+        'DB_URL': f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}",
+        'OLLAMA_HOSTS': ollama_url,
+        'LOG_LEVEL': 'WARNING',
+    }
+
+
+def import_profile(env):
+    """(total seconds, {module: cumulative seconds}) of `import app`"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            modules.setdefault(match.group(4), int(match.group(2)) / 1e6)
+    return modules.get('app', 0.0), modules
+
+
+def first_request(server, env, timeout=120):
+    """Seconds from starting the server process to the first 200 from /initial-greeting"""
+    port = free_port()
+    env = {**env, 'PORT': str(port)}
+    request = urllib.request.Request(f"http://127.0.0.1:{port}/initial-greeting", data=json.dumps({}).encode(),
+                                     headers={'Content-Type': 'application/json'}, method='POST')
+    start = time.perf_counter()
+    process = subprocess.Popen(SERVERS[server](port), cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    if response.status < 300:
+                        return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+        raise RuntimeError(f"{server} served nothing within {timeout}s")
+    finally:
+        # the whole group: the development server's reloader and gunicorn's workers are children
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--servers', nargs='+', choices=list(SERVERS), default=['main', 'gunicorn'])
+    parser.add_argument('--top', type=int, default=12)
+    args = parser.parse_args()
+
+    fake = FakeOllama(token_delay=0.0).start()
+    env = base_env(fake.url)
+
+    profiles = [import_profile(env) for _ in range(args.runs)]
+    totals = [total for total, _ in profiles]
+    modules = profiles[-1][1]
+    print(f"import app: median {statistics.median(totals) * 1000:.0f} ms over {args.runs} runs")
+    for name, seconds in sorted(modules.items(), key=lambda item: -item[1])[1:args.top + 1]:
+        print(f"   {seconds * 1000:8.1f} ms  {name}")
+    print("   imported at startup: " + (", ".join(name for name in HEAVY if name in modules) or "none of " + ", ".join(HEAVY)))
+
+    for server in args.servers:
+        times = [first_request(server, env) for _ in range(args.runs)]
+        print(f"{server:<10} start to first /initial-greeting: median {statistics.median(times):.2f}s "
+              f"(min {min(times):.2f}s, max {max(times):.2f}s)")
+
+    fake.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Accuracy and cost of reading the client fields of a statement (services/statement_parser.py)
+on generated statements of each header layout in fixtures.LAYOUTS:
+
+  - per layout and field (full_name, address, fecha_corte), how many statements were
+    read right, with and without the name of the client to look for
+  - statements of another client wrongly matched
+  - time of parse_statement against search_name_in_pdf (bench_pdf_search.py), which only
+    looks for the name
+
+    python benchmarks/bench_statement_parser.py --statements 30 --pages 10
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_pdf_search import search_name_in_pdf  # noqa: E402
+from fixtures import LAYOUTS, make_statement_pdf, random_person  # noqa: E402
+from services.statement_parser import parse_statement  # noqa: E402
+
+FIELDS = ('full_name', 'address', 'fecha_corte')
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--statements', type=int, default=30, help="statements per layout")
+    parser.add_argument('--pages', type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(24)
+    print(f"{args.statements} statements of {args.pages} pages per layout")
+    print(f"{'layout':<9} {'name given':<11} " + " ".join(f"{field:>12}" for field in FIELDS) + "  wrong matches")
+    parse_times, search_times = [], []
+    for layout in LAYOUTS:
+        statements = []
+        for i in range(args.statements):
+            person = random_person(rng)
+            pdf, truth = make_statement_pdf(person, pages=args.pages, seed=i, layout=layout)
+            statements.append((pdf, truth))
+
+        for given in (True, False):
+            correct = dict.fromkeys(FIELDS, 0)
+            for pdf, truth in statements:
+                parsed, seconds = timed(parse_statement, pdf, truth['full_name'] if given else None)
+                if given:
+                    parse_times.append(seconds)
+                    search_times.append(timed(search_name_in_pdf, pdf, truth['full_name'])[1])
+                for field in FIELDS:
+                    correct[field] += parsed[field] == truth[field]
+            wrong = ""
+            if given:
+                # every statement checked against the next client's name
+                others = [truth['full_name'] for _, truth in statements[1:] + statements[:1]]
+                wrong = sum(parse_statement(pdf, other)['match'] != 'estimado'
+                            for (pdf, _), other in zip(statements, others))
+            print(f"{layout:<9} {'yes' if given else 'no':<11} "
+                  + " ".join(f"{correct[field]:>9}/{len(statements):<2}" for field in FIELDS) + f"  {wrong}")
+
+    print(f"parse_statement     p50 {statistics.median(parse_times) * 1000:6.1f} ms")
+    print(f"search_name_in_pdf  p50 {statistics.median(search_times) * 1000:6.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+Peak memory of the Flask app while it serves concurrent large statement uploads,
+with uploads kept in memory and sent to the OCR workers as bytes (UPLOAD_SPOOL_BYTES
+above the file size, as before spooling) and with the default spooling to disk and
+path-based OCR input. The app runs in its own process behind the werkzeug server;
+uploads are streamed to it from a file and its peak RSS (and that of its OCR
+workers) is read from /proc, so this runs on Linux only.
+
+    python benchmarks/bench_upload_ingest.py --uploads 16 --threads 8 --size-mb 8
+"""
+import argparse
+import http.client
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fixtures import make_statement_pdf, random_person  # noqa: E402
+
+BOUNDARY = "----bench-upload-ingest"
+PERSON = random_person(random.Random(17))
+SESSION_ID = "bench-upload-ingest"
+
+
+def statement_of_size(size):
+    """A statement with as many transaction pages as it takes to weigh about `size` bytes"""
+    pdf_bytes, _ = make_statement_pdf(PERSON, pages=max(1, size // 5300))
+    return pdf_bytes
+
+
+def serve(args):
+    os.environ.update({
+        'DB_BACKEND': 'sqlite',
+        'DB_URL': f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}",
+        'UPLOAD_MAX_BYTES': str(args.size_mb * 2 * 1024 * 1024),
+        'OCR_MAX_QUEUE': str(args.uploads),
+        'EXTRACTION_CACHE_DIR': tempfile.mkdtemp(),
+        'LOG_LEVEL': 'WARNING',
+    })
+    if args.mode == 'memory':
+        os.environ['UPLOAD_SPOOL_BYTES'] = str(args.size_mb * 2 * 1024 * 1024)
+    import logging
+    from werkzeug.serving import make_server
+    from app import create_app
+    from models.id_record import IDRecord
+    from services.ocr_pool import OCRWorkerPool
+
+    IDRecord(f"{PERSON['first_names']} {PERSON['last_names']}", "", session_id=SESSION_ID).save()
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    # stop the OCR workers with the server instead of leaving them orphaned
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        make_server('127.0.0.1', args.port, create_app(), threaded=True).serve_forever()
+    finally:
+        OCRWorkerPool.get_instance().shutdown()
+
+
+def peak_rss(pid):
+    """VmHWM of a process, in MB"""
+    for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+        if line.startswith("VmHWM:"):
+            return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def children(pid):
+    found = []
+    for stat in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            # the parent pid is the second field after the parenthesised command name
+            if int(stat.read_text().rsplit(")", 1)[1].split()[1]) == pid:
+                found.append(int(stat.parent.name))
+        except (OSError, IndexError, ValueError):
+            continue
+    return found
+
+
+def upload(port, path, marker):
+    """Stream one multipart upload from `path`, with a trailing comment so the extraction cache does not answer"""
+    head = (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{marker}.pdf\"\r\n"
+            f"Content-Type: application/pdf\r\n\r\n").encode()
+    tail = f"%{marker}\n\r\n--{BOUNDARY}--\r\n".encode()
+    size = os.path.getsize(path)
+
+    def body():
+        yield head
+        with open(path, 'rb') as f:
+            while chunk := f.read(256 * 1024):
+                yield chunk
+        yield tail
+
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=300)
+    connection.request('POST', '/upload-file-stream', body=body(), headers={
+        'Content-Type': f"multipart/form-data; boundary={BOUNDARY}",
+        'Content-Length': str(len(head) + size + len(tail)),
+        'X-Session-Id': SESSION_ID,
+    })
+    status = connection.getresponse().status
+    connection.close()
+    return status
+
+
+def run(args, mode, path):
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    server = subprocess.Popen([sys.executable, __file__, '--serve', '--mode', mode, '--port', str(port),
+                               '--uploads', str(args.uploads), '--size-mb', str(args.size_mb)])
+    try:
+        for _ in range(300):
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        baseline = peak_rss(server.pid)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            statuses = list(pool.map(lambda i: upload(port, path, i), range(args.uploads)))
+        elapsed = time.perf_counter() - start
+
+        peak = peak_rss(server.pid)
+        workers = [peak_rss(child) for child in children(server.pid)]
+        print(f"{mode:<7} {statuses.count(200)}/{args.uploads} ok in {elapsed:6.2f}s   "
+              f"app peak RSS {peak:5.0f} MB (+{peak - baseline:4.0f} MB serving)   "
+              f"largest OCR worker {max(workers, default=0):4.0f} MB")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--uploads', type=int, default=16)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--size-mb', type=int, default=8)
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--mode', choices=['memory', 'spool'], help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    with tempfile.NamedTemporaryFile(suffix='.pdf') as statement:
+        statement.write(statement_of_size(args.size_mb * 1024 * 1024))
+        statement.flush()
+        for mode in ('memory', 'spool'):
+            run(args, mode, statement.name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Latency of /upload-file-stream with the status message rendered from the
+StatusResponder templates and with the model path (llm_status=true), against a
+fake Ollama and a SQLite database. Every upload is a statement for a different
+client in a session that already sent its INE, so no status prompt repeats and
+the response cache cannot hide the generation. Also times StatusResponder.render
+on its own.
+
+    python benchmarks/bench_upload_status.py --uploads 40 --token-delay 0.02
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_ollama import FakeOllama  # noqa: E402
+from fixtures import make_statement_pdf, random_person  # noqa: E402
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def upload(client, person, pdf_bytes, session_id, llm_status):
+    from io import BytesIO
+    from models.id_record import IDRecord
+    from services.file_tracker import FileTracker
+
+    IDRecord(f"{person['first_names']} {person['last_names']}", "", session_id=session_id).save()
+    FileTracker(session_id).set_jpg()
+    form = {'file': (BytesIO(pdf_bytes), 'estado_de_cuenta.pdf'), 'llm_status': llm_status}
+    start = time.perf_counter()
+    response = client.post('/upload-file-stream', data=form, headers={'X-Session-Id': session_id},
+                           content_type='multipart/form-data')
+    elapsed = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(response.get_json())
+    return elapsed, response.get_json()['data']['status']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--uploads', type=int, default=40)
+    parser.add_argument('--pages', type=int, default=2)
+    parser.add_argument('--token-delay', type=float, default=0.02)
+    parser.add_argument('--render-iterations', type=int, default=100000)
+    args = parser.parse_args()
+
+    fake = FakeOllama(token_delay=args.token_delay).start()
+    os.environ.update({
+        'DB_BACKEND': 'sqlite',
+        'DB_URL': f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}",
+        'OLLAMA_HOSTS': fake.url,
+        'OLLAMA_WARMUP': '0',
+        'LOG_LEVEL': 'WARNING',
+    })
+    from app import create_app
+    from services.status_responder import StatusResponder
+    client = create_app().test_client()
+
+    rng = random.Random(16)
+    cases = []
+    for i in range(args.uploads):
+        person = random_person(rng)
+        pdf_bytes, _ = make_statement_pdf(person, pages=args.pages, seed=i)
+        cases.append((person, pdf_bytes))
+
+    # first request pays for the OCR pool start and the name index
+    upload(client, *cases[0], 'warmup', 'false')
+
+    for mode, llm_status in (("template", 'false'), ("llm", 'true')):
+        latencies, sample = [], None
+        for i, (person, pdf_bytes) in enumerate(cases):
+            elapsed, sample = upload(client, person, pdf_bytes, f"{mode}-{i}", llm_status)
+            latencies.append(elapsed)
+        print(f"{mode:<9} n={len(latencies):<4} p50 {statistics.median(latencies) * 1000:8.1f} ms"
+              f"   p95 {percentile(latencies, 95) * 1000:8.1f} ms   mean {statistics.mean(latencies) * 1000:8.1f} ms")
+        print(f"   {sample[:110]}")
+
+    names = [random_person(rng)['first_names'] for _ in range(1000)]
+    start = time.perf_counter()
+    for i in range(args.render_iterations):
+        StatusResponder.render(StatusResponder.STATES[i % 4], names[i % 1000], f"s{i}")
+    print(f"StatusResponder.render {(time.perf_counter() - start) / args.render_iterations * 1e6:.2f} µs/op")
+
+    fake.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+What the write-behind queue takes out of the request path. Every database round
+trip is slowed by --db-latency-ms (a stand-in for the Cloud SQL network hop) on
+a SQLite file, then:
+
+  - the cost of recording one IDRecord: save() against save_later()
+  - statement uploads through the Flask app, with WRITE_BEHIND=0 and =1
+    (a match records a CuentaRecord)
+  - how fast the queue drains a burst in multi-row batches
+  - a process killed with rows still queued: how many the next one recovers
+
+    python benchmarks/bench_write_behind.py --db-latency-ms 5 --records 500 --uploads 40
+"""
+import argparse
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fixtures import make_statement_pdf, random_person  # noqa: E402
+
+
+def add_latency(seconds):
+    from sqlalchemy import event
+    from config.database import DatabaseConnection
+
+    @event.listens_for(DatabaseConnection.get_engine(), "before_cursor_execute")
+    def network_hop(*args):
+        time.sleep(seconds)
+
+
+def percentiles(values):
+    values = sorted(values)
+    return statistics.median(values) * 1000, values[int(0.95 * (len(values) - 1))] * 1000
+
+
+def record_cost(records):
+    from models.id_record import IDRecord
+    from services.write_behind import WriteBehindQueue
+
+    for method in ('save', 'save_later'):
+        times = []
+        for i in range(records):
+            record = IDRecord(f"CLIENTE {i}", "CALLE 1", session_id=f"{method}-{i}")
+            start = time.perf_counter()
+            getattr(record, method)()
+            times.append(time.perf_counter() - start)
+        p50, p95 = percentiles(times)
+        print(f"IDRecord.{method:<11} p50 {p50:7.2f} ms   p95 {p95:7.2f} ms")
+    WriteBehindQueue.get_instance().flush()
+
+
+def upload_latency(uploads):
+    from app import create_app
+    from models.id_record import IDRecord
+
+    client = create_app().test_client()
+    rng = random.Random(23)
+    people = [random_person(rng) for _ in range(uploads)]
+    statements = [make_statement_pdf(person, pages=2, seed=i)[0] for i, person in enumerate(people)]
+    for mode in ('0', '1'):
+        os.environ['WRITE_BEHIND'] = mode
+        times = []
+        for i, (person, statement) in enumerate(zip(people, statements)):
+            session_id = f"upload-{mode}-{i}"
+            IDRecord(f"{person['first_names']} {person['last_names']}", "", session_id=session_id).save()
+            # a different byte so the extraction cache does not answer
+            form = {'file': (BytesIO(statement + f"%{mode}\n".encode()), 'estado_de_cuenta.pdf')}
+            start = time.perf_counter()
+            response = client.post('/upload-file-stream', data=form, headers={'X-Session-Id': session_id},
+                                   content_type='multipart/form-data')
+            times.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise RuntimeError(response.get_json())
+        p50, p95 = percentiles(times)
+        print(f"statement upload, WRITE_BEHIND={mode}   p50 {p50:7.1f} ms   p95 {p95:7.1f} ms")
+
+
+def drain_rate(records):
+    from services.write_behind import WriteBehindQueue
+    queue = WriteBehindQueue.get_instance()
+    written = queue.stats()['written']
+    start = time.perf_counter()
+    for i in range(records):
+        queue.put("id_records", {"full_name": f"RAFAGA {i}", "address": "", "session_id": f"burst-{i}"})
+    queue.flush()
+    elapsed = time.perf_counter() - start
+    print(f"burst of {records} rows written in {elapsed:.2f}s ({(queue.stats()['written'] - written) / elapsed:.0f} rows/s, "
+          f"batches of up to {queue.batch_size})")
+
+
+def crash(records):
+    """Runs in a child process: queue rows and die before the queue writes them"""
+    from services.write_behind import WriteBehindQueue
+    queue = WriteBehindQueue.get_instance()
+    for i in range(records):
+        queue.put("id_records", {"full_name": f"HUERFANO {i}", "address": "", "session_id": f"crash-{i}"})
+    os._exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db-latency-ms', type=float, default=5.0)
+    parser.add_argument('--records', type=int, default=500)
+    parser.add_argument('--uploads', type=int, default=40)
+    parser.add_argument('--crash', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.crash:
+        crash(args.records)
+
+    folder = tempfile.mkdtemp()
+    os.environ.update({
+        'DB_BACKEND': 'sqlite',
+        'DB_URL': f"sqlite:///{os.path.join(folder, 'bench.db')}",
+        'WRITE_BEHIND_DIR': os.path.join(folder, 'write_behind'),
+        'EXTRACTION_CACHE_DIR': os.path.join(folder, 'extraction_cache'),
+        'STATUS_RESPONDER': 'template',
+        'LOG_LEVEL': 'WARNING',
+    })
+    add_latency(args.db_latency_ms / 1000)
+    print(f"{args.db_latency_ms} ms added to every database round trip")
+
+    record_cost(args.records)
+    upload_latency(args.uploads)
+    drain_rate(args.records * 10)
+
+    # the child writes its spool under the same directory, with a queue that never flushes on its own
+    subprocess.run([sys.executable, __file__, '--crash', '--records', str(args.records)],
+                   env={**os.environ, 'WRITE_BEHIND_INTERVAL': '3600', 'WRITE_BEHIND_BATCH': str(args.records + 1)})
+    from services.write_behind import WriteBehindQueue
+    # a new queue in this process stands in for the next process
+    WriteBehindQueue.get_instance().close()
+    WriteBehindQueue._instance = None
+    queue = WriteBehindQueue.get_instance()
+    queue.flush()
+    print(f"killed with {args.records} rows queued: {queue.stats()['recovered']} recovered and written by the next process")
+
+    from services.ocr_pool import OCRWorkerPool
+    OCRWorkerPool.get_instance().shutdown()
+
+
+if __name__ == '__main__':
+    main()
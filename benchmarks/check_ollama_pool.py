@@ -0,0 +1,121 @@
+"""
+Exercises OllamaPool against several fake Ollama servers: least-outstanding
+spread under the per-backend cap, failover when a backend errors or is not
+listening, restoration by the health check, and the async interface.
+Exits non-zero if any check fails.
+
+    python benchmarks/check_ollama_pool.py --backends 3 --calls 60
+"""
+import argparse
+import asyncio
+import socket
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_ollama import FakeOllama  # noqa: E402
+from services.ollama_pool import OllamaPool, AsyncOllamaPool  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "Hola"}]
+failures = []
+
+
+def check(name, ok, detail=""):
+    print(f"{'ok  ' if ok else 'FAIL'} {name} {detail}")
+    if not ok:
+        failures.append(name)
+
+
+def closed_port_url():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}"
+
+
+def stream_call(pool):
+    return "".join(chunk['message']['content'] for chunk in pool.chat(model="llama3.1", messages=MESSAGES, stream=True))
+
+
+def run_calls(pool, calls, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        replies = list(executor.map(lambda _: stream_call(pool), range(calls)))
+    return replies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--backends', type=int, default=3)
+    parser.add_argument('--calls', type=int, default=60)
+    parser.add_argument('--cap', type=int, default=4)
+    parser.add_argument('--token-delay', type=float, default=0.005)
+    args = parser.parse_args()
+
+    fakes = [FakeOllama(token_delay=args.token_delay).start() for _ in range(args.backends)]
+    pool = OllamaPool([fake.url for fake in fakes], max_concurrency=args.cap, eject_seconds=1.0, health_interval=0.2)
+
+    # spread under the cap
+    replies, elapsed = run_calls(pool, args.calls, args.cap * args.backends * 2)
+    check("all calls answered", all(r == fakes[0].reply for r in replies))
+    check("per-backend cap respected", all(fake.max_in_flight <= args.cap for fake in fakes),
+          f"max in flight {[fake.max_in_flight for fake in fakes]}")
+    check("load spread over backends", min(fake.requests for fake in fakes) >= args.calls // (args.backends * 2),
+          f"requests {[fake.requests for fake in fakes]} in {elapsed:.2f}s")
+    check("nothing left outstanding", all(b.outstanding == 0 for b in pool.backends))
+
+    # one backend answering 503
+    fakes[0].fail = True
+    before = [fake.requests for fake in fakes]
+    replies, _ = run_calls(pool, args.calls, args.cap * args.backends)
+    check("failover on 503", all(r == fakes[0].reply for r in replies))
+    check("failed backend ejected", pool.stats()['backends'][0]['healthy'] is False)
+    fakes[0].fail = False
+    time.sleep(0.5)
+    check("health check restores backend", pool.stats()['backends'][0]['healthy'] is True)
+    run_calls(pool, args.calls, args.cap * args.backends)
+    check("restored backend gets traffic again", fakes[0].requests > before[0])
+
+    # a host that is not listening at all
+    dead = closed_port_url()
+    pool.add_backend(dead)
+    replies, _ = run_calls(pool, args.calls, args.cap * args.backends)
+    check("failover on connection refused", all(r == fakes[0].reply for r in replies))
+    check("dead backend ejected", next(b for b in pool.stats()['backends'] if b['host'] == dead)['healthy'] is False)
+
+    # every backend down
+    for fake in fakes:
+        fake.fail = True
+    try:
+        stream_call(pool)
+        check("error when every backend is down", False)
+    except Exception as e:
+        check("error when every backend is down", True, f"({type(e).__name__})")
+    for fake in fakes:
+        fake.fail = False
+    time.sleep(0.5)
+
+    # async interface, same routing state
+    async def async_calls():
+        client = AsyncOllamaPool(pool)
+
+        async def one():
+            response = await client.chat(model="llama3.1", messages=MESSAGES, stream=True)
+            return "".join([chunk['message']['content'] async for chunk in response])
+
+        return await asyncio.gather(*(one() for _ in range(args.calls)))
+
+    replies = asyncio.run(async_calls())
+    check("async calls answered", all(r == fakes[0].reply for r in replies))
+    check("async per-backend cap respected", all(fake.max_in_flight <= args.cap for fake in fakes))
+    check("nothing left outstanding after async", all(b.outstanding == 0 for b in pool.backends))
+
+    for fake in fakes:
+        fake.stop()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
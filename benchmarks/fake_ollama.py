@@ -0,0 +1,238 @@
+"""
+Minimal stand-in for the Ollama HTTP API used by the benchmarks.
+
+Implements /api/chat and /api/generate (streamed as NDJSON or as one JSON
+body), /api/version, /api/tags and /api/ps, with a configurable per-token delay
+so time-to-first-byte and total generation time can be told apart.
+
+Optionally models what makes a first response slow on a real server: a model
+load after `keep_alive` expires (load_delay) and prompt evaluation that only
+pays for the part of the prompt not shared with the previous one (prompt_delay
+per prompt token, one cached prompt like a single Ollama slot). `parallel` caps
+concurrent generations like OLLAMA_NUM_PARALLEL.
+
+    python benchmarks/fake_ollama.py --port 11500 --token-delay 0.02
+"""
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = ("Buen día. Estoy aquí para ayudarle con el primer paso para aplicar a un crédito "
+         "empresarial. Para continuar, suba una foto de su INE y su estado de cuenta.")
+
+
+def parse_keep_alive(value, default=300.0):
+    """Seconds from an Ollama keep_alive value ("30m", "1h", 300, -1 for forever)"""
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        return float("inf") if value < 0 else float(value)
+    units = {"s": 1, "m": 60, "h": 3600}
+    if value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    seconds = float(value)
+    return float("inf") if seconds < 0 else seconds
+
+
+def common_prefix_length(a, b):
+    length = min(len(a), len(b))
+    for i in range(length):
+        if a[i] != b[i]:
+            return i
+    return length
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 4096
+
+
+class FakeOllama:
+    def __init__(self, host='127.0.0.1', port=0, token_delay=0.02, reply=REPLY, fail=False,
+                 prompt_delay=0.0, load_delay=0.0, parallel=0):
+        self.token_delay = token_delay
+        self.reply = reply
+        self.fail = fail
+        self.prompt_delay = prompt_delay
+        self.load_delay = load_delay
+        self.loaded_until = 0.0
+        self.cached_prompt = ""
+        self._slot_lock = threading.Lock()
+        # like OLLAMA_NUM_PARALLEL: requests beyond it wait in arrival order
+        self.parallel = threading.Semaphore(parallel) if parallel else None
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self.server = _Server((host, port), self._handler())
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def tokens(self):
+        words = self.reply.split(" ")
+        return [w + (" " if i < len(words) - 1 else "") for i, w in enumerate(words)]
+
+    def evaluate(self, prompt, keep_alive):
+        """
+        Load the model if it expired and evaluate the uncached part of the prompt.
+        Returns (load_duration, prompt_eval_count, prompt_eval_duration), durations in ns.
+        """
+        with self._slot_lock:
+            load_duration = 0
+            now = time.time()
+            if now > self.loaded_until:
+                time.sleep(self.load_delay)
+                load_duration = int(self.load_delay * 1e9)
+                self.cached_prompt = ""
+            reused = common_prefix_length(prompt, self.cached_prompt)
+            evaluated = max(0, (len(prompt) - reused) // 4) if prompt else 0
+            time.sleep(self.prompt_delay * evaluated)
+            if prompt:
+                self.cached_prompt = prompt
+            self.loaded_until = time.time() + parse_keep_alive(keep_alive)
+            return load_duration, evaluated, int(self.prompt_delay * evaluated * 1e9)
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, payload, status=200):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _write_chunk(self, data):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def do_GET(self):
+                if fake.fail:
+                    return self._send_json({"error": "backend down"}, 503)
+                if self.path == "/api/version":
+                    return self._send_json({"version": "0.0.0-fake"})
+                if self.path in ("/api/tags", "/api/ps"):
+                    return self._send_json({"models": [{"name": "llama3.1", "model": "llama3.1"}]})
+                if self.path == "/":
+                    return self._send_json({"status": "Ollama is running"})
+                self._send_json({"error": "not found"}, 404)
+
+            def do_HEAD(self):
+                self.send_response(503 if fake.fail else 200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if fake.fail:
+                    return self._send_json({"error": "backend down"}, 503)
+                if self.path not in ("/api/chat", "/api/generate"):
+                    return self._send_json({"error": "not found"}, 404)
+
+                with fake._lock:
+                    fake.requests += 1
+                    fake.in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+                try:
+                    if fake.parallel:
+                        with fake.parallel:
+                            self._generate(request)
+                    else:
+                        self._generate(request)
+                finally:
+                    with fake._lock:
+                        fake.in_flight -= 1
+
+            def _generate(self, request):
+                chat = self.path == "/api/chat"
+                model = request.get("model", "llama3.1")
+                prompt = "".join(f"<|{m.get('role')}|>{m.get('content', '')}" for m in request.get("messages", [])) \
+                    if chat else request.get("prompt", "")
+                load_duration, prompt_eval_count, prompt_eval_duration = fake.evaluate(prompt, request.get("keep_alive"))
+                tokens = fake.tokens() if prompt else []
+
+                def piece(content, done):
+                    payload = {
+                        "model": model,
+                        "created_at": datetime.now(timezone.utc).isoformat(),
+                        "done": done,
+                    }
+                    if chat:
+                        payload["message"] = {"role": "assistant", "content": content}
+                    else:
+                        payload["response"] = content
+                    if done:
+                        payload.update({
+                            "done_reason": "stop",
+                            "load_duration": load_duration,
+                            "prompt_eval_count": prompt_eval_count,
+                            "prompt_eval_duration": prompt_eval_duration,
+                            "eval_count": len(tokens),
+                            "eval_duration": int(fake.token_delay * len(tokens) * 1e9),
+                        })
+                    return payload
+
+                if not request.get("stream", True):
+                    time.sleep(fake.token_delay * len(tokens))
+                    return self._send_json(piece("".join(tokens), True))
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for token in tokens:
+                        time.sleep(fake.token_delay)
+                        self._write_chunk(json.dumps(piece(token, False)).encode() + b"\n")
+                    self._write_chunk(json.dumps(piece("", True)).encode() + b"\n")
+                    self._write_chunk(b"")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=11500)
+    parser.add_argument('--token-delay', type=float, default=0.02)
+    parser.add_argument('--prompt-delay', type=float, default=0.0)
+    parser.add_argument('--load-delay', type=float, default=0.0)
+    parser.add_argument('--parallel', type=int, default=0)
+    args = parser.parse_args()
+    fake = FakeOllama(port=args.port, token_delay=args.token_delay,
+                      prompt_delay=args.prompt_delay, load_delay=args.load_delay,
+                      parallel=args.parallel).start()
+    print(f"fake ollama listening on {fake.url}")
+    try:
+        fake.thread.join()
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == '__main__':
+    main()
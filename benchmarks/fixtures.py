@@ -0,0 +1,213 @@
+"""
+Synthetic documents for the benchmarks: INE-like ID photos drawn with PIL.
+"""
+import io
+import random
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+ROOT = Path(__file__).resolve().parent.parent
+
+STREETS = ["AV JUAREZ 120", "CALLE HIDALGO 45", "BLVD LOPEZ MATEOS 3021", "PRIV MORELOS 8", "CALLE REFORMA 77 INT 4"]
+COLONIAS = ["COL CENTRO 37000", "COL JARDINES DEL MORAL 37160", "FRACC LAS AGUILAS 37270", "COL SAN JUAN 36500"]
+
+
+def load_names(filename):
+    with open(ROOT / 'data' / filename, 'r', encoding='utf-8') as f:
+        return [line.strip().upper() for line in f if line.strip()]
+
+
+def random_person(rng):
+    firsts, lasts = load_names('firsts.txt'), load_names('lasts.txt')
+    return {
+        'first_names': rng.choice(firsts),
+        'last_names': f"{rng.choice(lasts)} {rng.choice(lasts)}",
+        'address': [rng.choice(STREETS), rng.choice(COLONIAS)],
+    }
+
+
+def make_id_image(person, width=3000, skew=0.0, noise=12, blur=0.6, seed=0):
+    """An INE-like card filling the frame, a phone photo already cropped to the card"""
+    rng = random.Random(seed)
+    height = int(width * 54 / 85.6)
+    card = Image.new("RGB", (width, height), (226, 222, 214))
+    draw = ImageDraw.Draw(card)
+    unit = width / 1000
+    label = ImageFont.load_default(size=int(22 * unit))
+    text = ImageFont.load_default(size=int(30 * unit))
+
+    draw.text((40 * unit, 25 * unit), "INSTITUTO NACIONAL ELECTORAL", font=label, fill=(90, 60, 90))
+    draw.rectangle((40 * unit, 140 * unit, 260 * unit, 460 * unit), fill=(160, 150, 140))
+
+    x, y = 300 * unit, 140 * unit
+    draw.text((x, y), "NOMBRE", font=label, fill=(120, 120, 120))
+    y += 32 * unit
+    paternal, maternal = person['last_names'].split()
+    for line in (paternal, maternal, person['first_names']):
+        draw.text((x, y), line, font=text, fill=(20, 20, 20))
+        y += 38 * unit
+    y += 12 * unit
+    draw.text((x, y), "DOMICILIO", font=label, fill=(120, 120, 120))
+    y += 32 * unit
+    for line in person['address']:
+        draw.text((x, y), line, font=text, fill=(20, 20, 20))
+        y += 38 * unit
+    draw.text((x, 540 * unit), "CLAVE DE ELECTOR", font=label, fill=(120, 120, 120))
+
+    if noise:
+        speckle = Image.effect_noise((width, height), noise).convert("RGB")
+        card = Image.blend(card, speckle, 0.15)
+    if blur:
+        card = card.filter(ImageFilter.GaussianBlur(blur * unit))
+    if skew:
+        card = card.rotate(skew, resample=Image.BICUBIC, fillcolor=(226, 222, 214))
+    return card
+
+
+def jpeg_bytes(image, quality=85):
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def write_id_images(folder, count, seed=11, width=3000):
+    """Writes count synthetic ID photos plus the expected names, returns [(path, person)]"""
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    fixtures = []
+    for i in range(count):
+        person = random_person(rng)
+        image = make_id_image(person, width=width, skew=rng.uniform(-3, 3), seed=i)
+        path = folder / f"ine_{i:03d}.jpg"
+        path.write_bytes(jpeg_bytes(image))
+        fixtures.append((path, person))
+    return fixtures
+
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages):
+    """
+    A minimal text PDF. pages is a list of pages, each a list of (x, y, size, text)
+    with the origin at the bottom-left of a US-letter page.
+    """
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    pages_id = len(objects) + 2 + 2 * len(pages)  # reserved after the page/content objects
+    page_ids = []
+    for lines in pages:
+        stream = "".join(
+            f"BT /F1 {size} Tf {x} {y} Td ({_pdf_escape(text)}) Tj ET\n" for x, y, size, text in lines
+        ).encode("cp1252", errors="replace")
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_id, font, content)
+        ))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    assert add(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))) == pages_id
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref))
+    return out.getvalue()
+
+
+BANKS = ["BANCO DEL BAJIO", "BBVA MEXICO", "BANORTE", "SANTANDER", "HSBC MEXICO"]
+MONTHS = ["ENE", "FEB", "MAR", "ABR", "MAY", "JUN", "JUL", "AGO", "SEP", "OCT", "NOV", "DIC"]
+
+
+MONTH_NAMES = ["ENERO", "FEBRERO", "MARZO", "ABRIL", "MAYO", "JUNIO", "JULIO", "AGOSTO", "SEPTIEMBRE",
+               "OCTUBRE", "NOVIEMBRE", "DICIEMBRE"]
+LAYOUTS = ("bajio", "labeled", "stacked")
+
+
+def statement_header(layout, rng, full_name, address, day, month, year):
+    """
+    The first-page header of a statement, in one of three layouts:
+    bajio, the name and address block on the left with FECHA DE CORTE: DD/MMM/YYYY on the right;
+    labeled, NOMBRE:/DOMICILIO: labels and a PERIODO: DD/MM/YYYY AL DD/MM/YYYY line;
+    stacked, labels above their values, the date written out (15 DE MARZO DE 2024).
+    """
+    bank = rng.choice(BANKS)
+    account = rng.randint(10 ** 9, 10 ** 10 - 1)
+    if layout == "bajio":
+        return [
+            (40, 750, 14, bank),
+            (40, 725, 9, "ESTADO DE CUENTA"),
+            (40, 700, 10, full_name),
+            (40, 686, 9, address[0]),
+            (40, 672, 9, address[1]),
+            (380, 700, 9, f"FECHA DE CORTE: {day:02d}/{MONTHS[month]}/{year}"),
+            (380, 686, 9, f"NO. DE CUENTA: {account}"),
+        ]
+    if layout == "labeled":
+        start = f"01/{month + 1:02d}/{year}"
+        return [
+            (40, 755, 13, bank),
+            (360, 755, 9, "ESTADO DE CUENTA INTEGRAL"),
+            (40, 715, 9, f"NOMBRE: {full_name}"),
+            (40, 701, 9, f"DOMICILIO: {address[0]}"),
+            (97, 687, 9, address[1]),
+            (40, 673, 9, f"RFC: {rng.choice('ABCDEFG')}XXX{year % 100:02d}0101XX{rng.randint(0, 9)}"),
+            (360, 715, 9, f"PERIODO: {start} AL {day:02d}/{month + 1:02d}/{year}"),
+            (360, 701, 9, f"CUENTA: {account}"),
+        ]
+    return [
+        (40, 752, 14, bank),
+        (40, 735, 8, "ESTADO DE CUENTA"),
+        (40, 712, 7, "CLIENTE"),
+        (40, 700, 10, full_name),
+        (40, 686, 9, address[0]),
+        (40, 673, 9, address[1]),
+        (400, 712, 7, "FECHA DE CORTE"),
+        (400, 700, 9, f"{day} DE {MONTH_NAMES[month]} DE {year}"),
+        (400, 680, 7, "NUMERO DE CUENTA"),
+        (400, 668, 9, str(account)),
+    ]
+
+
+def make_statement_pdf(person, pages=50, seed=0, name_on_every_page=False, layout="bajio"):
+    """
+    A bank statement: a header with the client's name, address and cut-off date on
+    the first page (see statement_header for the layouts), followed by pages of transactions.
+    Returns the PDF and the header fields, the date as DD/MMM/YYYY.
+    """
+    rng = random.Random(seed)
+    day, month, year = rng.randint(1, 28), rng.randrange(12), rng.randint(2022, 2025)
+    fecha_corte = f"{day:02d}/{MONTHS[month]}/{year}"
+    full_name = f"{person['first_names']} {person['last_names']}"
+    header = statement_header(layout, rng, full_name, person['address'], day, month, year)
+
+    page_list = []
+    for number in range(pages):
+        lines = list(header) if number == 0 or name_on_every_page else [(40, 750, 9, "ESTADO DE CUENTA")]
+        y = 640
+        while y > 60:
+            amount = rng.uniform(10, 25000)
+            concept = rng.choice(["SPEI RECIBIDO", "PAGO TARJETA", "COMPRA POS", "RETIRO CAJERO", "DEPOSITO"])
+            lines.append((40, y, 8, f"{rng.randint(1, 28):02d}/{MONTHS[month]} {concept} REF {rng.randint(10 ** 6, 10 ** 7)}"))
+            lines.append((460, y, 8, f"{amount:,.2f}"))
+            y -= 12
+        lines.append((280, 30, 7, f"PAGINA {number + 1} DE {pages}"))
+        page_list.append(lines)
+
+    return make_pdf(page_list), {'full_name': full_name, 'address': " ".join(person['address']), 'fecha_corte': fecha_corte}
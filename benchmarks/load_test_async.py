@@ -0,0 +1,93 @@
+"""
+Load test of the ASGI app (asgi_app.py) against a stubbed Ollama server.
+Each session posts one /chat-stream request; p50/p99 latency is reported per
+concurrency level.
+
+    python benchmarks/load_test_async.py --levels 50 200 1000 --token-delay 0.01
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx  # noqa: E402
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+async def session(client, stream):
+    start = time.perf_counter()
+    response = await client.post('/chat-stream', json={'message': 'Hola', 'stream': stream})
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def run_level(base_url, concurrency, stream):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as client:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(session(client, stream) for _ in range(concurrency)), return_exceptions=True)
+        wall = time.perf_counter() - start
+    latencies = [r for r in results if isinstance(r, float)]
+    errors = len(results) - len(latencies)
+    if not latencies:
+        print(f"{concurrency:5d} sessions  all {errors} failed")
+        return
+    print(f"{concurrency:5d} sessions  p50 {percentile(latencies, 50) * 1000:8.1f} ms  "
+          f"p99 {percentile(latencies, 99) * 1000:8.1f} ms  mean {statistics.mean(latencies) * 1000:8.1f} ms  "
+          f"wall {wall:6.2f}s  errors {errors}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--levels', type=int, nargs='+', default=[50, 200, 1000])
+    parser.add_argument('--token-delay', type=float, default=0.01)
+    parser.add_argument('--stream', action='store_true', help="use the SSE mode of /chat-stream")
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--ollama-port', type=int, default=11500)
+    args = parser.parse_args()
+
+    # the stub runs in its own process so it does not share the app's GIL
+    fake = subprocess.Popen([sys.executable, str(Path(__file__).parent / 'fake_ollama.py'),
+                             '--port', str(args.ollama_port), '--token-delay', str(args.token_delay)])
+    fake_url = f"http://127.0.0.1:{args.ollama_port}"
+
+    # the stub takes any number of streams; the per-backend and scheduler caps would turn this into a queueing test
+    os.environ.setdefault("OLLAMA_BACKEND_CONCURRENCY", "0")
+    os.environ.setdefault("GEN_MAX_CONCURRENCY", "100000")
+    # every session posts the same message; coalesced they would all ride on one generation
+    os.environ.setdefault("GEN_COALESCE", "0")
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+    from services.ollama_manager import AsyncOllamaClient
+    AsyncOllamaClient(host=fake_url)
+    from asgi_app import app
+
+    config = Config()
+    config.bind = [f"127.0.0.1:{args.port}"]
+    config.backlog = 4096
+    config.accesslog = None
+    shutdown = asyncio.Event()
+    server = asyncio.create_task(serve(app, config, shutdown_trigger=shutdown.wait))
+    await asyncio.sleep(0.5)
+
+    print(f"stub ollama per-token delay {args.token_delay * 1000:.0f} ms, stream={args.stream}")
+    for level in args.levels:
+        await run_level(f"http://127.0.0.1:{args.port}", level, args.stream)
+
+    shutdown.set()
+    await server
+    fake.terminate()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
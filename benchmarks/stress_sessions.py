@@ -0,0 +1,57 @@
+"""
+Throughput of FileTracker updates from many sessions in parallel, per session
+backend. That no session sees another one's upload state is checked by
+tests/test_session_store.py.
+
+    python benchmarks/stress_sessions.py --backend sqlite --sessions 200 --threads 32
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.file_tracker import FileTracker  # noqa: E402
+from services.session_store import InMemorySessionBackend, SQLiteSessionBackend, SessionStore  # noqa: E402
+
+
+def upload(store, session_id, kinds):
+    tracker = FileTracker(session_id, store=store)
+    for kind in kinds:
+        tracker.set_jpg() if kind == 'jpg' else tracker.set_pdf()
+        time.sleep(random.random() / 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--backend', choices=['memory', 'sqlite'], default='memory')
+    parser.add_argument('--sessions', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=32)
+    args = parser.parse_args()
+
+    if args.backend == 'sqlite':
+        backend = SQLiteSessionBackend(os.path.join(tempfile.mkdtemp(), 'sessions.db'))
+    else:
+        backend = InMemorySessionBackend()
+    store = SessionStore(backend, ttl=60)
+
+    rng = random.Random(3)
+    plan = {f"s{i}": rng.choice([['jpg'], ['pdf'], ['jpg', 'pdf'], ['pdf', 'jpg'], []]) for i in range(args.sessions)}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(lambda item: upload(store, *item), plan.items()))
+    elapsed = time.perf_counter() - start
+
+    updates = sum(len(kinds) for kinds in plan.values())
+    print(f"{args.backend}: {args.sessions} sessions, {updates} updates in {elapsed:.2f}s "
+          f"({updates / elapsed:.0f} updates/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,66 @@
-from google.cloud.sql.connector import Connector, IPTypes
-import pymysql
+from contextlib import contextmanager
 import sqlalchemy
+from sqlalchemy import event
 from dotenv import load_dotenv
+import logging
 import os
+import threading
+import time
+from services.metrics import REGISTRY, IN_FLIGHT, STAGE_SECONDS, Gauge
+
+CHECKOUT_SECONDS = REGISTRY.histogram(
+    "db_pool_checkout_seconds", "Time waiting for a connection from the database pool")
 
 load_dotenv()
 
+metadata = sqlalchemy.MetaData()
+
+id_records = sqlalchemy.Table(
+    "id_records", metadata,
+    sqlalchemy.Column("record_id", sqlalchemy.Integer, primary_key=True, autoincrement=True),
+    sqlalchemy.Column("full_name", sqlalchemy.String(255)),
+    sqlalchemy.Column("address", sqlalchemy.String(512)),
+    # the session (application) the ID was uploaded in; newest record first within a session
+    sqlalchemy.Column("session_id", sqlalchemy.String(64)),
+    sqlalchemy.Index("ix_id_records_session_id", "session_id", "record_id"),
+)
+
+estado_cuenta = sqlalchemy.Table(
+    "estado_cuenta", metadata,
+    sqlalchemy.Column("record_id", sqlalchemy.Integer, primary_key=True, autoincrement=True),
+    sqlalchemy.Column("full_name", sqlalchemy.String(255)),
+    sqlalchemy.Column("address", sqlalchemy.String(512)),
+    sqlalchemy.Column("fecha_corte", sqlalchemy.String(64)),
+)
+
+
 class DatabaseConnection:
+    """
+    Process-wide SQLAlchemy engine shared by the models, created on first use.
+    DB_BACKEND selects cloudsql (default), mysql (local server) or sqlite (offline testing).
+    """
+    _engine = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def pool_options():
+        return {
+            'pool_size': int(os.environ.get("DB_POOL_SIZE", 5)),
+            'max_overflow': int(os.environ.get("DB_MAX_OVERFLOW", 2)),
+            'pool_timeout': int(os.environ.get("DB_POOL_TIMEOUT", 30)),
+            'pool_recycle': int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+            'pool_pre_ping': True,
+        }
+
+    @staticmethod
     def connect_with_connector() -> sqlalchemy.engine.base.Engine:
         """
         Initializes a connection pool for a Cloud SQL instance of MySQL.
 
-        Uses the Cloud SQL Python Connector package.
+        Uses the Cloud SQL Python Connector package, imported here so the other backends never load it.
         """
+        from google.cloud.sql.connector import Connector, IPTypes
+        import pymysql
 
         instance_connection_name = os.environ[
             "INSTANCE_CONNECTION_NAME"
@@ -38,9 +86,104 @@ class DatabaseConnection:
         pool = sqlalchemy.create_engine(
         "mysql+pymysql://",
         creator=getconn,
-        pool_size=5,
-        max_overflow=2,
-        pool_timeout=30,
-        pool_recycle=1800
+        **DatabaseConnection.pool_options()
         )
         return pool
+
+    @staticmethod
+    def connect_with_url() -> sqlalchemy.engine.base.Engine:
+        """
+        Initializes a connection pool for a local MySQL server or a SQLite file.
+        """
+        backend = os.environ.get("DB_BACKEND")
+        if backend == "sqlite":
+            url = os.environ.get("DB_URL", "sqlite:///local.db")
+        else:
+            url = os.environ.get("DB_URL") or sqlalchemy.engine.URL.create(
+                "mysql+pymysql",
+                username=os.environ.get("DB_USER"),
+                password=os.environ.get("DB_PASSWORD"),
+                host=os.environ.get("DB_HOST", "127.0.0.1"),
+                port=int(os.environ.get("DB_PORT", 3306)),
+                database=os.environ.get("DB_NAME"),
+            )
+        return sqlalchemy.create_engine(url, **DatabaseConnection.pool_options())
+
+    @classmethod
+    def get_engine(cls) -> sqlalchemy.engine.base.Engine:
+        """Get the shared engine, creating it on first use"""
+        if cls._engine is None:
+            with cls._lock:
+                if cls._engine is None:
+                    if os.environ.get("DB_BACKEND", "cloudsql") == "cloudsql":
+                        engine = cls.connect_with_connector()
+                    else:
+                        engine = cls.connect_with_url()
+                    cls._instrument(engine)
+                    if hasattr(engine.pool, "checkedout"):
+                        IN_FLIGHT.attach(Gauge(engine.pool.checkedout), "db_pool_checked_out")
+                    if engine.dialect.name == "sqlite" or os.environ.get("DB_CREATE_SCHEMA"):
+                        metadata.create_all(engine)
+                    # the models always write and query session_id, whichever backend created the table
+                    cls._upgrade_schema(engine)
+                    cls._engine = engine
+        return cls._engine
+
+    @staticmethod
+    def _upgrade_schema(engine):
+        """
+        Add the columns and indexes that tables created by an older version are missing.
+        Idempotent, so it runs on every engine; another process upgrading at the same
+        time is not an error.
+        """
+        inspector = sqlalchemy.inspect(engine)
+        if not inspector.has_table("id_records"):
+            return
+        steps = []
+        if "session_id" not in {column["name"] for column in inspector.get_columns("id_records")}:
+            steps.append("ALTER TABLE id_records ADD COLUMN session_id VARCHAR(64)")
+        if "ix_id_records_session_id" not in {index["name"] for index in inspector.get_indexes("id_records")}:
+            steps.append("CREATE INDEX ix_id_records_session_id ON id_records (session_id, record_id)")
+        for step in steps:
+            logging.info(f"Upgrading the schema: {step}")
+            try:
+                with engine.begin() as connection:
+                    connection.execute(sqlalchemy.text(step))
+            except sqlalchemy.exc.OperationalError as e:
+                # a duplicate column or index left by another worker; anything else shows up on the first query
+                logging.warning(f"Schema upgrade step failed: {e}")
+
+    @classmethod
+    def _instrument(cls, engine):
+        @event.listens_for(engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - conn.info["query_start"].pop()
+            STAGE_SECONDS.labels("db").observe(elapsed)
+            if elapsed > float(os.environ.get("DB_SLOW_QUERY_SECONDS", 1.0)):
+                logging.warning(f"Slow query ({elapsed * 1000:.0f} ms): {statement}")
+
+    @classmethod
+    @contextmanager
+    def connection(cls):
+        """Check a connection out of the pool, recording how long the checkout waited"""
+        engine = cls.get_engine()
+        start = time.perf_counter()
+        conn = engine.connect()
+        CHECKOUT_SECONDS.labels().observe(time.perf_counter() - start)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @classmethod
+    def stats(cls):
+        pool = cls._engine.pool if cls._engine is not None else None
+        return {
+            'pool_status': pool.status() if pool is not None else None,
+            'checkout_wait': CHECKOUT_SECONDS.labels().snapshot(),
+            'query_latency': STAGE_SECONDS.labels("db").snapshot(),
+        }
@@ -0,0 +1,51 @@
+"""
+Production server for the Flask app:
+
+    gunicorn -c gunicorn.conf.py
+
+The app is imported once in the master (preload_app) and forked into the workers.
+Importing it is cheap: the OCR libraries, the database engine and the Ollama
+clients are only loaded when first used, and the Ollama clients are created
+after the fork in every worker. Each worker serves requests on GUNICORN_THREADS
+threads, and every SSE stream holds one of them until it ends.
+
+Sessions live in process memory unless SESSION_BACKEND=sqlite. Use that backend
+when WEB_CONCURRENCY is above 1, so every worker sees the same upload state.
+"""
+import os
+
+wsgi_app = "app:app"
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+preload_app = True
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 32))
+
+# generations are streamed for up to OLLAMA_ACQUIRE_TIMEOUT + the generation itself
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+loglevel = os.environ.get("LOG_LEVEL", "INFO").lower()
+
+
+def post_worker_init(worker):
+    """
+    Load the model and keep it loaded; threads and HTTP clients do not survive the fork, so per worker.
+    Loading a model can take longer than `timeout`, so it happens in the background while the
+    worker already serves requests (the first ones wait for the model as they would without it).
+    """
+    if os.environ.get("OLLAMA_WARMUP", "1") == "0":
+        return
+    import threading
+    from services.ai_service import Ollama
+    from services.ollama_manager import OllamaClient
+    client = OllamaClient()
+
+    def warmup():
+        client.warmup(Ollama.MODEL)
+        client.start_keep_alive(Ollama.MODEL)
+    threading.Thread(target=warmup, name="ollama-warmup", daemon=True).start()
@@ -1,7 +1,12 @@
 # main.py
+import os
 from app import app
+from services.ai_service import Ollama
 from services.ollama_manager import OllamaClient
 
 if __name__ == "__main__":
-    OllamaClient()
-    app.run(debug=True)
\ No newline at end of file
+    client = OllamaClient()
+    client.warmup(Ollama.MODEL)
+    client.start_keep_alive(Ollama.MODEL)
+    # the reloader runs this file again in a child process, which would warm up a second time
+    app.run(debug=True, use_reloader=False, port=int(os.environ.get("PORT", 5000)))
\ No newline at end of file
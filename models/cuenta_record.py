@@ -1,53 +1,83 @@
-from config.database import DatabaseConnection
-from mysql.connector import Error
+import logging
+from config.database import DatabaseConnection, estado_cuenta
+from services.write_behind import WriteBehindQueue, WriteBehindFull
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
 
 class CuentaRecord:
+    INSERT_QUERY = text("""
+        INSERT INTO estado_cuenta (full_name, address, fecha_corte)
+        VALUES (:full_name, :address, :fecha_corte)
+    """)
+
     def __init__(self, full_name=None, address=None, fecha_corte=None):
         self.full_name = full_name
         self.address = address
         self.fecha_corte = fecha_corte
         self.db = DatabaseConnection()
 
+    def to_row(self):
+        return {"full_name": self.full_name, "address": self.address, "fecha_corte": self.fecha_corte}
+
     def save(self):
         try:
-            connection = self.db.get_connection()
-            cursor = connection.cursor()
-            
-            query = """
-                INSERT INTO estado_cuenta (full_name, address, fecha_corte)
-                VALUES (%s, %s, %s)
-            """
-            values = (self.full_name, self.address, self.fecha_corte)
-            
-            cursor.execute(query, values)
-            connection.commit()
-            return cursor.lastrowid
-        except Error as e:
-            print(f"Error saving record: {e}")
+            with DatabaseConnection.connection() as connection:
+                result = connection.execute(self.INSERT_QUERY, self.to_row())
+                connection.commit()
+                return result.lastrowid
+        except SQLAlchemyError as e:
+            logging.error(f"Error saving record: {e}")
             return None
 
+    def save_later(self):
+        """
+        Queue the record on the WriteBehindQueue instead of waiting for the database, falling back
+        to save() when write-behind is off or the queue is full. Its id is only known once written.
+        """
+        if not WriteBehindQueue.enabled():
+            return self.save()
+        try:
+            WriteBehindQueue.get_instance().put("estado_cuenta", self.to_row())
+        except WriteBehindFull as e:
+            logging.warning(f"Saving the statement record synchronously: {e}")
+            return self.save()
+        return None
+
+    @staticmethod
+    def save_many(records):
+        """Insert several records in one multi-row statement, returns the number of rows written"""
+        if not records:
+            return 0
+        try:
+            with DatabaseConnection.connection() as connection:
+                connection.execute(estado_cuenta.insert(), [record.to_row() for record in records])
+                connection.commit()
+                return len(records)
+        except SQLAlchemyError as e:
+            logging.error(f"Error saving records: {e}")
+            return 0
+
     @staticmethod
     def get_by_id(record_id):
         try:
-            db = DatabaseConnection()
-            cursor = db.get_connection().cursor(dictionary=True)
-            
-            query = "SELECT * FROM id_records WHERE record_id = %s"
-            cursor.execute(query, (record_id,))
-            
-            return cursor.fetchone()
-        except Error as e:
-            print(f"Error retrieving record: {e}")
+            with DatabaseConnection.connection() as connection:
+                query = text("SELECT * FROM estado_cuenta WHERE record_id = :record_id")
+                result = connection.execute(query, {"record_id": record_id}).mappings().first()
+                return dict(result) if result else None
+        except SQLAlchemyError as e:
+            logging.error(f"Error retrieving record: {e}")
             return None
 
     @staticmethod
     def get_all():
+        """Every statement record, the ones still on the write-behind queue last and without an id"""
+        queued = []
+        if WriteBehindQueue.enabled():
+            queued = [{"record_id": None, **row} for row in WriteBehindQueue.get_instance().pending("estado_cuenta")]
         try:
-            db = DatabaseConnection()
-            cursor = db.get_connection().cursor(dictionary=True)
-            
-            cursor.execute("SELECT * FROM id_records")
-            return cursor.fetchall()
-        except Error as e:
-            print(f"Error retrieving records: {e}")
-            return []
\ No newline at end of file
+            with DatabaseConnection.connection() as connection:
+                result = connection.execute(text("SELECT * FROM estado_cuenta"))
+                return [dict(row) for row in result.mappings()] + queued
+        except SQLAlchemyError as e:
+            logging.error(f"Error retrieving records: {e}")
+            return queued
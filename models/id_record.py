@@ -1,45 +1,122 @@
-from config.database import DatabaseConnection
-from mysql.connector import Error
+import logging
+from config.database import DatabaseConnection, id_records
+from services.record_cache import RecordCache
+from services.write_behind import WriteBehindQueue, WriteBehindFull
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
 
 
 class IDRecord:
-    def __init__(self, full_name=None, address=None):
+    INSERT_QUERY = text("""
+        INSERT INTO id_records (full_name, address, session_id)
+        VALUES (:full_name, :address, :session_id)
+    """)
+
+    LAST_ENTRY_QUERY = text("""
+        SELECT * FROM id_records
+        ORDER BY record_id DESC
+        LIMIT 1
+    """)
+
+    # served by ix_id_records_session_id (session_id, record_id): an index seek, no sort
+    SESSION_QUERY = text("""
+        SELECT record_id, full_name, address, session_id FROM id_records
+        WHERE session_id = :session_id
+        ORDER BY record_id DESC
+        LIMIT 1
+    """)
+
+    def __init__(self, full_name=None, address=None, session_id=None):
         self.full_name = full_name
         self.address = address
+        self.session_id = session_id
         self.db = DatabaseConnection()
 
+    def to_row(self):
+        return {"full_name": self.full_name, "address": self.address, "session_id": self.session_id}
+
     def save(self):
+        """Insert the record; one saved in a session is also kept in the RecordCache for get_by_session"""
         try:
-            connection = DatabaseConnection.connect_with_connector()
-            cursor = connection.cursor()
-            
-            query = """
-                INSERT INTO id_records (full_name, address)
-                VALUES (%s, %s)
-            """
-            values = (self.full_name, self.address)
-            
-            cursor.execute(query, values)
-            connection.commit()
-            return cursor.lastrowid
-        except Error as e:
-            print(f"Error saving record in id_record: {e}")
+            with DatabaseConnection.connection() as connection:
+                result = connection.execute(self.INSERT_QUERY, self.to_row())
+                connection.commit()
+                if self.session_id:
+                    RecordCache.get_instance().put(
+                        "id_records", self.session_id, {"record_id": result.lastrowid, **self.to_row()})
+                return result.lastrowid
+        except SQLAlchemyError as e:
+            logging.error(f"Error saving record in id_record: {e}")
             return None
 
+    def save_later(self):
+        """
+        Queue the record on the WriteBehindQueue instead of waiting for the database, falling back
+        to save() when write-behind is off or the queue is full. Its id is only known once written.
+        """
+        if not WriteBehindQueue.enabled():
+            return self.save()
+        try:
+            WriteBehindQueue.get_instance().put("id_records", self.to_row())
+        except WriteBehindFull as e:
+            logging.warning(f"Saving the ID record synchronously: {e}")
+            return self.save()
+        if self.session_id:
+            RecordCache.get_instance().put("id_records", self.session_id, {"record_id": None, **self.to_row()})
+        return None
+
+    @staticmethod
+    def save_many(records):
+        """Insert several records in one multi-row statement, returns the number of rows written"""
+        if not records:
+            return 0
+        try:
+            with DatabaseConnection.connection() as connection:
+                connection.execute(id_records.insert(), [record.to_row() for record in records])
+                connection.commit()
+        except SQLAlchemyError as e:
+            logging.error(f"Error saving records in id_record: {e}")
+            return 0
+        # multi-row inserts do not report the ids, the cached copies go without one
+        cache = RecordCache.get_instance()
+        for record in records:
+            if record.session_id:
+                cache.put("id_records", record.session_id, {"record_id": None, **record.to_row()})
+        return len(records)
+
+    @staticmethod
+    def get_by_session(session_id):
+        """The newest ID record of a session, from the RecordCache or an index lookup; None if it has none"""
+        cache = RecordCache.get_instance()
+        cached = cache.get("id_records", session_id)
+        if cached is not None:
+            return cached
+        if WriteBehindQueue.enabled():
+            queued = [row for row in WriteBehindQueue.get_instance().pending("id_records")
+                      if row["session_id"] == session_id]
+            if queued:
+                return {"record_id": None, **queued[-1]}
+        try:
+            with DatabaseConnection.connection() as connection:
+                result = connection.execute(IDRecord.SESSION_QUERY, {"session_id": session_id}).mappings().first()
+        except SQLAlchemyError as e:
+            logging.error(f"Error retrieving the ID record of session {session_id}: {e}")
+            return None
+        if result is None:
+            return None
+        record = dict(result)
+        cache.put("id_records", session_id, record)
+        return record
+
     def get_last_entry(self):
+        if WriteBehindQueue.enabled():
+            queued = WriteBehindQueue.get_instance().pending("id_records")
+            if queued:
+                return {"record_id": None, **queued[-1]}
         try:
-            connection = DatabaseConnection.connect_with_connector()
-            cursor = connection.cursor(dictionary=True)
-
-            query = """
-                SELECT * FROM id_records
-                ORDER BY record_id DESC
-                LIMIT 1
-            """
-            
-            cursor.execute(query)
-            result = cursor.fetchone()
-            return result
-        except Error as e:
-            print(f"Error retrieving last entry: {e}")
-            return None
\ No newline at end of file
+            with DatabaseConnection.connection() as connection:
+                result = connection.execute(self.LAST_ENTRY_QUERY).mappings().first()
+                return dict(result) if result else None
+        except SQLAlchemyError as e:
+            logging.error(f"Error retrieving last entry: {e}")
+            return None
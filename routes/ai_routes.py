@@ -1,10 +1,52 @@
-from flask import request, current_app
+from flask import request, current_app, Response
 from flask_restful import Resource
 from services.ai_service import Ollama
 from services.localOCRService import OCRTextProcessor
+from services.ocr_pool import OCRWorkerPool, OCRQueueFull, OCRTimeout
 from services.file_tracker import FileTracker
-from flask import Response, stream_with_context
-import json
+from services.sse import stream_events, sse_response
+from services.response_cache import ResponseCache
+from services.extraction_cache import ExtractionCache
+from services.record_cache import RecordCache
+from services.faq_index import FAQIndex
+from services.write_behind import WriteBehindQueue
+from services.ollama_manager import OllamaClient
+from services.generation_scheduler import GenerationScheduler
+from services.metrics import REGISTRY
+from services.upload_ingest import upload_kind, discard_upload
+from werkzeug.exceptions import RequestEntityTooLarge
+from flask import stream_with_context
+import hmac
+import logging
+import os
+import uuid
+
+
+SESSION_HEADER = 'X-Session-Id'
+SESSION_COOKIE = 'session_id'
+ADMIN_HEADER = 'X-Admin-Token'
+
+def get_session_id(data=None):
+    """
+    Session id sent by the client in the X-Session-Id header, a session_id field or
+    the session_id cookie. A new one is issued when the client has none yet.
+    """
+    session_id = request.headers.get(SESSION_HEADER) or request.form.get('session_id')
+    if not session_id and data:
+        session_id = data.get('session_id')
+    return session_id or request.cookies.get(SESSION_COOKIE) or uuid.uuid4().hex
+
+
+def remember_session(response):
+    """
+    Set the session cookie to the id a response carries in X-Session-Id, so clients
+    that never read the header still keep their session on the next request
+    """
+    session_id = response.headers.get(SESSION_HEADER)
+    if session_id and request.cookies.get(SESSION_COOKIE) != session_id:
+        response.set_cookie(SESSION_COOKIE, session_id, max_age=int(os.environ.get("SESSION_TTL", 1800)),
+                            httponly=True, samesite='Lax')
+    return response
 
         
 class InitialGreetingV2(Resource):
@@ -15,31 +57,24 @@ class InitialGreetingV2(Resource):
         try:
             data = request.get_json()
             stream_mode = data.get('stream', False)
+            session_id = get_session_id(data)
             
             ollama_agent = Ollama()
             
             if stream_mode:
-                def generate():
-                    for chunk in ollama_agent.initial_greeting_stream():
-                        yield f"data: {json.dumps({'chunk': chunk})}\n\n"
-                
-                return Response(
-                    stream_with_context(generate()),
-                    mimetype='text/event-stream',
-                    headers={
-                        'Cache-Control': 'no-cache',
-                        'Connection': 'keep-alive',
-                        'Access-Control-Allow-Origin': '*'
-                    }
+                return sse_response(
+                    stream_with_context(stream_events(ollama_agent.initial_greeting_stream())),
+                    headers={SESSION_HEADER: session_id}
                 )
             else:
                 greeting = ollama_agent.initial_greeting()
                 return {
                     'message': 'Greeting generated successfully',
                     'data': {
-                        'greeting': greeting
+                        'greeting': greeting,
+                        'session_id': session_id
                     }
-                }, 201
+                }, 201, {SESSION_HEADER: session_id}
                 
         except Exception as e:
             return {'error': str(e)}, 500
@@ -59,53 +94,108 @@ class UploadFileStream(Resource):
             if file.filename == '':
                 return {'error': 'No selected file'}, 400
 
-            if not self.allowed_file(file.filename):
+            if upload_kind(file) is None:
+                discard_upload(file)
                 return {'error': 'Invalid file type. Only PDF and JPG are allowed'}, 400
             
-            llama_agent = Ollama()
+            session_id = get_session_id()
+            stream_mode = request.form.get('stream', '').lower() in ('1', 'true')
+            use_llm = self.llm_status_requested(request.form)
 
-            if file.filename.lower().endswith('.pdf'):
-                result = OCRTextProcessor.extract_name_from_EdoCta(file)
-                print("First Names:", result)
-                FileTracker.set_pdf()
-                
-                status_generator = llama_agent.generate_file_status_message_stream(client_name=result)
-                status_message = "".join(chunk for chunk in status_generator)
-                
+            if request.form.get('async', '').lower() in ('1', 'true'):
+                job_id = OCRWorkerPool.get_instance().start_job(self.run_job, file.stream, session_id, use_llm)
+                # the job owns the upload from here on, the end of the request must not delete it
+                file.stream.detach()
                 return {
-                    'message': 'PDF file uploaded successfully',
+                    'message': 'File accepted for processing',
                     'data': {
-                        'extracted_names': result,
-                        'status': status_message
+                        'job_id': job_id,
+                        'session_id': session_id
                     }
-                }, 200
+                }, 202, {SESSION_HEADER: session_id}
 
-            elif file.filename.lower().endswith(('.jpg', '.jpeg')):
-                result = OCRTextProcessor.extractIDData(file)
-                print(result.get('first_names'))
-                FileTracker.set_jpg()
-                
-                status_generator = llama_agent.generate_file_status_message_stream(result.get('first_names'))
-                status_message = "".join(chunk for chunk in status_generator)
-                
-                return {
-                    'message': 'JPG file uploaded successfully',
-                    'data': {
-                        'extracted_names': result,
-                        'status': status_message
-                    }
-                }, 200
+            try:
+                kind, result, client_name = self.process_document(file, session_id)
+            finally:
+                discard_upload(file)
 
-            return {'message': 'File uploaded successfully'}, 200
-            
+            llama_agent = Ollama()
+            status_generator = llama_agent.generate_file_status_message_stream(
+                client_name, session_id=session_id, use_llm=use_llm
+            )
+            if stream_mode:
+                return self.stream_status(result, status_generator, session_id)
+            status_message = "".join(chunk for chunk in status_generator)
+
+            return {
+                'message': f'{kind} file uploaded successfully',
+                'data': {
+                    'extracted_names': result,
+                    'status': status_message,
+                    'session_id': session_id
+                }
+            }, 200, {SESSION_HEADER: session_id}
+
+        except RequestEntityTooLarge as e:
+            return {'error': e.description}, 413
+        except OCRQueueFull:
+            return {'error': 'Too many documents are being processed, please retry shortly'}, 503, {'Retry-After': '5'}
+        except OCRTimeout as e:
+            return {'error': str(e)}, 504
         except Exception as e:
             current_app.logger.error(f"Error generating response: {str(e)}")
             return {'error': f'Failed to generate response: {str(e)}'}, 500
-        
-    ALLOWED_EXTENSIONS = {'pdf', 'jpg', 'jpeg'}
-    def allowed_file(self, filename):
-        return '.' in filename and filename.rsplit('.', 1)[1].lower() in self.ALLOWED_EXTENSIONS
-    
+
+    @staticmethod
+    def process_document(file, session_id):
+        """
+        Extracts the data of an uploaded INE photo or bank statement and records it in the session.
+        The kind of document is sniffed from its content, whatever its filename says.
+        Returns the document kind, the extraction result and the client name for the status message.
+        """
+        file_tracker = FileTracker(session_id)
+
+        if upload_kind(file) == 'pdf':
+            result = OCRTextProcessor.extract_name_from_EdoCta(file, session_id)
+            logging.debug(f"Name found in the statement: {result}")
+            file_tracker.set_pdf()
+            return 'PDF', result, result
+
+        result = OCRTextProcessor.extractIDData(file, session_id)
+        logging.debug(f"First names read from the ID: {result.get('first_names')}")
+        file_tracker.set_jpg()
+        return 'JPG', result, result.get('first_names')
+
+    @staticmethod
+    def llm_status_requested(form):
+        """llm_status=true asks for a model-written status message, absent leaves it to STATUS_RESPONDER"""
+        value = form.get('llm_status', '').lower()
+        return (value in ('1', 'true')) if value else None
+
+    @classmethod
+    def run_job(cls, upload, session_id, use_llm=None):
+        """Background (async mode) processing of a detached upload, polled through /ocr-jobs/<job_id>"""
+        try:
+            kind, result, client_name = cls.process_document(upload, session_id)
+        finally:
+            upload.discard()
+        status_generator = Ollama().generate_file_status_message_stream(client_name, session_id=session_id, use_llm=use_llm)
+        return {
+            'message': f'{kind} file uploaded successfully',
+            'extracted_names': result,
+            'status': "".join(chunk for chunk in status_generator),
+            'session_id': session_id
+        }
+
+    def stream_status(self, result, status_generator, session_id):
+        """Send the extracted names first, then relay the status message as it is generated"""
+        def events():
+            yield {'extracted_names': result, 'session_id': session_id}
+            yield from status_generator
+            yield {'done': True}
+
+        return sse_response(stream_with_context(stream_events(events())), headers={SESSION_HEADER: session_id})
+
 
 
 class ChatWithLlamaStream(Resource):
@@ -116,9 +206,18 @@ class ChatWithLlamaStream(Resource):
                 return {'error': 'Message is required'}, 400
                 
             message = data.get('message')
+            session_id = get_session_id(data)
+            stream_mode = data.get('stream', False)
             
             ollama = Ollama()
-            response_generator = ollama.get_response_stream(message)
+            response_generator = ollama.get_response_stream(message, session_id=session_id, faq=True)
+
+            if stream_mode:
+                def events():
+                    yield from response_generator
+                    yield {'done': True, 'session_id': session_id}
+
+                return sse_response(stream_with_context(stream_events(events())), headers={SESSION_HEADER: session_id})
             
             if hasattr(response_generator, '__iter__') and not isinstance(response_generator, (str, list, dict)):
                 response = "".join(chunk for chunk in response_generator)
@@ -131,10 +230,138 @@ class ChatWithLlamaStream(Resource):
                 'message': 'Response generated successfully',
                 'data': {
                     'response': response,
-                    'status_update': status_message
+                    'status_update': status_message,
+                    'session_id': session_id
                 }
-            }, 200
+            }, 200, {SESSION_HEADER: session_id}
             
         except Exception as e:
             current_app.logger.error(f"Error in ChatWithLlamaStream: {str(e)}")
-            return {'error': f'Failed to generate response: {str(e)}'}, 500
\ No newline at end of file
+            return {'error': f'Failed to generate response: {str(e)}'}, 500
+
+
+class CacheStats(Resource):
+    def get(self):
+        """
+        Hit/miss counters of the LLM response cache, the document extraction cache, the ID record cache
+        and the FAQ answers
+        """
+        return {
+            'response_cache': ResponseCache.get_instance().stats(),
+            'extraction_cache': ExtractionCache.get_instance().stats(),
+            'record_cache': RecordCache.get_instance().stats(),
+            'faq_index': FAQIndex.get_instance().stats()
+        }, 200
+
+
+class FAQAdmin(Resource):
+    """
+    Vetted answers of the FAQIndex. Every method needs the FAQ_ADMIN_TOKEN in the
+    X-Admin-Token header; without FAQ_ADMIN_TOKEN set the endpoint is disabled.
+    Entries are {"id": ..., "questions": [...], "answer": ...}.
+    """
+
+    @staticmethod
+    def authorized():
+        token = os.environ.get("FAQ_ADMIN_TOKEN")
+        return bool(token) and hmac.compare_digest(request.headers.get(ADMIN_HEADER, ''), token)
+
+    def dispatch_request(self, *args, **kwargs):
+        if not self.authorized():
+            return {'error': 'Not authorized'}, 403
+        try:
+            return super().dispatch_request(*args, **kwargs)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+
+    def get(self):
+        """
+        Every entry and the hit counters
+        """
+        index = FAQIndex.get_instance()
+        return {'entries': index.entries(), 'stats': index.stats()}, 200
+
+    def put(self):
+        """
+        Seed: replace every entry with {"entries": [...]}
+        """
+        index = FAQIndex.get_instance()
+        index.save((request.get_json(silent=True) or {}).get('entries'))
+        return {'stats': index.stats()}, 200
+
+    def post(self):
+        """
+        Refresh: add or replace entries by id with {"entries": [...]}, or with {"reload": true}
+        rebuild the index from the FAQ file edited by hand
+        """
+        data = request.get_json(silent=True) or {}
+        index = FAQIndex.get_instance()
+        if data.get('reload'):
+            if not index.reload():
+                raise ValueError(f"{index.path} is not a valid FAQ file, the index was not changed")
+        else:
+            index.upsert(data.get('entries'))
+        return {'stats': index.stats()}, 200
+
+    def delete(self):
+        """
+        Remove the entries of {"ids": [...]}
+        """
+        ids = (request.get_json(silent=True) or {}).get('ids')
+        if not isinstance(ids, list):
+            raise ValueError("ids must be a list")
+        index = FAQIndex.get_instance()
+        index.delete(ids)
+        return {'stats': index.stats()}, 200
+
+
+
+class OCRJobStatus(Resource):
+    def get(self, job_id):
+        """
+        Status of an upload sent in async mode
+        """
+        job = OCRWorkerPool.get_instance().get_job(job_id)
+        if job is None:
+            return {'error': 'Unknown job id'}, 404
+        return job, 200
+
+
+class OCRStats(Resource):
+    def get(self):
+        """
+        Queue depth and per-job CPU time of the OCR worker pool
+        """
+        return {'ocr_pool': OCRWorkerPool.get_instance().stats()}, 200
+
+
+class OllamaStats(Resource):
+    def get(self):
+        """
+        Health and outstanding requests of every Ollama backend
+        """
+        return {'ollama_pool': OllamaClient().pool.stats()}, 200
+
+
+class GenerationStats(Resource):
+    def get(self):
+        """
+        Active and queued generations per priority class, coalesced prompts and queue-wait histograms
+        """
+        return {'generation_scheduler': GenerationScheduler.get_instance().stats()}, 200
+
+
+class WriteBehindStats(Resource):
+    def get(self):
+        """
+        Rows waiting on the write-behind queue, rows written, retried, set aside and recovered from a spool
+        """
+        return {'write_behind': WriteBehindQueue.get_instance().stats()}, 200
+
+
+class Metrics(Resource):
+    def get(self):
+        """
+        Every metric in the Prometheus text format
+        """
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
@@ -1,74 +1,125 @@
 from dotenv import load_dotenv
 from services.file_tracker import FileTracker
-from services.ollama_manager import OllamaClient
+from services.ollama_manager import OllamaClient, keep_alive_setting
+from services.prompts import PromptRegistry
+from services.response_cache import ResponseCache, iter_chunks
+from services.conversation_memory import ConversationMemory
+from services.faq_index import FAQIndex
+from services.generation_scheduler import GenerationScheduler, GenerationQueueTimeout
+from services.metrics import GenerationMetrics
+from services.status_responder import StatusResponder
 import logging
 
 
 load_dotenv()  
 
 class Ollama:
-    def __init__(self, host="http://localhost:11434", temperature=0.1):
+    MODEL = "llama3.1"
+
+    DEFAULT_SYSTEM_PROMPT = PromptRegistry.render('default')
+
+    DEFAULT_STREAM_SYSTEM_PROMPT = PromptRegistry.render('chat')
+
+    # Answered at once when the GenerationScheduler queue is too long
+    BUSY_MESSAGE = "En este momento estamos atendiendo a muchos clientes. Por favor intente de nuevo en unos momentos."
+
+    def __init__(self, host=None, temperature=0.1):
         self.client_manager = OllamaClient(host=host)
         self.client = self.client_manager.get_client()
         self.temperature = temperature
+        self.keep_alive = keep_alive_setting()
+
+    def build_chat(self, message, system_prompt, num_predict, history=None):
+        """Messages and options for one chat call, with earlier turns of the conversation if given"""
+        messages = [
+            {"role": "system", "content": system_prompt},
+            *(history or []),
+            {"role": "user", "content": message}
+        ]
+        options = {
+            "temperature": self.temperature,
+            'num_predict': num_predict
+        }
+        return messages, options
+
+    def chat_once(self, messages, options):
+        """Generator with the whole reply of a non-streamed chat call, as the GenerationScheduler expects"""
+        metrics = GenerationMetrics()
+        try:
+            response = self.client.chat(
+                model=self.MODEL,
+                messages=messages,
+                options=options,
+                keep_alive=self.keep_alive
+            )
+            metrics.chunk(response)
+        finally:
+            metrics.finish()
+        yield response['message']['content']
+
+    def chat_stream(self, messages, options):
+        """Generator with the content of every chunk of a streamed chat call"""
+        metrics = GenerationMetrics()
+        response = None
+        try:
+            response = self.client.chat(
+                model=self.MODEL,
+                messages=messages,
+                stream=True,
+                options=options,
+                keep_alive=self.keep_alive
+            )
+            for chunk in response:
+                metrics.chunk(chunk)
+                if 'message' in chunk and 'content' in chunk['message']:
+                    yield chunk['message']['content']
+        finally:
+            metrics.finish()
+            # Closing the ollama stream drops the HTTP response and stops the generation
+            if hasattr(response, 'close'):
+                response.close()
         
     # =============================================================================
     #
     #   NON-STREAMING RESPONSES
     #
     # =============================================================================
-    def get_responseV2(self, message, custom_system_prompt=None):
+    def get_responseV2(self, message, custom_system_prompt=None, cacheable=False, priority='chat'):
         """
-        Gets a response from the Llama 3.1 model using Ollama library
+        Gets a response from the Llama 3.1 model using Ollama library.
+        Cacheable prompts are answered from the ResponseCache when possible.
+        The call waits for a GenerationScheduler slot in the `priority` class.
         """
         try:
-            system_prompt = custom_system_prompt if custom_system_prompt else (
-                "Eres un asistente pragmatico que trabaja como empleado de un banco."
-                "Tu tarea es guiar a los usuarios en el proceso de solicitud de un préstamo."
-                "Para continuar con el proceso, necesitan subir dos documentos: una foto de su INE y un PDF de su estado de cuenta. "
-                "No le preguntes al cliente nada."
-                "No preguntes si quiere continuar."
-                "Si preguntan cuánto dinero le van a prestar, dí que el primer paso es aplicar."
-                "Si piden hablar con un humano, convéncelos de que tu ayuda es la manera más rápida y eficiente de obtener información."
-                "Solamente existe un solo tipo de credito: credito empresarial."
-                "Nunca asumas que el banco dara un credito, primero se deben de estudiar sus documentos."
-                "Responde de manera clara, concisa y profesional en español."
-            )
-            
-            response = self.client.chat(
-                model="llama3.1",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": message}
-                ],
-                options= {
-                    "temperature": self.temperature,
-                    'num_predict': 100
-                }
-            )
-            
-            return response['message']['content']
+            system_prompt = custom_system_prompt if custom_system_prompt else self.DEFAULT_SYSTEM_PROMPT
+            messages, options = self.build_chat(message, system_prompt, num_predict=100)
+
+            cache = ResponseCache.get_instance()
+            prompt_key = ResponseCache.make_key(self.MODEL, messages, options)
+            cache_key = prompt_key if cacheable else None
+            if cache_key:
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    return cached
+
+            scheduler = GenerationScheduler.get_instance()
+            # only the request that starts a generation caches it, not every one coalesced onto it
+            store = (lambda text: cache.put(cache_key, text)) if cache_key else None
+            return "".join(scheduler.stream(priority, f"once-{prompt_key}", lambda: self.chat_once(messages, options),
+                                            on_complete=store))
+
+        except GenerationQueueTimeout as e:
+            logging.warning(f"Answered with the busy message: {e}")
+            return self.BUSY_MESSAGE
         
         except Exception as e:
             logging.error(f"Error getting response from Ollama: {e}")
             return "No se pudo generar una respuesta."
     
     def initial_greeting(self):
-        system_prompt = (
-            "El cliente acaba de entrar a una plática contigo y debes decirle 'buen día.'\n"
-            "Mencionale al cliente que estás aqui para ayudarle a llevar a cabo el primer paso para aplicar para un crédito empresarial.\n"
-            "Menciona que si decide continuar, BanBajio mantendrá su información privada.\n"
-            "Mencionale al cliente que consulte nuestro aviso de privacidad.\n"
-            "No agregues información adicional que no esté relacionada con la aplicación a un crédito.\n"
-            "No des instrucciones, tu primer mensaje debe de ser de bienvenida y que puedes ayduar para aplicar a un crédito.\n"
-            "No felicites al cliente. Tu personalidad es de un asistente serio y profesional.\n"
-            "Si preguntan cuánto dinero le van a prestar, explícales que el primer paso es aplicar.\n"
-            "Si te dice que quiere una cantidad de dinero, menciona que lo primero es llevar a cabo el proceso de aplicación.\n"
-            "Si piden hablar con un humano, convéncelos de que tu ayuda es la manera más rápida y eficiente de obtener información.\n"
-            "Responde de manera clara, concisa y profesional en español.\n"
-        )
-        message = "Dale la bienvenida al cliente, menciona que estas aqui para ayudarle a aplicar a un crédito empresarial."
-        return self.get_responseV2(message, system_prompt)
+        system_prompt = PromptRegistry.render('greeting')
+        message = PromptRegistry.message('greeting')
+        return self.get_responseV2(message, system_prompt, cacheable=True, priority='greeting')
     
 
     # =============================================================================
@@ -76,47 +127,57 @@ class Ollama:
     #   STREAMING RESPONSES
     #
     # =============================================================================
-    def get_response_stream(self, message, custom_system_prompt=None):
+    def get_response_stream(self, message, custom_system_prompt=None, cacheable=False, session_id=None, priority='chat', faq=False):
         """
-        Returns a generator that yields streamed responses
+        Returns a generator that yields streamed responses.
+        Cacheable prompts are replayed in chunks from the ResponseCache when possible.
+        With a session_id the conversation so far is sent along and the new exchange is recorded.
+        With faq set, a message close enough to a question of the FAQIndex gets its vetted
+        answer without calling the model.
+        The generation waits for a GenerationScheduler slot in the `priority` class, and is
+        shared with identical prompts already in flight.
         """
         try:
-            system_prompt = custom_system_prompt if custom_system_prompt else (
-                "Eres un asistente que trabaja como empleado del banco BanBajio.\n"
-                "Tu tarea es guiar a los usuarios en el proceso de solicitud de un préstamo.\n"
-                "Menciona que se debe subir una foto de su INE y estado de cuenta.\n"
-                "No le preguntes nada al cliente.\n"
-                "Nunca preguntes si quiere continuar.\n"
-                "No pidas documentos adicionales.\n"
-                "No hables sobre evaluar su dinero.\n"
-                "No hables mucho, manten tus respuestas muy cortas y concisas.\n"
-                "Nunca hables sobre cantidad de prestamo.\n"
-                "Si dice que sí quiere continuar, pídele una foto de su INE.\n"
-                "Si preguntan cuánto dinero le van a prestar, explícales que el banco debe revisar sus documentos primero.\n"
-                "Si piden hablar con un humano, convéncelos de que tu ayuda es la manera más rápida y eficiente de obtener información.\n"
-                "Si pregunta por la privacidad de sus documentos, menciona que lean nuestro aviso de privacidad.\n"
-                "Solamente existe un solo tipo de credito: credito empresarial.\n"
-                "Nunca menciones cantidad de préstamo.\n"
-                "Si preguntan cuanto dinero le van a prestar, menciona que primero hay que aplicar.\n"
-                "No preguntes si tiene alguna pregunta.\n"
-                "Responde de manera clara, concisa y profesional en español."
-            )
-            response = self.client.chat(
-                model="llama3.1",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": message}
-                ],
-                stream=True,
-                options={
-                    "temperature": self.temperature,
-                    'num_predict': 150
-                }
-            )
+            system_prompt = custom_system_prompt if custom_system_prompt else self.DEFAULT_STREAM_SYSTEM_PROMPT
+            memory = ConversationMemory(session_id) if session_id else None
+            answer = FAQIndex.get_instance().match(message) if faq and FAQIndex.enabled() else None
+            if answer is not None:
+                if memory:
+                    memory.record(message, answer)
+                yield from iter_chunks(answer)
+                return
+
+            history = memory.build_history() if memory else None
+            messages, options = self.build_chat(message, system_prompt, num_predict=150, history=history)
+
+            cache = ResponseCache.get_instance()
+            prompt_key = ResponseCache.make_key(self.MODEL, messages, options)
+            cache_key = prompt_key if cacheable else None
+            if cache_key:
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    yield from iter_chunks(cached)
+                    return
+
+            scheduler = GenerationScheduler.get_instance()
+            store = (lambda text: cache.put(cache_key, text)) if cache_key else None
+            chunks = scheduler.stream(priority, f"stream-{prompt_key}", lambda: self.chat_stream(messages, options),
+                                      on_complete=store)
             
-            for chunk in response:
-                if 'message' in chunk and 'content' in chunk['message']:
-                    yield chunk['message']['content']
+            generated = []
+            try:
+                for chunk in chunks:
+                    generated.append(chunk)
+                    yield chunk
+                if memory:
+                    memory.record(message, "".join(generated))
+            finally:
+                # Leaving the shared generation stops it once no other request is reading it
+                chunks.close()
+
+        except GenerationQueueTimeout as e:
+            logging.warning(f"Answered with the busy message: {e}")
+            yield self.BUSY_MESSAGE
         
         except Exception as e:
             logging.error(f"Error streaming response from Ollama: {e}")
@@ -124,83 +185,32 @@ class Ollama:
 
 
     def initial_greeting_stream(self):
-        system_prompt = (
-            "El cliente acaba de entrar a una plática contigo y debes decirle 'buen día.'"
-            "Mencionale al cliente que estás aqui para ayudarle a llevar a cabo el primer paso para aplicar para un crédito empresarial."
-            "Tienes que mencionar que sus documentos se usarán únicamente para iniciar el proceso de aplicación de crédito, puede encontrar más infomracion en el aviso de privacidad."
-            "No agregues información adicional que no esté relacionada con la aplicación a un crédito."
-            "No des instrucciones, tu primer mensaje debe de ser de bienvenida y que puedes ayduar para aplicar para un crédito."
-            "No felicites al cliente. Tu personalidad es de un agente serio y profesional."
-            "Si preguntan cuánto dinero le van a prestar, explícales que el banco debe revisar sus documentos primero."
-            "Si te dice que quiere una cantidad de dinero, menciona que lo primero es llevar a cabo el proceso de aplicación."
-            "Si piden hablar con un humano, convéncelos de que tu ayuda es la manera más rápida y eficiente de obtener información."
-            "Solamente existe un solo tipo de credito."
-            "Responde de manera clara, concisa y profesional en español."
-        )
-        message = "Dale la bienvenida al cliente, menciona que estas aqui para ayudarle a aplicar a un crédito empresarial."
-        return self.get_response_stream(message, system_prompt)
+        system_prompt = PromptRegistry.render('greeting_stream')
+        message = PromptRegistry.message('greeting')
+        return self.get_response_stream(message, system_prompt, cacheable=True, priority='greeting')
     
     
-    def generate_file_status_message_stream(self, client_name=None):
+    def template_stream(self, text):
+        yield text
+
+    def generate_file_status_message_stream(self, client_name=None, session_id=None, use_llm=None):
             """
-            Generate a specific message about the current file upload status
+            Generate a specific message about the current file upload status of a session.
+            Rendered from the StatusResponder templates unless use_llm (STATUS_RESPONDER=llm by default)
+            asks for a model generation.
             """
             
-            system_prompt_base = (
-                "Eres un asistente que trabaja como empleado del banco BanBajio.\n"
-                "Tu trabajo es informarle al cliente sobre el estado de los documentos que ha subido para su solicitud.\n"
-                "Los documentos se suben por medio de ti.\n"
-                "No agregues información adicional que no esté relacionada con el estado de los documentos.\n"
-                "No des instrucciones de cómo subir los documentos.\n"
-                "No felicites al cliente. Tu personalidad es de un agente serio y profesional.\n"
-                "Si preguntan cuánto dinero le van a prestar, explícales que el banco debe revisar sus documentos primero.\n"
-                "Si preguntan sobre privacidad, haz referencia al aviso de privacidad.\n"
-                "Si piden hablar con un humano, convéncelos de que tu ayuda es la manera más rápida y eficiente de obtener información.\n"
-                "Solamente existe un solo tipo de credito.\n"
-                "No menciones nada sobre la situacion fiscal del cliente.\n"
-                "Responde de manera clara, concisa y profesional en español."
-            )
+            file_tracker = FileTracker(session_id)
+            state = StatusResponder.state(file_tracker.get_jpg_status(), file_tracker.get_pdf_status())
 
-            has_jpg = FileTracker.get_jpg_status()
-            has_pdf = FileTracker.get_pdf_status()
-            
-            if has_jpg and has_pdf:
-                system_prompt = (
-                    f"{system_prompt_base}\n"
-                    "Eres un asistente que trabaja como empleado del banco BanBajio.\n"
-                    f"El cliente {client_name} ha subido ambos documentos requeridos.\n"
-                    "Usa su nombre para dirigirte a el.\n"
-                    "Menciona que su solicitud está completa y lista para ser revizada por un experto de nuestro equipo.\n"
-                    "Mencionale que un representante del banco se pondra en contacto con el pronto.\n"
-                    "Genera una respuesta corta."
-                )
-
-            elif has_jpg:
-                system_prompt = (
-                    f"{system_prompt_base}\n"
-                    f"El cliente {client_name} ha subido su identificación.\n"
-                    "Usa su nombre para dirigirte a el.\n"
-                    "Ya has hablado con el antes, no des la bienvenida.\n"
-                    "Solamente di que falta subir su estado de cuenta.\n"
-                    "Menciona que el siguiente paso es subir su estado de cuenta."
-                    "Genera una respuesta corta."
-                )
-
-            elif has_pdf:
-                system_prompt = (
-                    f"{system_prompt_base}\n"
-                    f"El cliente ha subido su estado de cuenta.\n" 
-                    "Menciona que solo falta subir una foto de su INE para continuar."
-                    "Genera una respuesta corta."
-                )
+            if not (StatusResponder.use_llm() if use_llm is None else use_llm):
+                return self.template_stream(StatusResponder.render(state, client_name, session_id))
 
+            if state in ('both', 'jpg'):
+                system_prompt = PromptRegistry.render(f'status_{state}', client_name=client_name)
             else:
-                system_prompt = (
-                    f"{system_prompt_base}\n"
-                    f"El cliente aún no ha subido ningún documento.\n" 
-                    "Recuerdale que para continuar se requiere de una fotografia de su INE y una copia de su estado de cuenta.\n"
-                )
+                system_prompt = PromptRegistry.render(f'status_{state}')
 
-            message = "Cual es el estado actual de mis documentos?"
+            message = PromptRegistry.message('status')
             
-            return self.get_response_stream(message, custom_system_prompt=system_prompt)
\ No newline at end of file
+            return self.get_response_stream(message, custom_system_prompt=system_prompt, cacheable=True, priority='status')
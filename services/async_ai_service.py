@@ -0,0 +1,139 @@
+import logging
+
+from services.ai_service import Ollama
+from services.conversation_memory import ConversationMemory
+from services.faq_index import FAQIndex
+from services.generation_scheduler import GenerationScheduler, GenerationQueueTimeout
+from services.metrics import GenerationMetrics
+from services.ollama_manager import AsyncOllamaClient, keep_alive_setting
+from services.response_cache import ResponseCache, iter_chunks
+
+
+class AsyncOllama(Ollama):
+    """
+    Same prompts and response cache as Ollama, served through ollama.AsyncClient.
+    initial_greeting returns a coroutine and the *_stream methods return async generators.
+    """
+
+    def __init__(self, host=None, temperature=0.1):
+        self.client_manager = AsyncOllamaClient(host=host)
+        self.client = self.client_manager.get_client()
+        self.temperature = temperature
+        self.keep_alive = keep_alive_setting()
+
+    async def chat_once(self, messages, options):
+        metrics = GenerationMetrics()
+        try:
+            response = await self.client.chat(
+                model=self.MODEL,
+                messages=messages,
+                options=options,
+                keep_alive=self.keep_alive
+            )
+            metrics.chunk(response)
+        finally:
+            metrics.finish()
+        yield response['message']['content']
+
+    async def chat_stream(self, messages, options):
+        metrics = GenerationMetrics()
+        response = None
+        try:
+            response = await self.client.chat(
+                model=self.MODEL,
+                messages=messages,
+                stream=True,
+                options=options,
+                keep_alive=self.keep_alive
+            )
+            async for chunk in response:
+                metrics.chunk(chunk)
+                if 'message' in chunk and 'content' in chunk['message']:
+                    yield chunk['message']['content']
+        finally:
+            metrics.finish()
+            if hasattr(response, 'aclose'):
+                await response.aclose()
+
+    async def template_stream(self, text):
+        yield text
+
+    async def get_responseV2(self, message, custom_system_prompt=None, cacheable=False, priority='chat'):
+        """
+        Gets a response from the Llama 3.1 model without blocking the event loop
+        """
+        try:
+            system_prompt = custom_system_prompt if custom_system_prompt else self.DEFAULT_SYSTEM_PROMPT
+            messages, options = self.build_chat(message, system_prompt, num_predict=100)
+
+            cache = ResponseCache.get_instance()
+            prompt_key = ResponseCache.make_key(self.MODEL, messages, options)
+            cache_key = prompt_key if cacheable else None
+            if cache_key:
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    return cached
+
+            scheduler = GenerationScheduler.get_instance()
+            store = (lambda text: cache.put(cache_key, text)) if cache_key else None
+            return "".join([chunk async for chunk in scheduler.astream(
+                priority, f"once-{prompt_key}", lambda: self.chat_once(messages, options), on_complete=store)])
+
+        except GenerationQueueTimeout as e:
+            logging.warning(f"Answered with the busy message: {e}")
+            return self.BUSY_MESSAGE
+
+        except Exception as e:
+            logging.error(f"Error getting response from Ollama: {e}")
+            return "No se pudo generar una respuesta."
+
+    async def get_response_stream(self, message, custom_system_prompt=None, cacheable=False, session_id=None, priority='chat', faq=False):
+        """
+        Async generator that yields streamed responses, answered from the FAQIndex when faq is set
+        """
+        try:
+            system_prompt = custom_system_prompt if custom_system_prompt else self.DEFAULT_STREAM_SYSTEM_PROMPT
+            memory = ConversationMemory(session_id) if session_id else None
+            answer = FAQIndex.get_instance().match(message) if faq and FAQIndex.enabled() else None
+            if answer is not None:
+                if memory:
+                    memory.record(message, answer)
+                for chunk in iter_chunks(answer):
+                    yield chunk
+                return
+
+            history = memory.build_history() if memory else None
+            messages, options = self.build_chat(message, system_prompt, num_predict=150, history=history)
+
+            cache = ResponseCache.get_instance()
+            prompt_key = ResponseCache.make_key(self.MODEL, messages, options)
+            cache_key = prompt_key if cacheable else None
+            if cache_key:
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    for chunk in iter_chunks(cached):
+                        yield chunk
+                    return
+
+            scheduler = GenerationScheduler.get_instance()
+            store = (lambda text: cache.put(cache_key, text)) if cache_key else None
+            chunks = scheduler.astream(priority, f"stream-{prompt_key}", lambda: self.chat_stream(messages, options),
+                                       on_complete=store)
+
+            generated = []
+            try:
+                async for chunk in chunks:
+                    generated.append(chunk)
+                    yield chunk
+                if memory:
+                    memory.record(message, "".join(generated))
+            finally:
+                await chunks.aclose()
+
+        except GenerationQueueTimeout as e:
+            logging.warning(f"Answered with the busy message: {e}")
+            yield self.BUSY_MESSAGE
+
+        except Exception as e:
+            logging.error(f"Error streaming response from Ollama: {e}")
+            yield "Error: No se pudo generar una respuesta."
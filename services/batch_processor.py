@@ -0,0 +1,310 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+from services.localOCRService import ocr_id_image
+from services.name_index import NameIndex
+from services.ocr_pool import available_cores
+from services.statement_parser import parse_statement
+from services.upload_ingest import SIGNATURES, SNIFF_BYTES
+
+
+def sniff_kind(path):
+    """'pdf' or 'jpg' from the file's leading bytes, None for anything else"""
+    with open(path, "rb") as f:
+        head = f.read(SNIFF_BYTES)
+    return next((kind for signature, kind in SIGNATURES if head.startswith(signature)), None)
+
+
+def safe_kind(path):
+    try:
+        return sniff_kind(path)
+    except OSError:
+        return None
+
+
+def batch_session_id(key):
+    """Session id of a group of documents, hashed when it would not fit id_records.session_id"""
+    session_id = f"batch:{key}"
+    if len(session_id) > 64:
+        session_id = "batch:" + hashlib.sha256(key.encode()).hexdigest()[:58]
+    return session_id
+
+
+def discover(source):
+    """
+    The documents of a backlog, as {"path", "session_id"[, "full_name"]} dicts.
+    In a directory, the files of every subdirectory belong to one client (session) and
+    files directly in it are a session each. A manifest lists one file per line, as a bare
+    path or a JSON object with "path" and optionally "session_id" and "full_name" (the name
+    to look for in a statement that comes without its INE); relative paths are relative to
+    the manifest.
+    """
+    source = Path(source)
+    documents = []
+    if source.is_dir():
+        for path in sorted(source.rglob("*")):
+            if not path.is_file() or path.name.startswith("."):
+                continue
+            relative = path.relative_to(source)
+            key = str(relative.parent) if relative.parent != Path(".") else relative.stem
+            documents.append({"path": str(path), "session_id": batch_session_id(key)})
+        return documents
+
+    with open(source, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line) if line.startswith("{") else {"path": line}
+            path = Path(entry["path"])
+            if not path.is_absolute():
+                path = source.parent / path
+            entry["path"] = str(path)
+            entry["session_id"] = entry.get("session_id") or batch_session_id(path.stem)
+            documents.append(entry)
+    return documents
+
+
+def process_group(documents, preset=None):
+    """
+    Runs in a batch worker process.
+    Processes the documents of one session, INE photos first so their name is the one
+    looked for in the statements. Returns one result dict per document.
+    """
+    full_name = next((document["full_name"] for document in documents if document.get("full_name")), None)
+    kinds = {document["path"]: safe_kind(document["path"]) for document in documents}
+
+    results = []
+    for document in sorted(documents, key=lambda document: kinds[document["path"]] != "jpg"):
+        kind = kinds[document["path"]]
+        entry = {"path": document["path"], "session_id": document["session_id"], "kind": kind}
+        start = time.perf_counter()
+        try:
+            if kind == "jpg":
+                result = ocr_id_image(document["path"], preset)
+                if result:
+                    full_name = f"{result['first_names']} {result['last_names']}".strip()
+                entry["result"] = result
+            elif kind == "pdf":
+                statement = parse_statement(document["path"], full_name)
+                entry["result"] = statement.pop("match")
+                entry["statement"] = statement
+            else:
+                entry["error"] = "Unreadable file or not a PDF or JPG"
+        except Exception as e:
+            entry["error"] = str(e)
+        entry["seconds"] = round(time.perf_counter() - start, 3)
+        results.append(entry)
+    return results
+
+
+def init_worker():
+    """Ctrl+C reaches the whole process group; only the parent handles it, after the workers' current chunks"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    NameIndex.get()
+
+
+def process_chunk(groups, preset=None):
+    """Runs in a batch worker process: one work unit of several sessions"""
+    return [entry for group in groups for entry in process_group(group, preset)]
+
+
+class BatchProcessor:
+    """
+    Processes a backlog of INE photos and statements on a process pool, outside the HTTP path.
+    Sessions are grouped into chunks of `chunk_size`, the unit of work sent to a worker.
+    Every processed file becomes a line of the JSONL output. That file is also the checkpoint:
+    a run over the same output skips the files already in it, except those whose line is an
+    error, which are tried again (and get a new line). ID records (and the statements
+    a name was found in) are written to the database `db_batch` at a time, and the lines of a
+    batch are only written once its records are in, so a resumed run does not write them twice.
+    """
+
+    def __init__(self, output, workers=None, chunk_size=8, db_batch=500, write_db=True, preset=None,
+                 progress_interval=10.0):
+        self.output = Path(output)
+        self.workers = workers or available_cores()
+        self.chunk_size = chunk_size
+        self.db_batch = db_batch
+        self.write_db = write_db
+        self.preset = preset
+        self.progress_interval = progress_interval
+        self.stopping = False
+        self._lines = []
+        self._id_records = []
+        self._cuenta_records = []
+
+    def completed(self):
+        """
+        Paths processed without error by earlier runs, and the name read from each session's
+        INE among them, as (paths, {session_id: full_name}). A line cut short by an
+        interrupted run is dropped.
+        """
+        if not self.output.exists():
+            return set(), {}
+        with open(self.output, "rb+") as f:
+            data = f.read()
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                f.truncate(end)
+        done, names = set(), {}
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if "error" in entry:
+                continue
+            done.add(entry["path"])
+            result = entry.get("result")
+            if entry["kind"] == "jpg" and result:
+                names[entry["session_id"]] = f"{result['first_names']} {result['last_names']}".strip()
+        return done, names
+
+    def plan(self, documents, done, names=None):
+        """
+        Chunks of the sessions that still have documents to process. A statement whose INE
+        was processed in an earlier run looks for the name read then, from the output
+        (`names`) or else the session's ID record.
+        """
+        groups = {}
+        for document in documents:
+            if document["path"] not in done:
+                groups.setdefault(document["session_id"], []).append(document)
+
+        names = names or {}
+        for session_id, group in groups.items():
+            if any(document.get("full_name") for document in group):
+                continue
+            if any(safe_kind(document["path"]) == "jpg" for document in group):
+                continue
+            full_name = names.get(session_id)
+            if full_name is None and self.write_db:
+                from models.id_record import IDRecord
+                record = IDRecord.get_by_session(session_id)
+                full_name = record["full_name"] if record is not None else None
+            if full_name:
+                group[0] = {**group[0], "full_name": full_name}
+
+        groups = list(groups.values())
+        return [groups[i:i + self.chunk_size] for i in range(0, len(groups), self.chunk_size)]
+
+    def collect(self, entries, out):
+        for entry in entries:
+            self._lines.append(json.dumps(entry, ensure_ascii=False))
+            result = entry.get("result")
+            if entry["kind"] == "jpg" and result:
+                from models.id_record import IDRecord
+                self._id_records.append(IDRecord(
+                    full_name=f"{result['first_names']} {result['last_names']}".strip(),
+                    address=result.get("address"),
+                    session_id=entry["session_id"],
+                ))
+            elif entry["kind"] == "pdf" and result and result != "estimado":
+                from models.cuenta_record import CuentaRecord
+                statement = entry["statement"]
+                self._cuenta_records.append(CuentaRecord(
+                    full_name=statement["full_name"] or result,
+                    address=statement["address"],
+                    fecha_corte=statement["fecha_corte"],
+                ))
+        if not self.write_db or len(self._id_records) + len(self._cuenta_records) >= self.db_batch:
+            self.flush(out)
+
+    def flush(self, out):
+        """Writes the pending records, then the output lines they belong to"""
+        if self.write_db:
+            from models.cuenta_record import CuentaRecord
+            from models.id_record import IDRecord
+            if IDRecord.save_many(self._id_records) != len(self._id_records) or \
+                    CuentaRecord.save_many(self._cuenta_records) != len(self._cuenta_records):
+                raise RuntimeError("Could not write the batch's records to the database")
+        self._id_records, self._cuenta_records = [], []
+        if self._lines:
+            out.write("\n".join(self._lines) + "\n")
+            out.flush()
+        self._lines = []
+
+    def stop(self, signum=None, frame=None):
+        """Stop handing out chunks; the ones the workers are on are finished and written"""
+        if not self.stopping:
+            logging.warning("Stopping after the chunks in progress, run again to resume")
+        self.stopping = True
+
+    def drain(self, executor, chunks, total, out):
+        """Keeps the workers fed with chunks and collects their results, returns (processed, errors)"""
+        processed, errors = 0, 0
+        start = last_report = time.perf_counter()
+        pending = set()
+        chunks = iter(chunks)
+        while True:
+            # two work units per worker: one running, one ready for when it finishes
+            while not self.stopping and len(pending) < self.workers * 2:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                pending.add(executor.submit(process_chunk, chunk, self.preset))
+            if self.stopping:
+                pending = {future for future in pending if not future.cancel()}
+            if not pending:
+                return processed, errors
+            finished, pending = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+            for future in finished:
+                entries = future.result()
+                processed += len(entries)
+                errors += sum(1 for entry in entries if "error" in entry)
+                self.collect(entries, out)
+
+            now = time.perf_counter()
+            if now - last_report >= self.progress_interval:
+                last_report = now
+                logging.info(f"{processed}/{total} files, {processed / (now - start):.1f} files/s")
+
+    def run(self, documents, resume=True):
+        """
+        Processes the documents and returns a summary of the run.
+        From the main thread, Ctrl+C and SIGTERM stop the run cleanly: the chunks in
+        progress are finished and written, the rest is left for the next run.
+        """
+        if not resume and self.output.exists():
+            self.output.unlink()
+        done, names = self.completed()
+        chunks = self.plan(documents, done, names)
+        total = sum(len(group) for chunk in chunks for group in chunk)
+        logging.info(f"{total} files to process ({len(done)} already done) with {self.workers} workers")
+
+        self.stopping = False
+        handlers = {}
+        if threading.current_thread() is threading.main_thread():
+            handlers = {signum: signal.signal(signum, self.stop) for signum in (signal.SIGINT, signal.SIGTERM)}
+
+        start = time.perf_counter()
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker
+        )
+        try:
+            with open(self.output, "a", encoding="utf-8") as out:
+                processed, errors = self.drain(executor, chunks, total, out)
+                self.flush(out)
+        finally:
+            executor.shutdown(cancel_futures=True)
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+
+        elapsed = time.perf_counter() - start
+        return {
+            "files": processed,
+            "errors": errors,
+            "skipped": sum(1 for document in documents if document["path"] in done),
+            "interrupted": self.stopping,
+            "seconds": round(elapsed, 3),
+            "files_per_second": round(processed / elapsed, 2) if elapsed else 0.0,
+        }
@@ -0,0 +1,78 @@
+import os
+
+from services.session_store import SessionStore
+
+
+def estimate_tokens(text):
+    """Rough llama token count, about 4 characters per token for Spanish text"""
+    return max(1, len(text) // 4)
+
+
+class ConversationMemory:
+    """
+    Chat history of a session, kept in the SessionStore next to its upload state so idle
+    sessions are evicted with it. Only the last `max_turns` messages are stored (a ring
+    buffer), and build_history fits them into a token budget: the most recent turns are
+    kept verbatim and older ones are folded into a short summary.
+    """
+
+    SUMMARY_PREFIX = "Resumen de la conversación anterior con el cliente:"
+
+    def __init__(self, session_id, store=None, max_turns=None, token_budget=None, summary_tokens=None):
+        self.session_id = session_id
+        self.store = store or SessionStore.get_instance()
+        self.max_turns = max_turns or int(os.environ.get("CHAT_HISTORY_TURNS", 12))
+        self.token_budget = token_budget or int(os.environ.get("CHAT_HISTORY_TOKENS", 1024))
+        self.summary_tokens = summary_tokens or int(os.environ.get("CHAT_SUMMARY_TOKENS", 128))
+
+    def turns(self):
+        return self.store.get(self.session_id, {}).get('history', [])
+
+    def record(self, user_message, reply):
+        """Append one exchange, dropping the oldest messages beyond max_turns"""
+        def apply(state):
+            state = dict(state or {})
+            history = state.get('history', []) + [
+                {"role": "user", "content": user_message},
+                {"role": "assistant", "content": reply},
+            ]
+            state['history'] = history[-self.max_turns:]
+            return state
+        self.store.update(self.session_id, apply)
+
+    def build_history(self, budget=None):
+        """
+        Messages to place between the system prompt and the new user message,
+        never more than `budget` tokens (token_budget by default).
+        """
+        budget = self.token_budget if budget is None else budget
+        turns = self.turns()
+
+        kept, used = [], 0
+        for turn in reversed(turns):
+            cost = estimate_tokens(turn["content"])
+            if used + cost > budget - self.summary_tokens:
+                break
+            kept.append(turn)
+            used += cost
+        kept.reverse()
+
+        dropped = turns[:len(turns) - len(kept)]
+        summary = self.summarize(dropped, min(self.summary_tokens, budget - used))
+        if summary:
+            return [{"role": "system", "content": summary}] + kept
+        return kept
+
+    def summarize(self, turns, budget):
+        """Extractive summary of the user's earlier questions, cut to fit the budget"""
+        questions = [turn["content"].strip() for turn in turns if turn["role"] == "user"]
+        if not questions or budget <= estimate_tokens(self.SUMMARY_PREFIX):
+            return ""
+        summary = self.SUMMARY_PREFIX
+        for question in questions:
+            snippet = question if len(question) <= 120 else question[:117] + "..."
+            candidate = f"{summary} el cliente preguntó: \"{snippet}\";"
+            if estimate_tokens(candidate) > budget:
+                break
+            summary = candidate
+        return summary if summary != self.SUMMARY_PREFIX else ""
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+
+class ExtractionCache:
+    """
+    Content-addressed cache of document extraction results keyed by file hash.
+    An in-memory LRU sits in front of an on-disk store shared by every worker on the host.
+    The disk store is capped in bytes (oldest entries go first) and entries expire
+    after `ttl` seconds to honour the data-retention policy; a background sweep
+    (start_purge) deletes expired files even when no new result is written.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, directory, memory_entries=256, max_disk_bytes=64 * 1024 * 1024, ttl=86400):
+        self.directory = Path(directory)
+        self.directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._entries_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._disk_lock = threading.Lock()
+        self._disk_bytes = None
+        self._last_scan = 0.0
+        self.purge_thread = None
+        self._purge_stop = None
+
+    @classmethod
+    def get_instance(cls):
+        """Get the process-wide cache configured from the environment"""
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls(
+                    os.environ.get("EXTRACTION_CACHE_DIR", Path(tempfile.gettempdir()) / "extraction-cache"),
+                    memory_entries=int(os.environ.get("EXTRACTION_CACHE_ENTRIES", 256)),
+                    max_disk_bytes=int(os.environ.get("EXTRACTION_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+                    ttl=int(os.environ.get("EXTRACTION_CACHE_TTL", 86400)),
+                )
+                interval = float(os.environ.get("EXTRACTION_CACHE_PURGE_SECONDS", 600))
+                if interval > 0:
+                    cls._instance.start_purge(interval)
+            return cls._instance
+
+    def start_purge(self, interval):
+        """
+        Purge expired entries in the background now and then every `interval` seconds
+        (EXTRACTION_CACHE_PURGE_SECONDS, 0 turns it off)
+        """
+        if self.purge_thread and self.purge_thread.is_alive():
+            return self.purge_thread
+
+        stop = threading.Event()
+
+        def purge():
+            while True:
+                try:
+                    self.purge_expired()
+                except Exception as e:
+                    logging.warning(f"Purging the extraction cache in {self.directory} failed: {e}")
+                if stop.wait(interval):
+                    return
+
+        self._purge_stop = stop
+        self.purge_thread = threading.Thread(target=purge, name="extraction-cache-purge", daemon=True)
+        self.purge_thread.start()
+        return self.purge_thread
+
+    def stop_purge(self):
+        if self.purge_thread:
+            self._purge_stop.set()
+            self.purge_thread.join()
+            self.purge_thread = None
+
+    @staticmethod
+    def make_key(kind, data, *extra):
+        """
+        Key for a document kind, its bytes (or their sha256, already taken) and anything
+        else its result depends on
+        """
+        digest = data.copy() if hasattr(data, "hexdigest") else hashlib.sha256(data)
+        for value in extra:
+            digest.update(b"\0" + str(value).encode())
+        return f"{kind}-{digest.hexdigest()}"
+
+    def _path(self, key):
+        return self.directory / f"{key}.json"
+
+    def get(self, key):
+        now = time.time()
+        with self._entries_lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[1] >= now:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self._memory.pop(key, None)
+
+        path = self._path(key)
+        try:
+            stat = path.stat()
+            if stat.st_mtime + self.ttl < now:
+                path.unlink(missing_ok=True)
+                raise FileNotFoundError(path)
+            result = json.loads(path.read_text())
+        except (OSError, ValueError):
+            with self._entries_lock:
+                self.misses += 1
+            return None
+
+        self._remember(key, result, stat.st_mtime + self.ttl)
+        with self._entries_lock:
+            self.hits += 1
+        return result
+
+    def put(self, key, result):
+        self._remember(key, result, time.time() + self.ttl)
+        path = self._path(key)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(result, f)
+        size = os.path.getsize(tmp)
+        os.replace(tmp, path)
+
+        # the directory is only rescanned when the running byte count says it may be over the cap
+        with self._disk_lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += size
+            rescan = (self._disk_bytes is None or self._disk_bytes > self.max_disk_bytes
+                      or time.time() - self._last_scan > 300)
+        if rescan:
+            self._enforce_limits()
+
+    def _remember(self, key, result, expires_at):
+        with self._entries_lock:
+            self._memory[key] = (result, expires_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _disk_entries(self):
+        entries = []
+        for path in self.directory.glob("*.json"):
+            try:
+                entries.append((path, path.stat()))
+            except OSError:
+                continue
+        return entries
+
+    def _enforce_limits(self):
+        """Drop expired files, then the oldest ones until the store fits in max_disk_bytes"""
+        with self._disk_lock:
+            now = time.time()
+            entries = self._disk_entries()
+            total = 0
+            live = []
+            for path, stat in entries:
+                if stat.st_mtime + self.ttl < now:
+                    path.unlink(missing_ok=True)
+                else:
+                    live.append((path, stat))
+                    total += stat.st_size
+            live.sort(key=lambda entry: entry[1].st_mtime)
+            for path, stat in live:
+                if total <= self.max_disk_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= stat.st_size
+            self._disk_bytes = total
+            self._last_scan = now
+
+    def purge_expired(self):
+        """Remove every expired entry, memory and disk"""
+        now = time.time()
+        with self._entries_lock:
+            for key in [k for k, (_, expires_at) in self._memory.items() if expires_at < now]:
+                del self._memory[key]
+        self._enforce_limits()
+
+    def stats(self):
+        entries = self._disk_entries()
+        with self._entries_lock:
+            lookups = self.hits + self.misses
+            return {
+                'memory_entries': len(self._memory),
+                'disk_entries': len(entries),
+                'disk_bytes': sum(stat.st_size for _, stat in entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
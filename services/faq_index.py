@@ -0,0 +1,299 @@
+import json
+import logging
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+import unicodedata
+from pathlib import Path
+
+from services.metrics import REGISTRY
+
+FAQ_LOOKUPS = REGISTRY.counter("faq_lookups_total", "Chat messages looked up in the FAQ index", ["outcome"])
+
+DEFAULT_PATH = Path(__file__).resolve().parent.parent / "data" / "faq.json"
+
+
+# greetings and courtesies in front of a question say nothing about which one it is
+FILLER_WORDS = {"hola", "buen", "buenas", "buenos", "dia", "dias", "tardes", "noches", "oye", "disculpa",
+                "disculpe", "gracias", "porfa", "porfavor"}
+
+# a negation changes what a message asks without changing most of its n-grams
+NEGATION_WORDS = {"no", "nunca", "jamas", "tampoco", "ni"}
+
+
+def normalize(text):
+    """Lowercase, without accents, punctuation or greetings, single spaces"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(word for word in re.sub(r"[^a-z0-9ñ]+", " ", text).split() if word not in FILLER_WORDS)
+
+
+def is_negated(text):
+    """Whether normalized text has a negation word"""
+    return any(word in NEGATION_WORDS for word in text.split())
+
+
+def char_ngrams(text, sizes=(3, 4, 5)):
+    """Character n-grams of every word of normalized text, padded with a space on each side"""
+    grams = {}
+    for word in text.split():
+        padded = f" {word} "
+        for size in sizes:
+            for i in range(max(1, len(padded) - size + 1)):
+                gram = padded[i:i + size]
+                grams[gram] = grams.get(gram, 0) + 1
+    return grams
+
+
+def validate_entries(entries):
+    """Entries as stored in the FAQ file; raises ValueError on a malformed one"""
+    if not isinstance(entries, list):
+        raise ValueError("entries must be a list")
+    ids = set()
+    for entry in entries:
+        if not isinstance(entry, dict) or not isinstance(entry.get("id"), str) or not entry["id"]:
+            raise ValueError("every entry needs an id")
+        questions = entry.get("questions")
+        if not isinstance(questions, list) or not questions or not all(
+                isinstance(question, str) and normalize(question) for question in questions):
+            raise ValueError(f"entry {entry['id']} needs a non-empty list of questions")
+        if not isinstance(entry.get("answer"), str) or not entry["answer"].strip():
+            raise ValueError(f"entry {entry['id']} needs an answer")
+        if entry["id"] in ids:
+            raise ValueError(f"duplicate entry id {entry['id']}")
+        ids.add(entry["id"])
+    return [{"id": entry["id"], "questions": list(entry["questions"]), "answer": entry["answer"]} for entry in entries]
+
+
+class FAQIndex:
+    """
+    Vetted answers to the questions most chat messages are about, found by similarity
+    instead of asking the model. Every phrasing of a question is a TF-IDF vector of
+    character n-grams held in a NumPy matrix, so a message in other words, without
+    accents or with typos still lands on it. A message is answered when its best entry
+    scores at least `threshold` (cosine) and beats the next entry by `margin`; anything
+    less goes to the LLM. A negation flips what a message asks while leaving most of its
+    n-grams alone, so a message that says no (no, nunca...) is only answered when the
+    phrasing it matched says no too, and one that does not is never matched to a phrasing
+    that does.
+
+    Entries live in a JSON file (FAQ_PATH, data/faq.json by default) written by the
+    admin endpoint. Every process checks its modification time every `reload_interval`
+    seconds and rebuilds its index when another one changed it.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, path=DEFAULT_PATH, threshold=0.6, margin=0.05, reload_interval=5.0):
+        self.path = Path(path)
+        self.threshold = threshold
+        self.margin = margin
+        self.reload_interval = reload_interval
+        self._write_lock = threading.RLock()
+        self._stats_lock = threading.Lock()
+        self._index = None
+        self._mtime = None
+        self._checked = 0.0
+        self.hits = 0
+        self.misses = 0
+        if not self.reload():
+            self._index = self._build([])
+
+    @classmethod
+    def get_instance(cls):
+        """Get the process-wide index configured from the environment"""
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls(
+                    path=os.environ.get("FAQ_PATH", DEFAULT_PATH),
+                    threshold=float(os.environ.get("FAQ_THRESHOLD", 0.6)),
+                    margin=float(os.environ.get("FAQ_MARGIN", 0.05)),
+                    reload_interval=float(os.environ.get("FAQ_RELOAD_SECONDS", 5.0)),
+                )
+            return cls._instance
+
+    @staticmethod
+    def enabled():
+        """FAQ_CACHE=0 sends every chat message to the model"""
+        return os.environ.get("FAQ_CACHE", "1") != "0"
+
+    def entries(self):
+        return [dict(entry) for entry in self._index["entries"]]
+
+    def reload(self):
+        """Rebuild the index from the FAQ file (a missing one is an empty index); False if it is not valid"""
+        try:
+            mtime = self.path.stat().st_mtime_ns
+            with open(self.path, encoding="utf-8") as f:
+                entries = validate_entries(json.load(f))
+        except FileNotFoundError:
+            mtime, entries = None, []
+        except ValueError as e:
+            logging.error(f"Keeping the current FAQ index, {self.path} is not valid: {e}")
+            self._checked = time.monotonic()
+            return False
+        self._index = self._build(entries)
+        self._mtime = mtime
+        self._checked = time.monotonic()
+        logging.info(f"FAQ index built with {len(entries)} entries")
+        return True
+
+    def save(self, entries):
+        """Replace every entry, in the FAQ file and in the index"""
+        entries = validate_entries(entries)
+        with self._write_lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temporary = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False, indent=2)
+            os.replace(temporary, self.path)
+            self.reload()
+
+    def upsert(self, entries):
+        """Add entries, or replace the ones with the same id"""
+        entries = validate_entries(entries)
+        with self._write_lock:
+            updated = {entry["id"]: entry for entry in self.entries()}
+            updated.update({entry["id"]: entry for entry in entries})
+            self.save(list(updated.values()))
+
+    def delete(self, ids):
+        with self._write_lock:
+            self.save([entry for entry in self.entries() if entry["id"] not in set(ids)])
+
+    def _build(self, entries):
+        import numpy as np
+
+        questions, owners, negated = [], [], []
+        for position, entry in enumerate(entries):
+            for question in entry["questions"]:
+                questions.append(char_ngrams(normalize(question)))
+                owners.append(position)
+                negated.append(is_negated(normalize(question)))
+
+        vocabulary, document_frequency = {}, []
+        for grams in questions:
+            for gram in grams:
+                if gram not in vocabulary:
+                    vocabulary[gram] = len(vocabulary)
+                    document_frequency.append(0)
+                document_frequency[vocabulary[gram]] += 1
+        idf = np.array([math.log((1 + len(questions)) / (1 + df)) + 1 for df in document_frequency], dtype=np.float32)
+
+        matrix = np.zeros((len(questions), len(vocabulary)), dtype=np.float32)
+        for row, grams in enumerate(questions):
+            for gram, count in grams.items():
+                matrix[row, vocabulary[gram]] = (1 + math.log(count)) * idf[vocabulary[gram]]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1, norms)
+        return {"entries": entries, "owners": np.array(owners, dtype=np.int32), "negated": np.array(negated, dtype=bool),
+                "vocabulary": vocabulary, "idf": idf, "unseen_idf": math.log(1 + len(questions)) + 1, "matrix": matrix}
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now - self._checked < self.reload_interval:
+            return
+        self._checked = now
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._mtime:
+            self.reload()
+
+    def _similarity(self, index, message):
+        """Cosine similarity of normalized message text to every question of the index"""
+        import numpy as np
+
+        columns, weights, norm = [], [], 0.0
+        for gram, count in char_ngrams(message).items():
+            column = index["vocabulary"].get(gram)
+            # an n-gram no question has still makes the message less like all of them
+            weight = (1 + math.log(count)) * (index["idf"][column] if column is not None else index["unseen_idf"])
+            norm += weight * weight
+            if column is not None:
+                columns.append(column)
+                weights.append(weight)
+        if not columns:
+            return np.zeros(len(index["owners"]), dtype=np.float32)
+        return index["matrix"][:, columns] @ (np.array(weights, dtype=np.float32) / math.sqrt(norm))
+
+    def _best(self, index, text):
+        """
+        Best similarity of normalized message text to the questions of each entry of the
+        index, and to every question. A message that does not say no is only compared to
+        the questions that do not either.
+        """
+        import numpy as np
+
+        similarity = self._similarity(index, text)
+        if not is_negated(text):
+            similarity = np.where(index["negated"], 0.0, similarity).astype(np.float32)
+        best = np.zeros(len(index["entries"]), dtype=np.float32)
+        np.maximum.at(best, index["owners"], similarity)
+        return best, similarity
+
+    def scores(self, message):
+        """Similarity of the message to every entry, by entry id"""
+        self._refresh()
+        index = self._index
+        best, _ = self._best(index, normalize(message))
+        return {entry["id"]: float(score) for entry, score in zip(index["entries"], best)}
+
+    def _decide(self, index, message, threshold):
+        """Position of the entry of the index that answers the message, or None"""
+        if not index["entries"]:
+            return None
+        text = normalize(message)
+        best, similarity = self._best(index, text)
+        order = best.argsort()[::-1]
+        top = best[order[0]]
+        runner_up = best[order[1]] if len(order) > 1 else 0.0
+        if top < threshold or top - runner_up < self.margin:
+            return None
+        # "no quiero hablar con un humano" is closest to "quiero hablar con un humano": the
+        # phrasing that scored, not just the entry, has to say no when the message does
+        rows = (index["owners"] == order[0]).nonzero()[0]
+        if is_negated(text) and not index["negated"][rows[similarity[rows].argmax()]]:
+            return None
+        return order[0]
+
+    def best_entry(self, message, threshold=None):
+        """
+        Id of the entry that answers the message, or None when none is a confident match
+        at `threshold` (the index's by default)
+        """
+        self._refresh()
+        index = self._index
+        position = self._decide(index, message, self.threshold if threshold is None else threshold)
+        return None if position is None else index["entries"][position]["id"]
+
+    def match(self, message):
+        """The vetted answer to the message, or None when no entry is a confident match"""
+        self._refresh()
+        index = self._index
+        position = self._decide(index, message, self.threshold)
+        answer = None if position is None else index["entries"][position]["answer"]
+
+        with self._stats_lock:
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        FAQ_LOOKUPS.labels("miss" if answer is None else "hit").inc()
+        return answer
+
+    def stats(self):
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            'entries': len(self._index["entries"]),
+            'threshold': self.threshold,
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / lookups if lookups else 0.0,
+        }
@@ -1,30 +1,40 @@
+from services.session_store import SessionStore
+
 
 class FileTracker:
-    """ Used to know which documents have been uploaded by user. """
-    has_jpg_file = False
-    has_pdf_file = False
-    
-    @classmethod
-    def set_jpg(cls, value=True):
+    """ Used to know which documents have been uploaded in a user session. """
+
+    def __init__(self, session_id, store=None):
+        self.session_id = session_id
+        self.store = store or SessionStore.get_instance()
+
+    def _state(self):
+        return self.store.get(self.session_id, {})
+
+    def _set(self, field, value):
+        def apply(state):
+            state = dict(state or {})
+            state[field] = value
+            return state
+        self.store.update(self.session_id, apply)
+
+    def set_jpg(self, value=True):
         """Set JPG file status"""
-        cls.has_jpg_file = value
-    
-    @classmethod
-    def set_pdf(cls, value=True):
+        self._set('has_jpg_file', value)
+
+    def set_pdf(self, value=True):
         """Set PDF file status"""
-        cls.has_pdf_file = value
-    
-    @classmethod
-    def get_jpg_status(cls):
+        self._set('has_pdf_file', value)
+
+    def get_jpg_status(self):
         """Get JPG file status"""
-        return cls.has_jpg_file
-    
-    @classmethod
-    def get_pdf_status(cls):
+        return self._state().get('has_jpg_file', False)
+
+    def get_pdf_status(self):
         """Get PDF file status"""
-        return cls.has_pdf_file
-    
-    @classmethod
-    def has_both_files(cls):
+        return self._state().get('has_pdf_file', False)
+
+    def has_both_files(self):
         """Check if both files have been uploaded"""
-        return cls.has_jpg_file and cls.has_pdf_file
\ No newline at end of file
+        state = self._state()
+        return state.get('has_jpg_file', False) and state.get('has_pdf_file', False)
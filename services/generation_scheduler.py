@@ -0,0 +1,369 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+
+from services.metrics import REGISTRY, IN_FLIGHT, Gauge, Histogram
+from services.tracing import in_context
+
+QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "generation_queue_wait_seconds", "Time a generation waited for a scheduler slot", ["priority"])
+
+
+class GenerationQueueTimeout(Exception):
+    """A generation waited longer than the queue timeout, or the queue was full"""
+
+
+class _Waiter:
+    def __init__(self, loop=None):
+        self.granted = False
+        self.cancelled = False
+        self.event = threading.Event() if loop is None else None
+        self.loop = loop
+        self.future = loop.create_future() if loop else None
+
+    def grant(self):
+        self.granted = True
+        if self.event:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(lambda: self.future.done() or self.future.set_result(None))
+
+
+class SharedGeneration:
+    """One generation running in a producer thread, read by every request that asked for the same prompt"""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.cancelled = False
+        self._condition = threading.Condition()
+
+    def subscribe(self):
+        """Add a reader; False once the generation was abandoned by all its readers"""
+        with self._condition:
+            if self.cancelled:
+                return False
+            self.subscribers += 1
+            return True
+
+    def publish(self, chunk):
+        with self._condition:
+            self.chunks.append(chunk)
+            self._condition.notify_all()
+
+    def finish(self, error=None):
+        with self._condition:
+            self.done = True
+            self.error = error
+            self._condition.notify_all()
+
+    def read(self):
+        index = 0
+        try:
+            while True:
+                with self._condition:
+                    while index >= len(self.chunks) and not self.done:
+                        self._condition.wait()
+                    pending = self.chunks[index:]
+                    index += len(pending)
+                    finished = self.done and index >= len(self.chunks)
+                yield from pending
+                if finished:
+                    if self.error:
+                        raise self.error
+                    return
+        finally:
+            with self._condition:
+                self.subscribers -= 1
+                # nobody is reading any more, the producer stops the upstream generation
+                if self.subscribers == 0 and not self.done:
+                    self.cancelled = True
+
+
+class AsyncSharedGeneration:
+    """SharedGeneration for the ASGI app: produced by a task on the event loop"""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.cancelled = False
+        self.task = None
+        self._changed = asyncio.Event()
+
+    def subscribe(self):
+        if self.cancelled:
+            return False
+        self.subscribers += 1
+        return True
+
+    def publish(self, chunk):
+        self.chunks.append(chunk)
+        self._changed.set()
+
+    def finish(self, error=None):
+        self.done = True
+        self.error = error
+        self._changed.set()
+
+    async def read(self):
+        index = 0
+        try:
+            while True:
+                while index >= len(self.chunks) and not self.done:
+                    self._changed.clear()
+                    await self._changed.wait()
+                pending = self.chunks[index:]
+                index += len(pending)
+                finished = self.done and index >= len(self.chunks)
+                for chunk in pending:
+                    yield chunk
+                if finished:
+                    if self.error:
+                        raise self.error
+                    return
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done and self.task:
+                self.cancelled = True
+                self.task.cancel()
+
+
+class GenerationScheduler:
+    """
+    Admission control in front of the model.
+
+    At most `max_concurrent` generations run at once. The rest wait in a priority
+    queue: status updates first, then greetings, then free chat. A request that waits
+    longer than `queue_timeout`, or arrives when `max_queue` are already waiting, gets
+    GenerationQueueTimeout so the caller can answer with a fallback message straight away.
+    Identical prompts already in flight are coalesced: later requests read the chunks
+    of the running generation instead of starting their own.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    PRIORITIES = {'status': 0, 'greeting': 1, 'chat': 2}
+
+    def __init__(self, max_concurrent=8, queue_timeout=15.0, max_queue=256, coalesce=True):
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+        self.coalesce = coalesce
+        self._slots_lock = threading.Lock()
+        self._active = 0
+        self._waiters = []
+        # waiters still waiting; cancelled ones stay in the heap until popped but are not counted
+        self._queued = 0
+        self._sequence = itertools.count()
+        self._in_flight = {}
+        self.coalesced = 0
+        self.timeouts = 0
+        self.wait_seconds = {name: Histogram() for name in self.PRIORITIES}
+
+    @classmethod
+    def get_instance(cls):
+        """Get the process-wide scheduler configured from the environment"""
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls(
+                    max_concurrent=int(os.environ.get("GEN_MAX_CONCURRENCY", 8)),
+                    queue_timeout=float(os.environ.get("GEN_QUEUE_TIMEOUT", 15)),
+                    max_queue=int(os.environ.get("GEN_MAX_QUEUE", 256)),
+                    coalesce=os.environ.get("GEN_COALESCE", "1") != "0",
+                )
+                for name, histogram in cls._instance.wait_seconds.items():
+                    QUEUE_WAIT_SECONDS.attach(histogram, name)
+                IN_FLIGHT.attach(Gauge(lambda: cls._instance._active), "generation_active")
+                IN_FLIGHT.attach(Gauge(lambda: cls._instance._queued), "generation_queued")
+            return cls._instance
+
+    # -------------------------------------------------------------------------
+    #   slots
+    # -------------------------------------------------------------------------
+    def _enqueue(self, priority, loop=None):
+        """A granted waiter if a slot is free, otherwise a queued one"""
+        waiter = _Waiter(loop)
+        with self._slots_lock:
+            if self._active < self.max_concurrent and not self._queued:
+                self._active += 1
+                waiter.granted = True
+                return waiter
+            if self._queued >= self.max_queue:
+                self.timeouts += 1
+                raise GenerationQueueTimeout("Generation queue is full")
+            heapq.heappush(self._waiters, (self.PRIORITIES[priority], next(self._sequence), waiter))
+            self._queued += 1
+        return waiter
+
+    def _abandon(self, waiter):
+        """Give up on a queued waiter; False if it was granted a slot in the meantime"""
+        with self._slots_lock:
+            if waiter.granted:
+                return False
+            waiter.cancelled = True
+            self._queued -= 1
+            if not self._queued:
+                self._waiters.clear()
+            self.timeouts += 1
+            return True
+
+    def acquire(self, priority):
+        start = time.monotonic()
+        waiter = self._enqueue(priority)
+        if not waiter.granted and not waiter.event.wait(self.queue_timeout) and self._abandon(waiter):
+            raise GenerationQueueTimeout(f"Waited {self.queue_timeout:.0f}s for a generation slot")
+        self.wait_seconds[priority].observe(time.monotonic() - start)
+
+    async def acquire_async(self, priority):
+        start = time.monotonic()
+        waiter = self._enqueue(priority, asyncio.get_running_loop())
+        if not waiter.granted:
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+            except asyncio.TimeoutError:
+                if self._abandon(waiter):
+                    raise GenerationQueueTimeout(f"Waited {self.queue_timeout:.0f}s for a generation slot")
+            except asyncio.CancelledError:
+                if not self._abandon(waiter):
+                    self.release()
+                raise
+        self.wait_seconds[priority].observe(time.monotonic() - start)
+
+    def release(self):
+        with self._slots_lock:
+            while self._waiters:
+                _, _, waiter = heapq.heappop(self._waiters)
+                if not waiter.cancelled:
+                    # the slot passes straight to the next waiter
+                    self._queued -= 1
+                    waiter.grant()
+                    return
+            self._active -= 1
+
+    # -------------------------------------------------------------------------
+    #   generations
+    # -------------------------------------------------------------------------
+    def _join(self, key, factory):
+        """The in-flight generation for key, or a new one; True if the caller must start it"""
+        key = key if self.coalesce else None
+        with self._slots_lock:
+            shared = self._in_flight.get(key) if key else None
+            if shared is not None and shared.subscribe():
+                self.coalesced += 1
+                return shared, False
+            shared = factory()
+            shared.subscribe()
+            if key:
+                self._in_flight[key] = shared
+            return shared, True
+
+    def _forget(self, key, shared):
+        key = key if self.coalesce else None
+        with self._slots_lock:
+            if key and self._in_flight.get(key) is shared:
+                del self._in_flight[key]
+
+    def stream(self, priority, key, produce, on_complete=None):
+        """
+        Chunks of the generation `produce()` (a generator factory), started once a slot
+        is free, or of the identical generation `key` already in flight.
+        on_complete(text) is called once with the whole reply when the generation finishes,
+        by the request that started it only, not by every request reading it.
+        """
+        shared, leader = self._join(key, SharedGeneration)
+        if leader:
+            threading.Thread(target=in_context(self._produce), args=(priority, key, shared, produce, on_complete),
+                             name="generation", daemon=True).start()
+        return shared.read()
+
+    @staticmethod
+    def _complete(shared, on_complete):
+        if on_complete is None or shared.cancelled:
+            return
+        try:
+            on_complete("".join(shared.chunks))
+        except Exception as e:
+            logging.error(f"Completion callback of a generation failed: {e}")
+
+    def _produce(self, priority, key, shared, produce, on_complete=None):
+        try:
+            self.acquire(priority)
+        except GenerationQueueTimeout as e:
+            self._forget(key, shared)
+            shared.finish(e)
+            return
+
+        chunks = None
+        try:
+            chunks = produce()
+            for chunk in chunks:
+                if shared.cancelled:
+                    break
+                shared.publish(chunk)
+            # cached before the readers see the end, so the next request finds it
+            self._complete(shared, on_complete)
+            shared.finish()
+        except Exception as e:
+            shared.finish(e)
+        finally:
+            self._forget(key, shared)
+            if chunks is not None:
+                chunks.close()
+            self.release()
+
+    async def astream(self, priority, key, produce, on_complete=None):
+        """stream for the ASGI app, `produce()` is an async generator factory"""
+        shared, leader = self._join(key, AsyncSharedGeneration)
+        if leader:
+            shared.task = asyncio.create_task(self._aproduce(priority, key, shared, produce, on_complete))
+        async for chunk in shared.read():
+            yield chunk
+
+    async def _aproduce(self, priority, key, shared, produce, on_complete=None):
+        try:
+            await self.acquire_async(priority)
+        except GenerationQueueTimeout as e:
+            self._forget(key, shared)
+            shared.finish(e)
+            return
+
+        chunks = None
+        try:
+            chunks = produce()
+            async for chunk in chunks:
+                shared.publish(chunk)
+            # cached before the readers see the end, so the next request finds it
+            self._complete(shared, on_complete)
+            shared.finish()
+        except Exception as e:
+            shared.finish(e)
+        finally:
+            self._forget(key, shared)
+            if chunks is not None:
+                await chunks.aclose()
+            self.release()
+
+    def stats(self):
+        with self._slots_lock:
+            queued = {name: 0 for name in self.PRIORITIES}
+            names = {rank: name for name, rank in self.PRIORITIES.items()}
+            for rank, _, waiter in self._waiters:
+                if not waiter.cancelled:
+                    queued[names[rank]] += 1
+            return {
+                'active': self._active,
+                'max_concurrent': self.max_concurrent,
+                'queued': queued,
+                'in_flight_prompts': len(self._in_flight),
+                'coalesced': self.coalesced,
+                'timeouts': self.timeouts,
+                'wait_seconds': {name: histogram.snapshot() for name, histogram in self.wait_seconds.items()},
+            }
@@ -1,94 +1,247 @@
-from PIL import Image
-import pytesseract
-from pathlib import Path
-import pdfplumber
+import importlib.util
+import io
+import logging
+import os
 import re
-from models.id_record import IDRecord
+import shlex
+import threading
+from services.name_index import NameIndex
+from services.ocr_pool import OCRWorkerPool, OCRQueueFull, OCRTimeout
+from services.extraction_cache import ExtractionCache
+from services.metrics import stage_timer
+from services.statement_parser import parse_statement
+from services.upload_ingest import upload_digest, upload_source
 
-class OCRTextProcessor:
-    @staticmethod
-    def load_names_from_file(filename):
-        path = Path('./data', filename)
-        with open(path, 'r') as f:
-            return [line.strip().upper() for line in f if line.strip()]
-        
-    @staticmethod
-    def extractIDData(image_file):
-        """ Locally extracts all words from ID photo, stores relevant info in local DB 
-        Uses OCR to read data from ID Photo in jpeg or jpg format."""
+
+def open_source(source):
+    """A spooled upload is opened from its path, a small one from its bytes"""
+    return io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+
+def parse_tesseract_config(config):
+    """Page segmentation mode, engine mode and variables of a pytesseract config string"""
+    psm, oem, variables = None, None, {}
+    tokens = shlex.split(config)
+    for option, value in zip(tokens, tokens[1:]):
+        if option == "--psm":
+            psm = int(value)
+        elif option == "--oem":
+            oem = int(value)
+        elif option == "--dpi":
+            variables["user_defined_dpi"] = value
+        elif option == "-c":
+            name, _, variable = value.partition("=")
+            variables[name] = variable
+    return psm, oem, variables
+
+
+class PytesseractBackend:
+    """Runs the tesseract binary on every image, through temp files, loading the language data each time"""
+    name = "pytesseract"
+
+    def __init__(self, lang="eng"):
+        self.lang = lang
+
+    def image_to_string(self, image, config=""):
+        import pytesseract
+        return pytesseract.image_to_string(image, lang=self.lang, config=config)
+
+
+class TesserocrBackend:
+    """
+    Tesseract through its C API (tesserocr). Every thread keeps one engine per config,
+    so the language data is loaded once per OCR worker and images are passed in memory.
+    An engine is not thread-safe, hence one per thread.
+    """
+    name = "tesserocr"
+
+    def __init__(self, lang="eng"):
+        self.lang = lang
+        self._local = threading.local()
+
+    def engine(self, config=""):
+        engines = getattr(self._local, "engines", None)
+        if engines is None:
+            engines = self._local.engines = {}
+        if config not in engines:
+            import tesserocr
+            psm, oem, variables = parse_tesseract_config(config)
+            options = {"lang": self.lang, "variables": variables}
+            if psm is not None:
+                options["psm"] = tesserocr.PSM(psm)
+            if oem is not None:
+                options["oem"] = tesserocr.OEM(oem)
+            engines[config] = tesserocr.PyTessBaseAPI(**options)
+        return engines[config]
+
+    def image_to_string(self, image, config=""):
+        engine = self.engine(config)
+        engine.SetImage(image)
         try:
-            firstNames = OCRTextProcessor.load_names_from_file('firsts.txt')
-            lastNames = OCRTextProcessor.load_names_from_file('lasts.txt')
+            return engine.GetUTF8Text()
+        finally:
+            engine.Clear()
+
+
+OCR_BACKENDS = {backend.name: backend for backend in (PytesseractBackend, TesserocrBackend)}
+_ocr_backends = {}
+_ocr_backends_lock = threading.Lock()
+
 
-            image = Image.open(image_file).convert("L")  #L grayscale RGB colour
-            text = pytesseract.image_to_string(image)
-            lines = [line.strip() for line in text.split("\n") if line.strip()]
+def get_ocr_backend(name=None):
+    """
+    The process-wide OCR backend named by OCR_BACKEND (default pytesseract).
+    tesserocr falls back to pytesseract when the binding is not installed.
+    """
+    name = name or os.environ.get("OCR_BACKEND", "pytesseract")
+    if name not in OCR_BACKENDS:
+        raise ValueError(f"Unknown OCR backend '{name}', expected one of {', '.join(OCR_BACKENDS)}")
+    if name == TesserocrBackend.name and importlib.util.find_spec("tesserocr") is None:
+        logging.warning("tesserocr is not installed, using pytesseract")
+        name = PytesseractBackend.name
+    with _ocr_backends_lock:
+        if name not in _ocr_backends:
+            _ocr_backends[name] = OCR_BACKENDS[name](lang=os.environ.get("OCR_LANG", "eng"))
+        return _ocr_backends[name]
 
-            # SPOT DOMICILIO
-            domicilio_idx = next((i for i, line in enumerate(lines) if "DOMICILIO" in line), -1)
 
-            if domicilio_idx != -1:
-                name_section = ' '.join(lines[:domicilio_idx])
-                address_section = ' '.join(lines[domicilio_idx+1:domicilio_idx+3])
-                
-                name_words = name_section.split()
+def ocr_id_image(image_source, preset=None, backend=None):
+    """
+    Runs in an OCR worker process.
+    Reads the name and address above/below DOMICILIO from an ID photo (a path or its bytes),
+    None if DOMICILIO is not found.
+    preset overrides the OCR_PREPROCESS preprocessing setting, backend the OCR_BACKEND one.
+    """
+    # PIL and the OCR backend are only needed in the workers
+    from PIL import Image
+    from services.image_preprocessing import ImagePreprocessor
 
-                found_first_name = " ".join([word for word in name_words if word in firstNames])
-                found_last_names = " ".join([word for word in name_words if word in lastNames])
+    names = NameIndex.get()
+    preprocessor = ImagePreprocessor.from_preset(preset) if preset else ImagePreprocessor.from_env()
 
-                clean_text = "\n".join(lines)
+    image = preprocessor.process(Image.open(open_source(image_source)))
+    text = get_ocr_backend(backend).image_to_string(image, config=preprocessor.tesseract_config)
+    lines = [line.strip() for line in text.split("\n") if line.strip()]
 
-                full_name = f"{found_first_name} {found_last_names}".strip()
-                
-                idRecord = IDRecord(
-                    full_name=full_name,
-                    address=address_section
-                )
-                idRecord.save()
+    # SPOT DOMICILIO
+    domicilio_idx = next((i for i, line in enumerate(lines) if "DOMICILIO" in line), -1)
+    if domicilio_idx == -1:
+        return None
 
-                return {
-                    "first_names": found_first_name,
-                    "last_names": found_last_names,
-                }
+    name_section = ' '.join(lines[:domicilio_idx])
+    address_section = ' '.join(lines[domicilio_idx+1:domicilio_idx+3])
 
+    found_first_name, found_last_names = split_name_words(name_section.split(), names)
+
+    return {
+        "first_names": found_first_name,
+        "last_names": found_last_names,
+        "address": address_section,
+    }
+
+
+def split_name_words(words, names):
+    """First names and last names among the OCR'd words of the name section, in their dictionary spelling"""
+    matches = list(filter(None, (names.classify(word) for word in words)))
+    first_names = " ".join(spelling for spelling, is_first, is_last in matches if is_first)
+    last_names = " ".join(spelling for spelling, is_first, is_last in matches if is_last)
+    return first_names, last_names
+
+
+def compile_name_patterns(full_name):
+    """Exact and whitespace-tolerant patterns for a client name, compiled once per search"""
+    exact = re.compile(r'\b' + re.escape(full_name.upper()) + r'\b')
+    words = full_name.upper().split()
+    flexible = re.compile(r'\s*'.join([r'\b' + re.escape(word) + r'\b' for word in words]))
+    return exact, flexible
+
+
+class OCRTextProcessor:
+    @staticmethod
+    def extractIDData(image_file, session_id=None):
+        """ Locally extracts all words from ID photo, stores relevant info in local DB
+        Uses OCR to read data from ID Photo in jpeg or jpg format.
+        The OCR itself runs on the OCRWorkerPool; OCRQueueFull and OCRTimeout are raised to the caller.
+        A photo that was already processed is answered from the ExtractionCache without OCR; the record
+        is then only written again when the session does not hold it yet."""
+        try:
+            cache = ExtractionCache.get_instance()
+            cache_key = ExtractionCache.make_key("ine", upload_digest(image_file))
+            result = cache.get(cache_key)
+            cached = result is not None
+            if not cached:
+                with stage_timer("ocr"):
+                    result = OCRWorkerPool.get_instance().run(ocr_id_image, upload_source(image_file))
+                if result is None:
+                    return None
+                cache.put(cache_key, result)
+
+            OCRTextProcessor.record_id_data(result, session_id, cached)
+            return {
+                "first_names": result['first_names'],
+                "last_names": result['last_names'],
+            }
+
+        except (OCRQueueFull, OCRTimeout):
+            raise
         except Exception as e:
-            print(f"Error processing image: {e}")
+            logging.error(f"Error processing image: {e}")
             return {"error": str(e)}
-            
 
+    @staticmethod
+    def record_id_data(result, session_id, cached):
+        """Saves the ID data as the session's IDRecord, unless a cached photo's record is already there"""
+        from models.id_record import IDRecord
+        full_name = f"{result['first_names']} {result['last_names']}".strip()
+        if cached:
+            if session_id is None:
+                return
+            existing = IDRecord.get_by_session(session_id)
+            if existing is not None and existing['full_name'] == full_name:
+                return
+
+        idRecord = IDRecord(
+            full_name=full_name,
+            address=result.get('address'),
+            session_id=session_id
+        )
+        # written by the WriteBehindQueue, the upload does not wait for the database
+        idRecord.save_later()
 
-    def extract_name_from_EdoCta(file):
+    @staticmethod
+    def extract_name_from_EdoCta(file, session_id=None):
         """
         Uses pdfplumber to read data from Estado de Cuenta in PDF format.
-        checks if the last entry on the names database is found in the PDF.
-        Returns full name found in pdf
+        checks if the name on the session's ID record (or, without a session, the
+        last entry on the names database) is found in the PDF, and reads the name, address
+        and cut-off date of the statement in the same pass (parse_statement); a statement
+        of the client is recorded as a CuentaRecord with them.
+        Returns full name found in pdf, "estimado" when there is no ID record to look for
         """
-        idRecord = IDRecord()
-        last_entry = idRecord.get_last_entry()
-        full_name = last_entry['full_name']
-
-        with pdfplumber.open(file) as pdf:
-            text = ""
-            for page in pdf.pages:
-                text += page.extract_text()
-                print(text)
-
-        pattern = r'\b' + re.escape(full_name.upper()) + r'\b'
-        
-        match = re.search(pattern, text)
-
-        if match:
-            print(f"Found '{full_name}' in all caps in the PDF")
-            return full_name
+        from models.id_record import IDRecord
+        if session_id is not None:
+            record = IDRecord.get_by_session(session_id)
         else:
-            words = full_name.upper().split()
-            flexible_pattern = r'\s*'.join([r'\b' + re.escape(word) + r'\b' for word in words])
-            flexible_match = re.search(flexible_pattern, text)
-            
-            if flexible_match:
-                print(f"Found '{full_name}' with some formatting variations in the PDF")
-                return full_name
-            else:
-                print(f"Could not find '{full_name}' in the PDF")
-                return "estimado"    
-    
\ No newline at end of file
+            record = IDRecord().get_last_entry()
+        if record is None:
+            return "estimado"
+        full_name = record['full_name']
+
+        cache = ExtractionCache.get_instance()
+        cache_key = ExtractionCache.make_key("statement", upload_digest(file), full_name)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached["match"]
+
+        with stage_timer("pdf"):
+            statement = OCRWorkerPool.get_instance().run(parse_statement, upload_source(file), full_name)
+        cache.put(cache_key, statement)
+        result = statement["match"]
+        if result != "estimado":
+            from models.cuenta_record import CuentaRecord
+            CuentaRecord(
+                full_name=statement["full_name"] or result,
+                address=statement["address"],
+                fecha_corte=statement["fecha_corte"]
+            ).save_later()
+        return result
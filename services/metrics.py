@@ -0,0 +1,194 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Histogram:
+    """Cumulative-bucket histogram of durations in seconds, as Prometheus reports them"""
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative, running = {}, 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            running += count
+            cumulative["+Inf" if bound == float("inf") else str(bound)] = running
+        return {'buckets': cumulative, 'sum': total, 'count': running}
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+
+class Gauge:
+    """A value that goes up and down, or is read from `function` when the metrics are scraped"""
+
+    def __init__(self, function=None):
+        self.value = 0.0
+        self.function = function
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        return self.function() if self.function else self.value
+
+
+class MetricFamily:
+    """All the children of one metric name, one per combination of label values"""
+
+    def __init__(self, name, help, kind, labelnames=(), factory=None):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.factory = factory
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self.factory())
+        return child
+
+    def attach(self, metric, *values):
+        """Export a metric object kept by another component under these label values"""
+        with self._lock:
+            self._children[values] = metric
+
+    def _label_text(self, values, extra=()):
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = list(self._children.items())
+        for values, metric in children:
+            if self.kind == "histogram":
+                snapshot = metric.snapshot()
+                for bound, count in snapshot['buckets'].items():
+                    lines.append(f"{self.name}_bucket{self._label_text(values, [('le', bound)])} {count}")
+                lines.append(f"{self.name}_sum{self._label_text(values)} {snapshot['sum']}")
+                lines.append(f"{self.name}_count{self._label_text(values)} {snapshot['count']}")
+            else:
+                value = metric.get() if self.kind == "gauge" else metric.value
+                lines.append(f"{self.name}{self._label_text(values)} {value}")
+        return "\n".join(lines)
+
+
+class MetricsRegistry:
+    """Every metric of the process, rendered in the Prometheus text format for /metrics"""
+
+    def __init__(self, prefix="llm_assistant_"):
+        self.prefix = prefix
+        self._families = {}
+        self._lock = threading.Lock()
+
+    def _family(self, name, help, kind, labelnames, factory):
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = MetricFamily(self.prefix + name, help, kind, labelnames, factory)
+            return family
+
+    def counter(self, name, help, labelnames=()):
+        return self._family(name, help, "counter", labelnames, Counter)
+
+    def gauge(self, name, help, labelnames=()):
+        return self._family(name, help, "gauge", labelnames, Gauge)
+
+    def histogram(self, name, help, labelnames=(), buckets=Histogram.DEFAULT_BUCKETS):
+        return self._family(name, help, "histogram", labelnames, lambda: Histogram(buckets))
+
+    def render(self):
+        with self._lock:
+            families = list(self._families.values())
+        return "\n".join(family.render() for family in families) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "stage_duration_seconds", "Time spent in each processing stage (ocr, pdf, db, llm)", ["stage"])
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time from request to the last byte of the response", ["endpoint"])
+HTTP_REQUESTS = REGISTRY.counter("http_requests_total", "Requests served", ["endpoint", "status"])
+HTTP_IN_FLIGHT = REGISTRY.gauge("http_requests_in_flight", "Requests being served, streams included", ["endpoint"])
+LLM_TTFT_SECONDS = REGISTRY.histogram(
+    "llm_time_to_first_token_seconds", "Time from the chat call to the first generated chunk")
+LLM_TOKENS_PER_SECOND = REGISTRY.histogram(
+    "llm_tokens_per_second", "Generation speed reported by Ollama (eval_count / eval_duration)",
+    buckets=(1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 400))
+LLM_TOKENS = REGISTRY.counter("llm_generated_tokens_total", "Tokens generated by the model")
+LLM_IN_FLIGHT = REGISTRY.gauge("llm_generations_in_flight", "Generations streaming from Ollama")
+IN_FLIGHT = REGISTRY.gauge("in_flight", "Work in progress per component", ["component"])
+
+
+@contextmanager
+def stage_timer(stage):
+    """Record the duration of the enclosed block under stage_duration_seconds{stage}"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - start)
+
+
+class GenerationMetrics:
+    """TTFT, speed, token count and in-flight gauge of one model call"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_token_at = None
+        LLM_IN_FLIGHT.labels().inc()
+
+    def chunk(self, chunk):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+            LLM_TTFT_SECONDS.labels().observe(self.first_token_at - self.start)
+        if chunk.get('done'):
+            eval_count = chunk.get('eval_count') or 0
+            eval_duration = chunk.get('eval_duration') or 0
+            LLM_TOKENS.labels().inc(eval_count)
+            if eval_count and eval_duration:
+                LLM_TOKENS_PER_SECOND.labels().observe(eval_count / (eval_duration / 1e9))
+
+    def finish(self):
+        LLM_IN_FLIGHT.labels().dec()
+        STAGE_SECONDS.labels("llm").observe(time.perf_counter() - self.start)
@@ -0,0 +1,176 @@
+import os
+import threading
+import time
+import unicodedata
+from pathlib import Path
+
+DATA_DIR = Path(__file__).resolve().parent.parent / 'data'
+
+# Characters Tesseract commonly confuses with capital letters on INE photos
+OCR_CONFUSIONS = str.maketrans({
+    'l': 'I', '1': 'I', '|': 'I', '!': 'I',
+    '0': 'O', '5': 'S', '$': 'S', '8': 'B', '6': 'G',
+})
+
+
+def normalize_word(word):
+    """ Uppercases an OCR'd word, fixes common OCR confusions and strips accents/punctuation. """
+    word = word.translate(OCR_CONFUSIONS).upper()
+    word = unicodedata.normalize('NFKD', word)
+    return ''.join(c for c in word if c.isalpha() and not unicodedata.combining(c))
+
+
+def _deletes(word):
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _edit_distance(a, b, limit):
+    """ Damerau-Levenshtein (optimal string alignment) distance, bailing out above limit. """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class NameDictionary:
+    """ Hashed exact lookup plus a deletion-neighbourhood index for OCR-noisy words. """
+
+    MEMO_SIZE = 4096
+
+    def __init__(self, names, max_distance=1, min_fuzzy_length=4):
+        self.max_distance = max_distance
+        self.min_fuzzy_length = min_fuzzy_length
+        self.exact = {}
+        self.fuzzy = {}
+        self._memo = {}
+        for name in names:
+            key = normalize_word(name)
+            if not key:
+                continue
+            self.exact.setdefault(key, name)
+            if len(key) >= min_fuzzy_length:
+                for variant in _deletes(key) | {key}:
+                    self.fuzzy.setdefault(variant, set()).add(key)
+
+    def __len__(self):
+        return len(self.exact)
+
+    def match(self, word):
+        """ Returns the dictionary spelling of word, or None if there is no unambiguous match. """
+        key = normalize_word(word)
+        if not key:
+            return None
+        if key in self.exact:
+            return self.exact[key]
+        if len(key) < self.min_fuzzy_length:
+            return None
+        if key in self._memo:
+            return self._memo[key]
+
+        result = self._fuzzy_match(key)
+        if len(self._memo) >= self.MEMO_SIZE:
+            self._memo.clear()
+        self._memo[key] = result
+        return result
+
+    def _fuzzy_match(self, key):
+        candidates = set()
+        for variant in _deletes(key) | {key}:
+            candidates |= self.fuzzy.get(variant, set())
+
+        best, best_distance, ambiguous = None, self.max_distance + 1, False
+        for candidate in candidates:
+            distance = _edit_distance(key, candidate, self.max_distance)
+            if distance < best_distance:
+                best, best_distance, ambiguous = candidate, distance, False
+            elif distance == best_distance:
+                ambiguous = True
+
+        if best is None or ambiguous:
+            return None
+        return self.exact[best]
+
+
+class NameIndex:
+    """ Process-wide index of first and last names, reloaded when the data files change. """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, data_dir=DATA_DIR, check_interval=5.0):
+        self.data_dir = Path(data_dir)
+        self.check_interval = check_interval
+        self._reload_lock = threading.Lock()
+        self._mtimes = None
+        self._checked_at = 0.0
+        self.first_names = NameDictionary([])
+        self.last_names = NameDictionary([])
+        self.all_names = NameDictionary([])
+        self.reload()
+
+    @classmethod
+    def get(cls):
+        """Get the shared index, loading it on first use"""
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls()
+        cls._instance.reload_if_changed()
+        return cls._instance
+
+    def _read(self, filename):
+        with open(self.data_dir / filename, 'r', encoding='utf-8') as f:
+            return [line.strip().upper() for line in f if line.strip()]
+
+    def _current_mtimes(self):
+        return tuple(os.stat(self.data_dir / name).st_mtime_ns for name in ('firsts.txt', 'lasts.txt'))
+
+    def reload(self):
+        """Rebuild both dictionaries from disk"""
+        with self._reload_lock:
+            mtimes = self._current_mtimes()
+            firsts, lasts = self._read('firsts.txt'), self._read('lasts.txt')
+            first_names, last_names = NameDictionary(firsts), NameDictionary(lasts)
+            all_names = NameDictionary(firsts + lasts)
+            self.first_names, self.last_names, self.all_names = first_names, last_names, all_names
+            self._mtimes = mtimes
+            self._checked_at = time.monotonic()
+
+    def reload_if_changed(self):
+        """Reload the dictionaries if the name files were modified since the last load"""
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return
+        self._checked_at = time.monotonic()
+        try:
+            if self._current_mtimes() != self._mtimes:
+                self.reload()
+        except OSError:
+            pass
+
+    def classify(self, word):
+        """
+        Dictionary spelling of an OCR'd word and whether it is a first and/or a last name,
+        as (spelling, is_first, is_last), or None. A word spelled exactly like a name of
+        either dictionary keeps it; only the others are fuzzy matched, once over both
+        dictionaries, so a surname one edit away from a first name (RANGEL/ANGEL,
+        LUGO/HUGO) is not rewritten into it.
+        """
+        first_names, last_names = self.first_names, self.last_names
+        key = normalize_word(word)
+        if key in first_names.exact or key in last_names.exact:
+            spelling = first_names.exact.get(key) or last_names.exact[key]
+        else:
+            spelling = self.all_names.match(word)
+            if spelling is None:
+                return None
+            key = normalize_word(spelling)
+        return spelling, key in first_names.exact, key in last_names.exact
@@ -0,0 +1,195 @@
+import logging
+import multiprocessing
+import os
+import resource
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError
+from services.metrics import REGISTRY, IN_FLIGHT, Gauge
+from services.tracing import in_context
+
+QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "ocr_queue_wait_seconds", "Time an OCR/PDF job waited for a worker process")
+
+
+class OCRQueueFull(Exception):
+    """ Raised when the OCR queue has no room for another job """
+
+
+class OCRTimeout(Exception):
+    """ Raised when an OCR job did not finish within its timeout """
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _timed_call(fn, args):
+    """
+    Runs inside a worker process, returns the result, the CPU seconds it used (tesseract included)
+    and the wall-clock time it started at
+    """
+    started_at = time.time()
+    start_cpu = time.process_time()
+    start_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    result = fn(*args)
+    end_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    children = (end_children.ru_utime - start_children.ru_utime) + (end_children.ru_stime - start_children.ru_stime)
+    return result, time.process_time() - start_cpu + children, started_at
+
+
+class OCRWorkerPool:
+    """
+    Process pool for pytesseract/pdfplumber work, sized to the available cores.
+    At most `workers + max_queue` jobs are accepted at once; beyond that submit raises OCRQueueFull.
+    Jobs can be awaited inline with run() or started in the background with start_job().
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, workers=None, max_queue=None, timeout=60, job_ttl=600, initializer=None):
+        self.workers = workers or available_cores()
+        self.max_queue = self.workers * 4 if max_queue is None else max_queue
+        self.timeout = timeout
+        self.job_ttl = job_ttl
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=initializer
+        )
+        self._job_runner = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ocr-job")
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_queue)
+        self._stats_lock = threading.Lock()
+        self._jobs = {}
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.cpu_seconds = 0.0
+        self.max_cpu_seconds = 0.0
+
+    @classmethod
+    def get_instance(cls):
+        """Get the process-wide pool configured from the environment"""
+        with cls._lock:
+            if cls._instance is None:
+                from services.name_index import NameIndex
+                workers = os.environ.get("OCR_WORKERS")
+                max_queue = os.environ.get("OCR_MAX_QUEUE")
+                cls._instance = cls(
+                    workers=int(workers) if workers else None,
+                    max_queue=int(max_queue) if max_queue else None,
+                    timeout=float(os.environ.get("OCR_JOB_TIMEOUT", 60)),
+                    initializer=NameIndex.get
+                )
+                IN_FLIGHT.attach(Gauge(lambda: cls._instance.in_flight), "ocr_pool")
+            return cls._instance
+
+    def submit(self, fn, *args):
+        """Queue fn(*args) on a worker process, fn must be a picklable module-level function"""
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self.rejected += 1
+            raise OCRQueueFull("OCR queue is full")
+        with self._stats_lock:
+            self.in_flight += 1
+        try:
+            future = self.executor.submit(_timed_call, fn, args)
+        except Exception:
+            self._release(None)
+            raise
+        future.submitted_at = time.time()
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future):
+        cpu = None
+        failed = future is None or future.cancelled() or future.exception() is not None
+        if not failed:
+            _, cpu, started_at = future.result()
+            QUEUE_WAIT_SECONDS.labels().observe(max(0.0, started_at - future.submitted_at))
+        with self._stats_lock:
+            self.in_flight -= 1
+            if failed:
+                self.failed += 1
+            else:
+                self.completed += 1
+                self.cpu_seconds += cpu
+                self.max_cpu_seconds = max(self.max_cpu_seconds, cpu)
+        self._slots.release()
+
+    def run(self, fn, *args, timeout=None):
+        """Run fn(*args) on the pool and wait for its result"""
+        future = self.submit(fn, *args)
+        try:
+            return future.result(timeout=timeout or self.timeout)[0]
+        except TimeoutError:
+            # a running process job cannot be interrupted; its slot is freed once it finishes
+            future.cancel()
+            with self._stats_lock:
+                self.timeouts += 1
+            raise OCRTimeout(f"OCR job did not finish within {timeout or self.timeout}s")
+
+    # =============================================================================
+    #   BACKGROUND JOBS
+    # =============================================================================
+    def start_job(self, fn, *args):
+        """
+        Run fn(*args) on a background thread and return a job id for get_job.
+        fn runs in this process and is expected to use run() for the CPU-heavy part.
+        """
+        self._expire_jobs()
+        with self._stats_lock:
+            pending = sum(1 for job in self._jobs.values() if not job['future'].done())
+            if pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise OCRQueueFull("OCR queue is full")
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {'future': self._job_runner.submit(in_context(fn), *args), 'created_at': time.time()}
+        return job_id
+
+    def get_job(self, job_id):
+        """Status of a background job: pending, done (with result) or failed (with error)"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        future = job['future']
+        if not future.done():
+            return {'status': 'pending'}
+        error = future.exception()
+        if error is not None:
+            return {'status': 'failed', 'error': str(error)}
+        return {'status': 'done', 'result': future.result()}
+
+    def _expire_jobs(self):
+        cutoff = time.time() - self.job_ttl
+        with self._stats_lock:
+            for job_id in [k for k, job in self._jobs.items() if job['created_at'] < cutoff and job['future'].done()]:
+                del self._jobs[job_id]
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'workers': self.workers,
+                'queue_capacity': self.max_queue,
+                'in_flight': self.in_flight,
+                'queue_depth': max(0, self.in_flight - self.workers),
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'cpu_seconds_total': self.cpu_seconds,
+                'cpu_seconds_avg': self.cpu_seconds / self.completed if self.completed else 0.0,
+                'cpu_seconds_max': self.max_cpu_seconds,
+                'background_jobs': len(self._jobs),
+            }
+
+    def shutdown(self):
+        logging.info("Shutting down OCR worker pool")
+        self._job_runner.shutdown(wait=False)
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -1,20 +1,109 @@
 import logging
+import os
 import threading
-from ollama import Client
+import time
+from services.ollama_pool import OllamaPool, AsyncOllamaPool
+from services.prompts import PromptRegistry
+
+
+def keep_alive_setting():
+    """How long Ollama keeps the model loaded after a request (OLLAMA_KEEP_ALIVE), sent with every call"""
+    return os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
 
 class OllamaClient:
+    """
+    Process-wide OllamaPool over OLLAMA_HOSTS, or over `host` when the first caller passes one.
+    A later caller passing a host the pool does not know adds it as a backend.
+    """
     _instance = None
     _lock = threading.Lock()
     
-    def __new__(cls, host="http://localhost:11434"):
+    def __new__(cls, host=None):
         with cls._lock:
             if cls._instance is None:
                 cls._instance = super(OllamaClient, cls).__new__(cls)
-                cls._instance.client = Client(host=host)
+                cls._instance.pool = OllamaPool.from_env(host)
+                cls._instance.client = cls._instance.pool
                 cls._instance.keep_alive_thread = None
-                logging.info("Created persistent Ollama client connection")
+                logging.info("Created persistent Ollama client connections")
+            elif host:
+                cls._instance.pool.add_backend(host)
             return cls._instance
     
     def get_client(self):
-        """Get the ollama client instance"""
-        return self.client
\ No newline at end of file
+        """Get the pooled client, it has the same chat/generate interface as ollama.Client"""
+        return self.client
+
+    def warmup(self, model, keep_alive=None):
+        """
+        Load the model and evaluate the prompt prefix shared by every call, so the first
+        client request pays for neither. Returns False if Ollama could not be reached.
+        """
+        keep_alive = keep_alive or keep_alive_setting()
+        warmed = True
+        for backend in self.pool.backends:
+            start = time.perf_counter()
+            try:
+                backend.client.chat(
+                    model=model,
+                    messages=[{"role": "system", "content": PromptRegistry.render('shared')}],
+                    options={'num_predict': 1},
+                    keep_alive=keep_alive
+                )
+            except Exception as e:
+                logging.error(f"Could not warm up {model} on {backend.host}: {e}")
+                warmed = False
+                continue
+            logging.info(f"Warmed up {model} on {backend.host} in {time.perf_counter() - start:.2f}s")
+        return warmed
+
+    def start_keep_alive(self, model, interval=None, keep_alive=None):
+        """
+        Refresh the model's keep_alive in the background every `interval` seconds
+        (OLLAMA_KEEP_ALIVE_INTERVAL) so a quiet period never unloads it.
+        """
+        interval = interval or float(os.environ.get("OLLAMA_KEEP_ALIVE_INTERVAL", 240))
+        keep_alive = keep_alive or keep_alive_setting()
+        if self.keep_alive_thread and self.keep_alive_thread.is_alive():
+            return self.keep_alive_thread
+
+        stop = threading.Event()
+
+        def refresh():
+            while not stop.wait(interval):
+                for backend in self.pool.backends:
+                    try:
+                        # an empty prompt only loads the model and resets its unload timer
+                        backend.client.generate(model=model, prompt="", keep_alive=keep_alive)
+                    except Exception as e:
+                        logging.warning(f"Keep-alive for {model} on {backend.host} failed: {e}")
+
+        self._keep_alive_stop = stop
+        self.keep_alive_thread = threading.Thread(target=refresh, name="ollama-keep-alive", daemon=True)
+        self.keep_alive_thread.start()
+        return self.keep_alive_thread
+
+    def stop_keep_alive(self):
+        if self.keep_alive_thread:
+            self._keep_alive_stop.set()
+            self.keep_alive_thread.join()
+            self.keep_alive_thread = None
+
+
+class AsyncOllamaClient:
+    """ Async view of the OllamaClient pool used by the ASGI app, sharing its backends and routing state """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, host=None):
+        pool = OllamaClient(host=host).pool
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super(AsyncOllamaClient, cls).__new__(cls)
+                cls._instance.client = AsyncOllamaPool(pool)
+                logging.info("Created persistent async Ollama client connections")
+            return cls._instance
+
+    def get_client(self):
+        """Get the pooled async client, it has the same chat/generate interface as ollama.AsyncClient"""
+        return self.client
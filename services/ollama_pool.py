@@ -0,0 +1,358 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
+
+class BackendUnavailable(ConnectionError):
+    """No Ollama backend is healthy or one did not free a slot in time"""
+
+
+def is_backend_failure(error):
+    """Errors that say the backend is down or overloaded, not that the request was wrong"""
+    import httpx
+    from ollama import ResponseError
+    if isinstance(error, ResponseError):
+        return error.status_code >= 500
+    return isinstance(error, (ConnectionError, httpx.TransportError))
+
+
+class OllamaBackend:
+    """One Ollama server with persistent sync/async HTTP clients and its routing state"""
+
+    def __init__(self, host, max_concurrency):
+        # ollama and httpx are imported with the first backend, not when the app is loaded
+        import httpx
+        from ollama import Client
+        self.host = host
+        self.max_concurrency = max_concurrency
+        max_connections = int(os.environ.get("OLLAMA_MAX_CONNECTIONS", 1000))
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.client = Client(host=host, limits=self.limits)
+        self._async_client = None
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+
+    @property
+    def async_client(self):
+        # httpx.AsyncClient binds to the loop it is first used on, so it is only built on demand
+        if self._async_client is None:
+            from ollama import AsyncClient
+            self._async_client = AsyncClient(host=self.host, limits=self.limits)
+        return self._async_client
+
+    def available(self, now):
+        return self.ejected_until <= now and (not self.max_concurrency or self.outstanding < self.max_concurrency)
+
+    def stats(self, now):
+        return {
+            'host': self.host,
+            'healthy': self.ejected_until <= now,
+            'outstanding': self.outstanding,
+            'requests': self.requests,
+            'failures': self.failures,
+        }
+
+
+class OllamaPool:
+    """
+    Spreads chat/generate calls over several Ollama servers, with the same call
+    interface as ollama.Client.
+
+    Each call goes to the healthy backend with the fewest outstanding requests, and
+    waits up to `acquire_timeout` seconds when every backend is at `max_concurrency`.
+    A backend that fails is ejected for `eject_seconds`, doubling on repeated failures.
+    The call is retried on another backend when nothing was streamed yet. A background
+    thread pings ejected backends and brings them back as soon as they answer.
+    """
+
+    def __init__(self, hosts, max_concurrency=4, eject_seconds=5.0, max_eject_seconds=60.0,
+                 acquire_timeout=30.0, retries=2, health_interval=5.0):
+        self.backends = []
+        self.max_concurrency = max_concurrency
+        self.eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        self.acquire_timeout = acquire_timeout
+        self.retries = retries
+        self.health_interval = health_interval
+        self._condition = threading.Condition()
+        # (loop, asyncio.Event) of every coroutine waiting in acquire_async
+        self._async_waiters = set()
+        self._health_thread = None
+        for host in hosts:
+            self.add_backend(host)
+
+    @classmethod
+    def from_env(cls, host=None):
+        """Pool over `host`, or over the comma-separated OLLAMA_HOSTS"""
+        hosts = [host] if host else os.environ.get("OLLAMA_HOSTS", "http://localhost:11434").split(",")
+        return cls(
+            [h.strip() for h in hosts if h.strip()],
+            max_concurrency=int(os.environ.get("OLLAMA_BACKEND_CONCURRENCY", 4)),
+            eject_seconds=float(os.environ.get("OLLAMA_EJECT_SECONDS", 5)),
+            acquire_timeout=float(os.environ.get("OLLAMA_ACQUIRE_TIMEOUT", 30)),
+            retries=int(os.environ.get("OLLAMA_RETRIES", 2)),
+            health_interval=float(os.environ.get("OLLAMA_HEALTH_INTERVAL", 5)),
+        )
+
+    def add_backend(self, host):
+        with self._condition:
+            if any(backend.host == host for backend in self.backends):
+                return
+            self.backends.append(OllamaBackend(host, self.max_concurrency))
+            self._notify_waiters()
+        logging.info(f"Added Ollama backend {host}")
+
+    # -------------------------------------------------------------------------
+    #   routing
+    # -------------------------------------------------------------------------
+    def _try_acquire(self, exclude):
+        now = time.monotonic()
+        candidates = [b for b in self.backends if b not in exclude and b.available(now)]
+        if not candidates:
+            return None
+        backend = min(candidates, key=lambda b: (b.outstanding, b.requests))
+        backend.outstanding += 1
+        backend.requests += 1
+        return backend
+
+    def _all_ejected(self, exclude):
+        now = time.monotonic()
+        return all(b in exclude or b.ejected_until > now for b in self.backends)
+
+    def acquire(self, exclude=()):
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._condition:
+            while True:
+                backend = self._try_acquire(exclude)
+                if backend:
+                    return backend
+                if self._all_ejected(exclude):
+                    raise BackendUnavailable("No healthy Ollama backend")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise BackendUnavailable("Timed out waiting for an Ollama backend")
+                self._condition.wait(remaining)
+
+    async def acquire_async(self, exclude=()):
+        deadline = time.monotonic() + self.acquire_timeout
+        loop = asyncio.get_running_loop()
+        while True:
+            waiter = (loop, asyncio.Event())
+            with self._condition:
+                backend = self._try_acquire(exclude)
+                if backend:
+                    return backend
+                if self._all_ejected(exclude):
+                    raise BackendUnavailable("No healthy Ollama backend")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise BackendUnavailable("Timed out waiting for an Ollama backend")
+                # registered under the lock, so a release right after it still wakes this coroutine
+                self._async_waiters.add(waiter)
+            try:
+                await asyncio.wait_for(waiter[1].wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._condition:
+                    self._async_waiters.discard(waiter)
+
+    def _notify_waiters(self):
+        """Wake the threads and coroutines waiting for a backend; called holding _condition"""
+        self._condition.notify_all()
+        for loop, event in self._async_waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # the loop of an abandoned waiter is already closed
+                pass
+        self._async_waiters.clear()
+
+    def release(self, backend, error=None):
+        with self._condition:
+            backend.outstanding -= 1
+            if error is not None and is_backend_failure(error):
+                self._eject(backend, error)
+            elif error is None:
+                backend.consecutive_failures = 0
+            self._notify_waiters()
+
+    def _eject(self, backend, error):
+        backend.failures += 1
+        backend.consecutive_failures += 1
+        seconds = min(self.max_eject_seconds, self.eject_seconds * 2 ** (backend.consecutive_failures - 1))
+        backend.ejected_until = time.monotonic() + seconds
+        logging.warning(f"Ejected Ollama backend {backend.host} for {seconds:.0f}s: {error}")
+        self._start_health_checks()
+
+    def _retry(self, backend, error, tried):
+        """Whether a failed call should be sent to another backend"""
+        tried.add(backend)
+        return is_backend_failure(error) and len(tried) <= self.retries and not self._all_ejected(tried)
+
+    # -------------------------------------------------------------------------
+    #   health checks
+    # -------------------------------------------------------------------------
+    def _start_health_checks(self):
+        if self.health_interval and not (self._health_thread and self._health_thread.is_alive()):
+            self._health_thread = threading.Thread(target=self._health_loop, name="ollama-health", daemon=True)
+            self._health_thread.start()
+
+    def _health_loop(self):
+        while True:
+            time.sleep(self.health_interval)
+            if not self.check_health():
+                return
+
+    def check_health(self):
+        """Ping every ejected backend and restore the ones that answer. Returns whether any is still ejected."""
+        now = time.monotonic()
+        ejected = [b for b in self.backends if b.ejected_until > now]
+        for backend in ejected:
+            try:
+                backend.client.ps()
+            except Exception:
+                continue
+            with self._condition:
+                backend.ejected_until = 0.0
+                self._notify_waiters()
+            logging.info(f"Ollama backend {backend.host} is healthy again")
+        return any(b.ejected_until > time.monotonic() for b in self.backends)
+
+    # -------------------------------------------------------------------------
+    #   ollama.Client interface
+    # -------------------------------------------------------------------------
+    def chat(self, **kwargs):
+        return self._call('chat', kwargs)
+
+    def generate(self, **kwargs):
+        return self._call('generate', kwargs)
+
+    def _call(self, method, kwargs):
+        if kwargs.get('stream'):
+            return self._stream(method, kwargs)
+        tried = set()
+        while True:
+            backend = self.acquire(tried)
+            try:
+                result = getattr(backend.client, method)(**kwargs)
+            except Exception as e:
+                self.release(backend, e)
+                if self._retry(backend, e, tried):
+                    continue
+                raise
+            self.release(backend)
+            return result
+
+    def _stream(self, method, kwargs):
+        tried = set()
+        while True:
+            backend = self.acquire(tried)
+            try:
+                stream = getattr(backend.client, method)(**kwargs)
+                # the request is only sent on the first read, so failures usually show up here
+                first = next(stream)
+            except StopIteration:
+                self.release(backend)
+                return
+            except Exception as e:
+                self.release(backend, e)
+                if self._retry(backend, e, tried):
+                    continue
+                raise
+            break
+
+        error = None
+        try:
+            yield first
+            yield from stream
+        except GeneratorExit:
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            stream.close()
+            self.release(backend, error)
+
+    # -------------------------------------------------------------------------
+    #   ollama.AsyncClient interface
+    # -------------------------------------------------------------------------
+    async def achat(self, **kwargs):
+        return await self._acall('chat', kwargs)
+
+    async def agenerate(self, **kwargs):
+        return await self._acall('generate', kwargs)
+
+    async def _acall(self, method, kwargs):
+        if kwargs.get('stream'):
+            return self._astream(method, kwargs)
+        tried = set()
+        while True:
+            backend = await self.acquire_async(tried)
+            try:
+                result = await getattr(backend.async_client, method)(**kwargs)
+            except Exception as e:
+                self.release(backend, e)
+                if self._retry(backend, e, tried):
+                    continue
+                raise
+            self.release(backend)
+            return result
+
+    async def _astream(self, method, kwargs):
+        tried = set()
+        while True:
+            backend = await self.acquire_async(tried)
+            try:
+                stream = await getattr(backend.async_client, method)(**kwargs)
+                first = await stream.__anext__()
+            except StopAsyncIteration:
+                self.release(backend)
+                return
+            except Exception as e:
+                self.release(backend, e)
+                if self._retry(backend, e, tried):
+                    continue
+                raise
+            break
+
+        error = None
+        try:
+            yield first
+            async for chunk in stream:
+                yield chunk
+        except GeneratorExit:
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            await stream.aclose()
+            self.release(backend, error)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._condition:
+            return {
+                'max_concurrency': self.max_concurrency,
+                'backends': [backend.stats(now) for backend in self.backends],
+            }
+
+
+class AsyncOllamaPool:
+    """The async face of an OllamaPool: same backends, counters and ejections, ollama.AsyncClient interface"""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def chat(self, **kwargs):
+        return await self.pool.achat(**kwargs)
+
+    async def generate(self, **kwargs):
+        return await self.pool.agenerate(**kwargs)
@@ -0,0 +1,65 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class RecordCache:
+    """
+    Write-through LRU + TTL cache of recently created database records, keyed by
+    (table, key). Models put a record here when they save it, so the lookups that
+    follow within the same session are answered without a query.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, max_entries=4096, ttl=1800):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._entries_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def get_instance(cls):
+        """Get the process-wide cache configured from the environment"""
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls(
+                    max_entries=int(os.environ.get("RECORD_CACHE_SIZE", 4096)),
+                    ttl=int(os.environ.get("RECORD_CACHE_TTL", 1800)),
+                )
+            return cls._instance
+
+    def get(self, table, key):
+        with self._entries_lock:
+            entry = self._entries.get((table, key))
+            if entry is None or entry[1] < time.time():
+                self._entries.pop((table, key), None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end((table, key))
+            self.hits += 1
+            return dict(entry[0])
+
+    def put(self, table, key, record):
+        with self._entries_lock:
+            self._entries[(table, key)] = (dict(record), time.time() + self.ttl)
+            self._entries.move_to_end((table, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._entries_lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._entries_lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
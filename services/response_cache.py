@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+def iter_chunks(text, words_per_chunk=3):
+    """Split a cached reply into word chunks so it can be replayed like a live stream"""
+    words = re.findall(r'\S+\s*', text)
+    for i in range(0, len(words), words_per_chunk):
+        yield "".join(words[i:i + words_per_chunk])
+
+
+class ResponseCache:
+    """
+    LRU + TTL cache of complete LLM replies keyed by (model, system prompt, messages, options).
+    Each key can hold a pool of up to `variants` different replies which are rotated on
+    every hit, so cached answers still vary between visitors.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, max_entries=256, ttl=3600, variants=1):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.variants = max(1, variants)
+        self._entries = OrderedDict()
+        self._entries_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def get_instance(cls):
+        """Get the process-wide cache configured from the environment"""
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls(
+                    max_entries=int(os.environ.get("RESPONSE_CACHE_SIZE", 256)),
+                    ttl=int(os.environ.get("RESPONSE_CACHE_TTL", 3600)),
+                    variants=int(os.environ.get("RESPONSE_CACHE_VARIANTS", 1)),
+                )
+            return cls._instance
+
+    @staticmethod
+    def make_key(model, messages, options):
+        """Stable key for one chat call, the system prompt being the first of the messages"""
+        payload = json.dumps([model, messages, options], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key):
+        """Return the next cached variant for key, or None while its pool is not full yet"""
+        with self._entries_lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['expires_at'] < time.time():
+                del self._entries[key]
+                entry = None
+            if entry is None or len(entry['variants']) < self.variants:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            text = entry['variants'][entry['next'] % len(entry['variants'])]
+            entry['next'] += 1
+            return text
+
+    def put(self, key, text):
+        with self._entries_lock:
+            entry = self._entries.get(key)
+            if entry is None or entry['expires_at'] < time.time():
+                entry = {'variants': [], 'next': 0, 'expires_at': time.time() + self.ttl}
+                self._entries[key] = entry
+            if len(entry['variants']) < self.variants:
+                entry['variants'].append(text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._entries_lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._entries_lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
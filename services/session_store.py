@@ -0,0 +1,155 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+
+class InMemorySessionBackend:
+    """ Session state held in a lock-striped dict, private to one worker process. """
+
+    def __init__(self, stripes=32):
+        self._stripes = [(threading.Lock(), {}) for _ in range(stripes)]
+
+    def _stripe(self, key):
+        return self._stripes[zlib.crc32(key.encode()) % len(self._stripes)]
+
+    def get(self, key):
+        lock, data = self._stripe(key)
+        with lock:
+            entry = data.get(key)
+            if entry is None:
+                return None
+            if entry[1] < time.time():
+                del data[key]
+                return None
+            return entry[0]
+
+    def update(self, key, fn, ttl):
+        """Atomically apply fn to the current value and store the result"""
+        lock, data = self._stripe(key)
+        with lock:
+            entry = data.get(key)
+            current = entry[0] if entry and entry[1] >= time.time() else None
+            value = fn(current)
+            data[key] = (value, time.time() + ttl)
+            return value
+
+    def delete(self, key):
+        lock, data = self._stripe(key)
+        with lock:
+            data.pop(key, None)
+
+    def evict_expired(self):
+        now = time.time()
+        evicted = 0
+        for lock, data in self._stripes:
+            with lock:
+                expired = [key for key, (_, expires_at) in data.items() if expires_at < now]
+                for key in expired:
+                    del data[key]
+                evicted += len(expired)
+        return evicted
+
+    def __len__(self):
+        return sum(len(data) for _, data in self._stripes)
+
+
+class SQLiteSessionBackend:
+    """ Session state in a local SQLite file, shared by every worker on the host. """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)")
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT value FROM sessions WHERE session_id = ? AND expires_at >= ?", (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, key, fn, ttl):
+        """Atomically apply fn to the current value and store the result"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value FROM sessions WHERE session_id = ? AND expires_at >= ?", (key, time.time())
+            ).fetchone()
+            value = fn(json.loads(row[0]) if row else None)
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + ttl),
+            )
+            conn.execute("COMMIT")
+            return value
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, key):
+        self._connection().execute("DELETE FROM sessions WHERE session_id = ?", (key,))
+
+    def evict_expired(self):
+        return self._connection().execute("DELETE FROM sessions WHERE expires_at < ?", (time.time(),)).rowcount
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+class SessionStore:
+    """ Per-session state with TTL eviction. Backend is chosen with SESSION_BACKEND (memory|sqlite). """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, backend, ttl=1800, sweep_interval=60):
+        self.backend = backend
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._last_sweep = time.monotonic()
+
+    @classmethod
+    def get_instance(cls):
+        """Get the process-wide store configured from the environment"""
+        with cls._lock:
+            if cls._instance is None:
+                ttl = int(os.environ.get("SESSION_TTL", 1800))
+                if os.environ.get("SESSION_BACKEND", "memory") == "sqlite":
+                    backend = SQLiteSessionBackend(os.environ.get("SESSION_DB_PATH", "sessions.db"))
+                else:
+                    backend = InMemorySessionBackend()
+                cls._instance = cls(backend, ttl=ttl)
+            return cls._instance
+
+    def _maybe_sweep(self):
+        if time.monotonic() - self._last_sweep >= self.sweep_interval:
+            self._last_sweep = time.monotonic()
+            self.backend.evict_expired()
+
+    def get(self, session_id, default=None):
+        value = self.backend.get(session_id)
+        return default if value is None else value
+
+    def update(self, session_id, fn):
+        """Read-modify-write the state of one session, refreshing its TTL"""
+        self._maybe_sweep()
+        return self.backend.update(session_id, fn, self.ttl)
+
+    def delete(self, session_id):
+        self.backend.delete(session_id)
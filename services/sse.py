@@ -0,0 +1,131 @@
+import asyncio
+import json
+import logging
+import queue
+import threading
+
+from flask import Response
+
+from services.tracing import in_context
+
+HEARTBEAT_INTERVAL = 15.0
+MAX_BUFFERED_CHUNKS = 64
+
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'Connection': 'keep-alive',
+    'X-Accel-Buffering': 'no',
+    'Access-Control-Allow-Origin': '*',
+}
+
+_DONE = object()
+
+
+def format_event(data, event=None):
+    """Format one server-sent event carrying a JSON payload"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+def stream_events(chunks, heartbeat_interval=HEARTBEAT_INTERVAL, max_buffered=MAX_BUFFERED_CHUNKS):
+    """
+    Relays an upstream generator as server-sent events.
+
+    The upstream is read on a helper thread into a bounded queue, so a slow client
+    pauses the upstream read instead of buffering the whole generation (backpressure).
+    A heartbeat comment is sent whenever the upstream is silent for heartbeat_interval,
+    which also lets the server notice a client that went away. When the client
+    disconnects the upstream generator is closed, cancelling the Ollama stream.
+    """
+    buffer = queue.Queue(maxsize=max_buffered)
+    cancelled = threading.Event()
+
+    def put(item):
+        while not cancelled.is_set():
+            try:
+                buffer.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for chunk in chunks:
+                if not put(chunk):
+                    break
+        except Exception as e:
+            logging.error(f"Error in upstream event stream: {e}")
+            put({'error': str(e)})
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+            put(_DONE)
+
+    producer = threading.Thread(target=in_context(produce), daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            try:
+                item = buffer.get(timeout=heartbeat_interval)
+            except queue.Empty:
+                yield ": heartbeat\n\n"
+                continue
+            if item is _DONE:
+                break
+            if isinstance(item, dict):
+                yield format_event(item)
+            else:
+                yield format_event({'chunk': item})
+    finally:
+        # Runs on normal completion and on GeneratorExit when the client disconnects
+        cancelled.set()
+
+
+async def astream_events(chunks, heartbeat_interval=HEARTBEAT_INTERVAL, max_buffered=MAX_BUFFERED_CHUNKS):
+    """
+    Async counterpart of stream_events for the ASGI app.
+    The upstream async generator runs as a task feeding a bounded asyncio.Queue and is
+    closed when the client disconnects and the server cancels this generator.
+    """
+    buffer = asyncio.Queue(maxsize=max_buffered)
+
+    async def produce():
+        try:
+            async for chunk in chunks:
+                await buffer.put(chunk)
+        except Exception as e:
+            logging.error(f"Error in upstream event stream: {e}")
+            await buffer.put({'error': str(e)})
+        finally:
+            if hasattr(chunks, 'aclose'):
+                await chunks.aclose()
+        await buffer.put(_DONE)
+
+    producer = asyncio.create_task(produce())
+
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(buffer.get(), heartbeat_interval)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            if item is _DONE:
+                break
+            if isinstance(item, dict):
+                yield format_event(item)
+            else:
+                yield format_event({'chunk': item})
+    finally:
+        producer.cancel()
+
+
+def sse_response(events, headers=None):
+    """Wrap an event generator into a text/event-stream response"""
+    return Response(
+        events,
+        mimetype='text/event-stream',
+        headers={**SSE_HEADERS, **(headers or {})}
+    )
@@ -0,0 +1,208 @@
+import logging
+import os
+import re
+
+# Fraction of the first page, from the top, that holds the client and statement details
+HEADER_RATIO = 0.3
+# Horizontal gap (points) that separates two blocks of text on the same line
+SEGMENT_GAP = 15
+# How far (points) the lines of one block may be from its left edge
+COLUMN_TOLERANCE = 12
+
+MONTHS = {"ENE": 1, "FEB": 2, "MAR": 3, "ABR": 4, "MAY": 5, "JUN": 6,
+          "JUL": 7, "AGO": 8, "SEP": 9, "OCT": 10, "NOV": 11, "DIC": 12}
+MONTH_ABBREVIATIONS = {number: name for name, number in MONTHS.items()}
+
+# 15/MAR/2024, 15-03-24, 15 DE MARZO DE 2024, 2024-03-15
+DATE = re.compile(
+    r"\b(?P<d1>\d{1,2})\s*[/.-]\s*(?P<m1>[A-Z]{3,10}|\d{1,2})\s*[/.-]\s*(?P<y1>\d{4}|\d{2})\b"
+    r"|\b(?P<d2>\d{1,2})\s+DE\s+(?P<m2>[A-Z]{4,10})\s+(?:DEL?\s+)?(?P<y2>\d{4})\b"
+    r"|\b(?P<y3>\d{4})-(?P<m3>\d{2})-(?P<d3>\d{2})\b"
+)
+CUT_OFF_LABEL = re.compile(r"\b(FECHA\s+DE\s+CORTE|CORTE\s+AL|FECHA\s+DE\s+EMISION)\b")
+PERIOD_LABEL = re.compile(r"\bPERIODO\b")
+NAME_LABEL = re.compile(r"^(?:NOMBRE(?:\s+DEL?\s+(?:CLIENTE|TITULAR))?|CLIENTE|TITULAR)\b\s*:?\s*(.*)$")
+ADDRESS_LABEL = re.compile(r"^(?:DOMICILIO(?:\s+FISCAL)?|DIRECCION)\b\s*:?\s*(.*)$")
+# lines that end the name/address block
+STOP = re.compile(r"^(?:RFC|CURP|NO\.?\s+DE\s+CUENTA|N[UÚ]MERO|CUENTA|CLABE|FECHA|PERIODO|SUCURSAL|PAGINA|ESTADO\s+DE\s+CUENTA)\b")
+NAME_SHAPE = re.compile(r"^[A-ZÁÉÍÓÚÜÑ][A-ZÁÉÍÓÚÜÑ.' ]+$")
+BANK_WORDS = {"BANCO", "BBVA", "BANORTE", "SANTANDER", "HSBC", "SCOTIABANK", "BANAMEX", "CITIBANAMEX",
+              "INBURSA", "AZTECA", "BANCOPPEL", "AFIRME", "BANREGIO", "MEXICO", "BAJIO"}
+
+
+def parse_date(text, last=False):
+    """The first (or last) date in the text as DD/MMM/YYYY, None if there is none"""
+    dates = []
+    for match in DATE.finditer(text):
+        groups = match.groupdict()
+        form = next(i for i in (1, 2, 3) if groups[f"d{i}"])
+        day, month, year = groups[f"d{form}"], groups[f"m{form}"], groups[f"y{form}"]
+        month = int(month) if month.isdigit() else MONTHS.get(month[:3])
+        if month not in MONTH_ABBREVIATIONS or not 1 <= int(day) <= 31:
+            continue
+        year = int(year) + 2000 if len(year) == 2 else int(year)
+        dates.append(f"{int(day):02d}/{MONTH_ABBREVIATIONS[month]}/{year}")
+    if not dates:
+        return None
+    return dates[-1] if last else dates[0]
+
+
+def header_segments(words):
+    """
+    Words grouped into lines by their top, and lines split into blocks wherever the
+    gap between two words is wider than SEGMENT_GAP. Top to bottom, left to right.
+    """
+    lines = []
+    for word in sorted(words, key=lambda word: (round(word["top"]), word["x0"])):
+        if lines and abs(lines[-1][0]["top"] - word["top"]) <= 2:
+            lines[-1].append(word)
+        else:
+            lines.append([word])
+
+    segments = []
+    for line in lines:
+        line.sort(key=lambda word: word["x0"])
+        current = [line[0]]
+        for word in line[1:]:
+            if word["x0"] - current[-1]["x1"] > SEGMENT_GAP:
+                segments.append(_segment(current))
+                current = []
+            current.append(word)
+        segments.append(_segment(current))
+    return segments
+
+
+def _segment(words):
+    return {
+        "words": words,
+        "text": " ".join(word["text"] for word in words).upper(),
+        "x0": words[0]["x0"],
+        "x1": words[-1]["x1"],
+        "top": min(word["top"] for word in words),
+        "size": max(word.get("size", 10) for word in words),
+    }
+
+
+def _below(segments, segment, x0=None):
+    """The segment on the next line that starts in the same column, None if there is none"""
+    x0 = segment["x0"] if x0 is None else x0
+    candidates = [other for other in segments if other["top"] > segment["top"] + 2
+                  and abs(other["x0"] - x0) <= COLUMN_TOLERANCE]
+    if not candidates:
+        return None
+    nearest = min(candidates, key=lambda other: other["top"])
+    # further than two lines down is another block
+    return nearest if nearest["top"] - segment["top"] <= 2.5 * segment["size"] else None
+
+
+def _value_x0(segment, value):
+    """Left edge of the words that make up `value` at the end of a labelled segment"""
+    count = len(value.split())
+    return segment["words"][-count]["x0"] if count else segment["x1"]
+
+
+def _looks_like_name(text):
+    words = text.split()
+    return (len(words) >= 2 and NAME_SHAPE.match(text) is not None and not STOP.match(text)
+            and not BANK_WORDS.intersection(words))
+
+
+def _block_below(segments, segment, x0=None, limit=3):
+    """Up to `limit` lines below a segment in the same column, until a label line"""
+    lines = []
+    while len(lines) < limit:
+        segment = _below(segments, segment, x0)
+        if segment is None or STOP.match(segment["text"]) or NAME_LABEL.match(segment["text"]):
+            break
+        lines.append(segment["text"])
+        x0 = segment["x0"]
+    return lines
+
+
+def parse_header(segments, full_name=None):
+    """Name, address and cut-off date from the blocks of a statement header"""
+    name_segment, name, address, fecha_corte = None, None, None, None
+
+    for segment in segments:
+        text = segment["text"]
+        if fecha_corte is None and (CUT_OFF_LABEL.search(text) or PERIOD_LABEL.search(text)):
+            # the period ends on the cut-off date; a label without a date has it on the line below
+            last = CUT_OFF_LABEL.search(text) is None
+            fecha_corte = parse_date(text, last)
+            if fecha_corte is None:
+                below = _below(segments, segment)
+                fecha_corte = parse_date(below["text"], last) if below else None
+        if name is None and (match := NAME_LABEL.match(text)):
+            value_segment = segment if match.group(1) else _below(segments, segment)
+            if value_segment is not None:
+                name_segment, name = value_segment, match.group(1) or value_segment["text"]
+        if address is None and (match := ADDRESS_LABEL.match(text)):
+            value = match.group(1)
+            x0 = _value_x0(segment, value) if value else segment["x0"]
+            address = " ".join(([value] if value else []) + _block_below(segments, segment, x0))
+
+    if name is None and full_name:
+        # the name of the client the statement should belong to, wherever it is in the header
+        from services.localOCRService import compile_name_patterns
+        exact, flexible = compile_name_patterns(full_name)
+        name_segment = next((segment for segment in segments if flexible.search(segment["text"])), None)
+        name = name_segment["text"] if name_segment else None
+    if name is None:
+        name_segment = next((segment for segment in segments if _looks_like_name(segment["text"])), None)
+        name = name_segment["text"] if name_segment else None
+    if address is None and name_segment is not None:
+        address = " ".join(_block_below(segments, name_segment)) or None
+
+    return {
+        "full_name": " ".join(name.split()) if name else None,
+        "address": " ".join(address.split()) if address else None,
+        "fecha_corte": fecha_corte,
+    }
+
+
+def parse_statement(pdf_source, full_name=None, max_pages=None, header_ratio=None):
+    """
+    Runs in an OCR worker process.
+    Reads the client name, address and cut-off date from the header of the first page of a
+    statement (a path or its bytes) and, when full_name is given, whether the statement is
+    that client's, in one pass over the PDF. The name is looked for in the header first and
+    then page by page, stopping at the first page that has it (max_pages, header_ratio).
+    Returns the fields plus "match": full_name if it was found, "estimado" otherwise.
+    """
+    if max_pages is None and os.environ.get("PDF_MAX_PAGES"):
+        max_pages = int(os.environ["PDF_MAX_PAGES"])
+    if header_ratio is None and os.environ.get("PDF_HEADER_RATIO"):
+        header_ratio = float(os.environ["PDF_HEADER_RATIO"])
+
+    import pdfplumber
+    from services.localOCRService import compile_name_patterns, open_source
+
+    fields = {"full_name": None, "address": None, "fecha_corte": None}
+    patterns = compile_name_patterns(full_name) if full_name else None
+    found = False
+    carry_length = len(full_name) * 2 if full_name else 0
+    carry = ""
+
+    with pdfplumber.open(open_source(pdf_source)) as pdf:
+        for page_number, page in enumerate(pdf.pages):
+            if max_pages and page_number >= max_pages:
+                break
+            if page_number == 0:
+                header = page.crop((0, 0, page.width, page.height * HEADER_RATIO))
+                segments = header_segments(header.extract_words(extra_attrs=["size"]))
+                fields = parse_header(segments, full_name)
+                if patterns and fields["full_name"] and patterns[1].search(fields["full_name"]):
+                    found = True
+            if not patterns or found:
+                break
+
+            region = page.crop((0, 0, page.width, page.height * header_ratio)) if header_ratio else page
+            text = carry + (region.extract_text() or "")
+            page.close()
+            if patterns[0].search(text) or patterns[1].search(text):
+                logging.debug(f"Found '{full_name}' in the statement (page {page_number + 1})")
+                found = True
+                break
+            carry = text[-carry_length:] + "\n"
+
+    return {**fields, "match": full_name if found else "estimado"}
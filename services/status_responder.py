@@ -0,0 +1,64 @@
+import os
+import zlib
+
+
+class StatusResponder:
+    """
+    Document status messages rendered from fixed Spanish templates, without the model.
+    Each state has a few phrasings; a session always gets the same one so the wording
+    does not change between its messages. The LLM path stays available for more variety
+    with STATUS_RESPONDER=llm.
+    """
+
+    STATES = ('both', 'jpg', 'pdf', 'none')
+
+    TEMPLATES = {
+        'both': (
+            "{greeting}, hemos recibido su identificación y su estado de cuenta. "
+            "Su solicitud está completa y lista para ser revisada por un experto de nuestro equipo. "
+            "Un representante del banco se pondrá en contacto con usted pronto.",
+            "{greeting}, ya contamos con su INE y su estado de cuenta, su solicitud está completa. "
+            "Un experto de nuestro equipo la revisará y un representante del banco se comunicará con usted pronto.",
+        ),
+        'jpg': (
+            "{greeting}, hemos recibido su identificación. "
+            "Solo falta subir su estado de cuenta para continuar con su solicitud.",
+            "{greeting}, su INE se recibió correctamente. "
+            "El siguiente paso es subir su estado de cuenta.",
+        ),
+        'pdf': (
+            "Hemos recibido su estado de cuenta. "
+            "Solo falta subir una foto de su INE para continuar.",
+            "Su estado de cuenta se recibió correctamente. "
+            "Para continuar, solo falta una fotografía de su INE.",
+        ),
+        'none': (
+            "Aún no ha subido ningún documento. "
+            "Para continuar se requiere una fotografía de su INE y una copia de su estado de cuenta.",
+            "Todavía no recibimos documentos. "
+            "Para iniciar su solicitud necesitamos una foto de su INE y su estado de cuenta.",
+        ),
+    }
+
+    @staticmethod
+    def use_llm():
+        return os.environ.get("STATUS_RESPONDER", "template") == "llm"
+
+    @staticmethod
+    def state(has_jpg, has_pdf):
+        if has_jpg and has_pdf:
+            return 'both'
+        if has_jpg:
+            return 'jpg'
+        if has_pdf:
+            return 'pdf'
+        return 'none'
+
+    @classmethod
+    def render(cls, state, client_name=None, session_id=None):
+        variants = cls.TEMPLATES[state]
+        variant = variants[zlib.crc32(session_id.encode()) % len(variants)] if session_id else variants[0]
+        # parse_statement answers "estimado" when the statement does not carry the ID's name
+        known = client_name and client_name.strip() and client_name.strip().lower() != "estimado"
+        greeting = f"Gracias, {client_name.strip().title()}" if known else "Gracias"
+        return variant.format(greeting=greeting)
@@ -0,0 +1,53 @@
+import contextvars
+import logging
+import os
+import uuid
+
+TRACE_HEADER = 'X-Request-Id'
+
+_trace_id = contextvars.ContextVar("trace_id", default="-")
+
+
+def new_trace_id(trace_id=None):
+    """Start a trace for the current request (or job), reusing the caller's id when given"""
+    trace_id = trace_id or uuid.uuid4().hex[:16]
+    _trace_id.set(trace_id)
+    return trace_id
+
+
+def get_trace_id():
+    return _trace_id.get()
+
+
+def in_context(fn):
+    """
+    fn bound to a copy of the current context, so a thread or executor running it
+    logs under the trace id of the request that started it
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.run(fn, *args, **kwargs)
+    return run
+
+
+def configure_logging():
+    """Root logging with the trace id on every record (LOG_LEVEL, INFO by default)"""
+    factory = logging.getLogRecordFactory()
+    if getattr(factory, "adds_trace_id", False):
+        return
+
+    def record_factory(*args, **kwargs):
+        record = factory(*args, **kwargs)
+        record.trace_id = _trace_id.get()
+        return record
+
+    record_factory.adds_trace_id = True
+    logging.setLogRecordFactory(record_factory)
+    logging.basicConfig(
+        level=os.environ.get("LOG_LEVEL", "INFO"),
+        format="%(asctime)s %(levelname)s [%(trace_id)s] %(name)s: %(message)s",
+        force=True
+    )
+    # one line per Ollama call is noise at INFO
+    logging.getLogger("httpx").setLevel(logging.WARNING)
@@ -0,0 +1,156 @@
+import hashlib
+import io
+import os
+import tempfile
+from pathlib import Path
+
+from werkzeug.exceptions import RequestEntityTooLarge
+
+# leading bytes of the documents the service accepts
+SIGNATURES = ((b"%PDF-", "pdf"), (b"\xff\xd8\xff", "jpg"))
+SNIFF_BYTES = max(len(signature) for signature, _ in SIGNATURES)
+
+
+def upload_max_bytes():
+    return int(os.environ.get("UPLOAD_MAX_BYTES", 20 * 1024 * 1024))
+
+
+def max_content_length():
+    """Cap of a whole upload request: the file plus room for the other form fields and the multipart framing"""
+    return upload_max_bytes() + 64 * 1024
+
+
+class UploadSpool:
+    """
+    Destination of an uploaded file while the multipart body is parsed.
+    The file is written chunk by chunk as it arrives: its size is checked against
+    UPLOAD_MAX_BYTES on every write (413 as soon as it goes over), its sha256 and
+    leading bytes are taken on the way, and once it passes UPLOAD_SPOOL_BYTES it is
+    moved from memory to a file in UPLOAD_SPOOL_DIR. OCR workers then get the path
+    of that file instead of a copy of its bytes.
+    """
+
+    def __init__(self, max_bytes, spool_bytes, directory):
+        self.max_bytes = max_bytes
+        self.spool_bytes = spool_bytes
+        self.directory = Path(directory)
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+        self.detached = False
+        self._head = b""
+        self._file = io.BytesIO()
+        self.path = None
+
+    @classmethod
+    def from_env(cls, *args, **kwargs):
+        """
+        Spool configured from the environment. Accepts the arguments werkzeug and Quart
+        pass to a stream factory, so it can be used as one.
+        """
+        directory = os.environ.get("UPLOAD_SPOOL_DIR", Path(tempfile.gettempdir()) / "uploads")
+        Path(directory).mkdir(mode=0o700, parents=True, exist_ok=True)
+        return cls(upload_max_bytes(), int(os.environ.get("UPLOAD_SPOOL_BYTES", 512 * 1024)), directory)
+
+    @property
+    def kind(self):
+        """'pdf' or 'jpg' from the file's leading bytes, None for anything else"""
+        for signature, kind in SIGNATURES:
+            if self._head.startswith(signature):
+                return kind
+        return None
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            self.discard()
+            raise RequestEntityTooLarge(f"Files larger than {self.max_bytes} bytes are not accepted")
+        if len(self._head) < SNIFF_BYTES:
+            self._head += data[:SNIFF_BYTES - len(self._head)]
+        self.sha256.update(data)
+        if self.path is None and self.size > self.spool_bytes:
+            self._rollover()
+        return self._file.write(data)
+
+    def _rollover(self):
+        spooled = tempfile.NamedTemporaryFile(dir=self.directory, prefix="upload-", delete=False)
+        spooled.write(self._file.getbuffer())
+        self._file = spooled
+        self.path = spooled.name
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def readline(self, size=-1):
+        return self._file.readline(size)
+
+    def seek(self, offset, whence=0):
+        return self._file.seek(offset, whence)
+
+    def tell(self):
+        return self._file.tell()
+
+    def flush(self):
+        self._file.flush()
+
+    def source(self):
+        """What the OCR worker opens: the spool file's path, or the bytes of a small upload"""
+        if self.path is not None:
+            self._file.flush()
+            return self.path
+        return self._file.getvalue()
+
+    def detach(self):
+        """Keep the file after the request ends (async jobs); whoever detaches it calls discard()"""
+        self.detached = True
+        return self
+
+    def close(self):
+        """Called when the request is torn down; a detached spool stays until discard()"""
+        if not self.detached:
+            self.discard()
+
+    def discard(self):
+        self._file.close()
+        if self.path is not None:
+            Path(self.path).unlink(missing_ok=True)
+
+
+def _spool(file):
+    """The UploadSpool behind a FileStorage (or the spool itself), None for any other file"""
+    stream = getattr(file, "stream", file)
+    return stream if isinstance(stream, UploadSpool) else None
+
+
+def upload_kind(file):
+    """'pdf' or 'jpg' sniffed from the content, not the filename"""
+    spool = _spool(file)
+    if spool is not None:
+        return spool.kind
+    head = upload_source(file)[:SNIFF_BYTES]
+    return next((kind for signature, kind in SIGNATURES if head.startswith(signature)), None)
+
+
+def upload_source(file):
+    """A path or bytes the OCR stage can open, without reading a spooled upload back into memory"""
+    spool = _spool(file)
+    if spool is not None:
+        return spool.source()
+    if isinstance(file, (bytes, bytearray)):
+        return bytes(file)
+    file.seek(0)
+    return file.read()
+
+
+def upload_digest(file):
+    """sha256 of the upload's content, taken while it was received when possible"""
+    spool = _spool(file)
+    if spool is not None:
+        return spool.sha256.copy()
+    source = upload_source(file)
+    return hashlib.sha256(source)
+
+
+def discard_upload(file):
+    spool = _spool(file)
+    if spool is not None:
+        spool.discard()
@@ -0,0 +1,335 @@
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+
+from services.metrics import REGISTRY, IN_FLIGHT, Gauge
+
+FLUSH_SECONDS = REGISTRY.histogram("write_behind_flush_seconds", "Time to write one batch of queued records")
+FLUSHED_ROWS = REGISTRY.counter("write_behind_rows_total", "Queued records written to the database", ["table"])
+
+
+class WriteBehindFull(Exception):
+    """ Raised when the write-behind queue stayed full for the whole put timeout """
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class WriteBehindQueue:
+    """
+    Bounded queue of rows to insert, written by a background thread in multi-row
+    batches of up to `batch_size`, or every `interval` seconds when fewer are waiting.
+
+    Every row is appended to this process's spool file (WRITE_BEHIND_DIR/<pid>.spool)
+    before it is queued, and a commit marker follows each written batch. Rows of a
+    process that died before writing them are found in its spool by the next process
+    to start the queue, and queued again.
+
+    A batch that fails on a connection error is retried with backoff, for as long as
+    it takes; so is one that fails with any other unexpected error (a connector that
+    cannot create connections, an OSError), so the writer thread never dies with rows
+    queued. One the database rejects, or whose rows cannot be turned into an insert
+    (an unknown table, a bad value), is retried a row at a time, and the rows that
+    still fail go to a .failed file next to the spool instead of blocking the queue.
+
+    Rows stay visible to pending() until they are written, but only in the process
+    that queued them: with several gunicorn workers, a read served by another worker
+    does not see a row still waiting in this one's queue.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, directory, max_size=10000, batch_size=200, interval=0.5, put_timeout=1.0,
+                 fsync=True, max_backoff=30.0):
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.interval = interval
+        self.put_timeout = put_timeout
+        self.fsync = fsync
+        self.max_backoff = max_backoff
+        self.pid = os.getpid()
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._sequence = 0
+        self._flush_through = 0
+        self._spooled_commits = 0
+        self._closed = False
+        self.written = 0
+        self.failed = 0
+        self.retries = 0
+        self.recovered = 0
+
+        self.directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        self.spool_path = self.directory / f"{self.pid}.spool"
+        if self.spool_path.exists():
+            # left by an earlier process that had the same pid
+            os.replace(self.spool_path, self.directory / f"{self.pid}-{uuid.uuid4().hex}.recovering")
+        self._spool = open(self.spool_path, "a", encoding="utf-8")
+        self._recover()
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @classmethod
+    def get_instance(cls):
+        """Get the queue of this process configured from the environment, started on first use"""
+        with cls._lock:
+            # a queue created before a fork belongs to the parent, its thread did not survive
+            if cls._instance is None or cls._instance.pid != os.getpid():
+                cls._instance = cls(
+                    os.environ.get("WRITE_BEHIND_DIR", Path(tempfile.gettempdir()) / "write_behind"),
+                    max_size=int(os.environ.get("WRITE_BEHIND_QUEUE_SIZE", 10000)),
+                    batch_size=int(os.environ.get("WRITE_BEHIND_BATCH", 200)),
+                    interval=float(os.environ.get("WRITE_BEHIND_INTERVAL", 0.5)),
+                    put_timeout=float(os.environ.get("WRITE_BEHIND_PUT_TIMEOUT", 1.0)),
+                    fsync=os.environ.get("WRITE_BEHIND_FSYNC", "1") != "0",
+                )
+                IN_FLIGHT.attach(Gauge(lambda: len(cls._instance._pending)), "write_behind")
+            return cls._instance
+
+    @staticmethod
+    def enabled():
+        """WRITE_BEHIND=0 makes the models write synchronously"""
+        return os.environ.get("WRITE_BEHIND", "1") != "0"
+
+    def put(self, table, row):
+        """Queue a row for `table`; raises WriteBehindFull if there is no room within put_timeout"""
+        deadline = time.monotonic() + self.put_timeout
+        with self._condition:
+            while len(self._pending) >= self.max_size or self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._closed:
+                    raise WriteBehindFull(f"{len(self._pending)} rows waiting to be written")
+                self._condition.wait(remaining)
+            self._append(table, row)
+            self._condition.notify_all()
+
+    def _append(self, table, row):
+        self._sequence += 1
+        entry = {"seq": self._sequence, "table": table, "row": row}
+        self._spool.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._spool.flush()
+        if self.fsync:
+            os.fsync(self._spool.fileno())
+        self._pending.append(entry)
+
+    def pending(self, table):
+        """Rows of `table` not written yet, oldest first"""
+        with self._condition:
+            return [dict(entry["row"]) for entry in self._pending if entry["table"] == table]
+
+    def flush(self, timeout=None):
+        """Wait until every row queued so far is written or set aside; False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            target = self._flush_through = self._sequence
+            self._condition.notify_all()
+            while self._pending and self._pending[0]["seq"] <= target:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def close(self, timeout=10.0):
+        """Write what is queued (what is not stays in the spool for the next process) and stop"""
+        if self._closed:
+            return
+        self.flush(timeout)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+        self._spool.close()
+
+    def stats(self):
+        with self._condition:
+            return {
+                'pending': len(self._pending),
+                'max_size': self.max_size,
+                'written': self.written,
+                'failed': self.failed,
+                'retries': self.retries,
+                'recovered': self.recovered,
+            }
+
+    def _run(self):
+        attempt = 0
+        while True:
+            try:
+                if not self._run_once():
+                    return
+                attempt = 0
+            except Exception:
+                # anything _write does not handle itself: keep the thread, the rows stay queued
+                attempt += 1
+                backoff = min(self.max_backoff, 0.5 * 2 ** attempt)
+                logging.exception(f"Write-behind writer failed, retrying in {backoff:.1f}s")
+                with self._condition:
+                    if self._closed:
+                        return
+                    self._condition.wait(backoff)
+
+    def _run_once(self):
+        """Wait for a batch and write it; False once the queue is closed"""
+        with self._condition:
+            # wait for a full batch, or for the interval to pass since the first row of the batch arrived
+            deadline = None
+            while not self._closed and len(self._pending) < self.batch_size:
+                if self._pending and deadline is None:
+                    deadline = time.monotonic() + self.interval
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and (remaining <= 0 or self._flush_through >= self._pending[0]["seq"]):
+                    break
+                self._condition.wait(remaining)
+            if self._closed:
+                return False
+            batch = [self._pending[i] for i in range(min(self.batch_size, len(self._pending)))]
+
+        if not self._write(batch):
+            return False
+
+        with self._condition:
+            for _ in batch:
+                self._pending.popleft()
+            self._condition.notify_all()
+            self._commit(batch[-1]["seq"])
+        return True
+
+    def _write(self, batch):
+        """
+        Insert the batch, retrying until it is in; rows the database rejects go to the .failed file.
+        Errors other than SQLAlchemy's are retried too, except those of a row that cannot be inserted.
+        Anything that fails before a connection is open (a missing DB_* setting, the connector)
+        says nothing about the rows and is always retried.
+        False if the queue was closed while the database was unreachable.
+        """
+        from sqlalchemy.exc import DBAPIError, SQLAlchemyError
+        from config.database import DatabaseConnection, metadata
+
+        tables = {}
+        for entry in batch:
+            tables.setdefault(entry["table"], []).append(entry["row"])
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            connected = False
+            try:
+                with DatabaseConnection.connection() as connection:
+                    connected = True
+                    for table, rows in tables.items():
+                        connection.execute(metadata.tables[table].insert(), rows)
+                    connection.commit()
+            except Exception as e:
+                if not connected:
+                    connection_error = True
+                elif isinstance(e, SQLAlchemyError):
+                    connection_error = isinstance(e, DBAPIError) and (
+                        e.connection_invalidated or type(e).__name__ in ("OperationalError", "InterfaceError"))
+                else:
+                    # rows that cannot become an insert are rejected like the database would;
+                    # anything else (connector, network, OSError) is retried as if it were down
+                    connection_error = not isinstance(e, (KeyError, TypeError, ValueError))
+                if not connection_error and len(batch) == 1:
+                    logging.error(f"Setting aside a {batch[0]['table']} row the database rejected: {e}")
+                    self._set_aside(batch[0], e)
+                    return True
+                if not connection_error:
+                    logging.warning(f"Batch of {len(batch)} rows rejected, writing them one at a time: {e}")
+                    return all(self._write([entry]) for entry in batch)
+                attempt += 1
+                self.retries += 1
+                backoff = min(self.max_backoff, 0.5 * 2 ** attempt)
+                logging.warning(f"Could not write {len(batch)} queued rows (attempt {attempt}), "
+                                f"retrying in {backoff:.1f}s: {e}")
+                with self._condition:
+                    if self._closed:
+                        return False
+                    self._condition.wait(backoff)
+                continue
+
+            FLUSH_SECONDS.labels().observe(time.perf_counter() - start)
+            for table, rows in tables.items():
+                FLUSHED_ROWS.labels(table).inc(len(rows))
+            with self._condition:
+                self.written += len(batch)
+            return True
+
+    def _set_aside(self, entry, error):
+        self.failed += 1
+        with open(self.directory / f"{self.pid}.failed", "a", encoding="utf-8") as f:
+            f.write(json.dumps({**entry, "error": str(error)}, ensure_ascii=False) + "\n")
+
+    def _commit(self, sequence):
+        """Mark everything up to `sequence` as written; an empty queue starts a new spool"""
+        if not self._pending:
+            self._spool.seek(0)
+            self._spool.truncate()
+            self._spooled_commits = 0
+        else:
+            self._spool.write(json.dumps({"committed": sequence}) + "\n")
+            self._spooled_commits += 1
+            if self._spooled_commits >= 1000:
+                self._rewrite_spool()
+        self._spool.flush()
+
+    def _rewrite_spool(self):
+        """Replace the spool with one holding only the rows still queued"""
+        temporary = self.spool_path.with_suffix(".rewrite")
+        with open(temporary, "w", encoding="utf-8") as f:
+            for entry in self._pending:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._spool.close()
+        os.replace(temporary, self.spool_path)
+        self._spool = open(self.spool_path, "a", encoding="utf-8")
+        self._spooled_commits = 0
+
+    def _recover(self):
+        """Queue again the unwritten rows in the spools of processes that are gone"""
+        for path in sorted(self.directory.glob("*.spool")) + sorted(self.directory.glob("*.recovering")):
+            owner = int(path.name.split(".")[0].split("-")[0])
+            if path == self.spool_path or owner != self.pid and _pid_alive(owner):
+                continue
+            # claimed by renaming, so two processes starting together do not both take it
+            claimed = self.directory / f"{self.pid}-{uuid.uuid4().hex}.recovering"
+            try:
+                os.replace(path, claimed)
+            except FileNotFoundError:
+                continue
+
+            entries, committed = [], 0
+            with open(claimed, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # the last line of a process killed while writing it
+                        continue
+                    if "committed" in record:
+                        committed = max(committed, record["committed"])
+                    else:
+                        entries.append(record)
+            for entry in entries:
+                if entry["seq"] > committed:
+                    self._append(entry["table"], entry["row"])
+                    self.recovered += 1
+            claimed.unlink()
+        if self.recovered:
+            logging.info(f"Queued {self.recovered} rows left unwritten by a previous process")
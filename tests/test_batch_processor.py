@@ -0,0 +1,38 @@
+import json
+
+from services.batch_processor import BatchProcessor
+
+
+def write_lines(path, entries):
+    with open(path, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+
+
+def test_files_that_failed_are_tried_again(tmp_path):
+    output = tmp_path / "results.jsonl"
+    write_lines(output, [
+        {"path": "a/ine.jpg", "session_id": "batch:a", "kind": "jpg", "error": "OCR worker crashed"},
+        {"path": "b/ine.jpg", "session_id": "batch:b", "kind": "jpg",
+         "result": {"first_names": "ANA", "last_names": "LOPEZ"}},
+        {"path": "c/ine.jpg", "session_id": "batch:c", "kind": "jpg", "error": "timeout"},
+        {"path": "c/ine.jpg", "session_id": "batch:c", "kind": "jpg",
+         "result": {"first_names": "LUIS", "last_names": "PEREZ"}},
+    ])
+    done, names = BatchProcessor(output, write_db=False).completed()
+    assert done == {"b/ine.jpg", "c/ine.jpg"}
+    assert names == {"batch:b": "ANA LOPEZ", "batch:c": "LUIS PEREZ"}
+
+
+def test_statement_without_db_uses_the_name_of_an_earlier_run(tmp_path):
+    ine, statement = tmp_path / "ine.jpg", tmp_path / "estado.pdf"
+    ine.write_bytes(b"\xff\xd8\xff\xe0 photo")
+    statement.write_bytes(b"%PDF-1.4 statement")
+    output = tmp_path / "results.jsonl"
+    write_lines(output, [{"path": str(ine), "session_id": "batch:a", "kind": "jpg",
+                          "result": {"first_names": "ANA", "last_names": "LOPEZ"}}])
+    documents = [{"path": str(ine), "session_id": "batch:a"}, {"path": str(statement), "session_id": "batch:a"}]
+
+    processor = BatchProcessor(output, write_db=False)
+    chunks = processor.plan(documents, *processor.completed())
+    assert chunks == [[[{"path": str(statement), "session_id": "batch:a", "full_name": "ANA LOPEZ"}]]]
@@ -0,0 +1,50 @@
+import os
+import threading
+import time
+
+from services.extraction_cache import ExtractionCache
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_sweep_removes_expired_entries_without_new_writes(tmp_path):
+    cache = ExtractionCache(tmp_path, ttl=60)
+    cache.put("old", {"name": "JUAN PEREZ"})
+    cache.put("fresh", {"name": "ANA LOPEZ"})
+    # written two minutes ago, past the ttl
+    old = time.time() - 120
+    os.utime(tmp_path / "old.json", (old, old))
+    cache._memory["old"] = (cache._memory["old"][0], old + cache.ttl)
+
+    cache.start_purge(0.05)
+    try:
+        assert wait_for(lambda: not (tmp_path / "old.json").exists())
+    finally:
+        cache.stop_purge()
+    assert (tmp_path / "fresh.json").exists()
+    assert "old" not in cache._memory
+    assert cache.get("old") is None
+    assert cache.get("fresh") == {"name": "ANA LOPEZ"}
+
+
+def test_concurrent_puts_keep_the_byte_count(tmp_path):
+    cache = ExtractionCache(tmp_path, max_disk_bytes=1024 * 1024)
+    cache.put("first", {"n": 0})
+
+    def write(worker):
+        for i in range(50):
+            cache.put(f"{worker}-{i}", {"n": i})
+
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache._disk_bytes == sum(path.stat().st_size for path in tmp_path.glob("*.json"))
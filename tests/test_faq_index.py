@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from services.faq_index import FAQIndex
+
+ENTRIES = [
+    {"id": "humano", "questions": ["Quiero hablar con un humano", "¿Puedo hablar con una persona?",
+                                   "No quiero hablar con un bot"], "answer": "Un representante le contactará."},
+    {"id": "documentos", "questions": ["¿Qué documentos necesito?", "¿Cuáles son los requisitos?"],
+     "answer": "Su INE y su estado de cuenta."},
+    {"id": "documentos_pdf", "questions": ["¿Qué documentos necesito en PDF?"], "answer": "El estado de cuenta."},
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = tmp_path / "faq.json"
+    path.write_text(json.dumps(ENTRIES), encoding="utf-8")
+    return FAQIndex(path, threshold=0.6, margin=0.05)
+
+
+def test_rephrased_question_is_answered(index):
+    assert index.match("hola, quiero hablar con un humano") == "Un representante le contactará."
+    assert index.best_entry("cuales son los requisitos") == "documentos"
+
+
+def test_threshold(index):
+    score = index.scores("quiero hablar con alguien")["humano"]
+    assert index.best_entry("quiero hablar con alguien", threshold=score - 0.01) == "humano"
+    assert index.best_entry("quiero hablar con alguien", threshold=score + 0.01) is None
+    assert index.match("¿Cuál es la tasa de interés?") is None
+
+
+def test_margin(index):
+    # as close to one entry as to the other, so neither is a confident answer
+    scores = index.scores("que documentos necesito en")
+    assert abs(scores["documentos"] - scores["documentos_pdf"]) < index.margin
+    assert index.best_entry("que documentos necesito en", threshold=0.0) is None
+
+
+def test_negation(index):
+    assert index.scores("no quiero hablar con un humano")["humano"] > 0.9
+    assert index.match("no quiero hablar con un humano") is None
+    assert index.match("nunca quiero hablar con un humano") is None
+    # a phrasing that says no itself still matches a message that does
+    assert index.best_entry("no quiero hablar con un bot") == "humano"
+    # and one that does not is only compared to the phrasings that do not either
+    assert index.scores("quiero hablar con un bot")["humano"] < 0.8
+
+
+def test_stats_count_hits_and_misses(index):
+    index.match("quiero hablar con un humano")
+    index.match("no quiero hablar con un humano")
+    assert (index.stats()["hits"], index.stats()["misses"]) == (1, 1)
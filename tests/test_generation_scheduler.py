@@ -0,0 +1,60 @@
+import asyncio
+import threading
+
+import pytest
+
+from services.generation_scheduler import GenerationQueueTimeout, GenerationScheduler
+
+
+def queued(scheduler):
+    return sum(scheduler.stats()['queued'].values())
+
+
+def test_cancelled_waiters_do_not_fill_the_queue():
+    scheduler = GenerationScheduler(max_concurrent=1, max_queue=2, queue_timeout=5)
+
+    async def scenario():
+        scheduler.acquire('chat')  # the only slot, held for the whole test
+        waiters = [asyncio.create_task(scheduler.acquire_async('chat')) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        assert queued(scheduler) == 2
+        with pytest.raises(GenerationQueueTimeout):
+            await scheduler.acquire_async('chat')
+
+        # both clients disconnect
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        assert queued(scheduler) == 0
+        assert scheduler._queued == 0
+
+        live = asyncio.create_task(scheduler.acquire_async('status'))
+        await asyncio.sleep(0.01)
+        assert queued(scheduler) == 1
+        # the slot skips the cancelled waiters and goes to the live one
+        scheduler.release()
+        await asyncio.wait_for(live, 1)
+        assert scheduler._active == 1 and queued(scheduler) == 0
+
+    asyncio.run(scenario())
+
+
+def test_timed_out_waiter_frees_its_place():
+    scheduler = GenerationScheduler(max_concurrent=1, max_queue=1, queue_timeout=0.05)
+    scheduler.acquire('chat')
+    with pytest.raises(GenerationQueueTimeout):
+        scheduler.acquire('chat')
+    assert scheduler._queued == 0
+
+    granted = threading.Event()
+    scheduler.queue_timeout = 5
+
+    def wait():
+        scheduler.acquire('greeting')
+        granted.set()
+    thread = threading.Thread(target=wait)
+    thread.start()
+    scheduler.release()
+    thread.join(1)
+    assert granted.is_set()
+
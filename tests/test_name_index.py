@@ -0,0 +1,41 @@
+import pytest
+
+from services.localOCRService import split_name_words
+from services.name_index import NameIndex
+
+FIRSTS = ["HUGO", "ANGEL", "TANIA", "ALVARO", "MARTA", "NUBIA", "MARIA", "JOSE"]
+LASTS = ["LUGO", "RANGEL", "TAPIA", "ALFARO", "MATA", "ZUBIA", "LOPEZ", "GARCIA"]
+
+
+@pytest.fixture
+def names(tmp_path):
+    (tmp_path / "firsts.txt").write_text("\n".join(FIRSTS) + "\n", encoding="utf-8")
+    (tmp_path / "lasts.txt").write_text("\n".join(LASTS) + "\n", encoding="utf-8")
+    return NameIndex(data_dir=tmp_path)
+
+
+@pytest.mark.parametrize("first, last", [
+    ("HUGO", "LUGO"), ("ANGEL", "RANGEL"), ("TANIA", "TAPIA"),
+    ("ALVARO", "ALFARO"), ("MARTA", "MATA"), ("NUBIA", "ZUBIA"),
+])
+def test_exact_names_keep_their_category(names, first, last):
+    assert names.classify(first) == (first, True, False)
+    assert names.classify(last) == (last, False, True)
+
+
+def test_surnames_are_not_rewritten_into_first_names(names):
+    assert split_name_words("HUGO RANGEL TAPIA".split(), names) == ("HUGO", "RANGEL TAPIA")
+    assert split_name_words("MARTA ALFARO MATA".split(), names) == ("MARTA", "ALFARO MATA")
+    assert split_name_words("NUBIA LUGO ZUBIA".split(), names) == ("NUBIA", "LUGO ZUBIA")
+
+
+def test_ocr_noise_is_matched_to_one_category(names):
+    assert names.classify("L0PEZ") == ("LOPEZ", False, True)
+    assert names.classify("GARClA") == ("GARCIA", False, True)
+    assert names.classify("MARlA") == ("MARIA", True, False)
+    assert split_name_words("J0SE GARClA L0PEZ".split(), names) == ("JOSE", "GARCIA LOPEZ")
+
+
+def test_unknown_words_are_dropped(names):
+    assert names.classify("NOMBRE") is None
+    assert split_name_words("NOMBRE HUGO SEXO H".split(), names) == ("HUGO", "")
@@ -0,0 +1,99 @@
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from ollama import ResponseError
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+
+from fake_ollama import FakeOllama  # noqa: E402
+from services.ollama_pool import BackendUnavailable, OllamaPool  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "Hola"}]
+
+
+@pytest.fixture
+def servers():
+    fakes = [FakeOllama(token_delay=0).start() for _ in range(2)]
+    yield fakes
+    for fake in fakes:
+        fake.stop()
+
+
+def make_pool(servers, **options):
+    # health checks are run by hand so the tests decide when a backend comes back
+    return OllamaPool([fake.url for fake in servers], health_interval=0, **options)
+
+
+def test_calls_go_to_the_backend_with_fewest_outstanding(servers):
+    pool = make_pool(servers, max_concurrency=0)
+    first = pool.acquire()
+    second = pool.acquire()
+    assert first is not second
+    pool.release(first)
+    assert pool.acquire() is first
+
+    pool.release(first)
+    pool.release(second)
+    for _ in range(4):
+        pool.chat(model="llama3.1", messages=MESSAGES)
+    assert [fake.requests for fake in servers] == [2, 2]
+
+
+def test_failing_backend_is_ejected_and_recovers(servers):
+    failing, healthy = servers
+    failing.fail = True
+    pool = make_pool(servers, max_concurrency=0, eject_seconds=60)
+
+    # the first call lands on the failing backend and is retried on the other one
+    assert pool.chat(model="llama3.1", messages=MESSAGES)["message"]["content"]
+    for _ in range(3):
+        pool.chat(model="llama3.1", messages=MESSAGES)
+    assert healthy.requests == 4
+    assert [backend["healthy"] for backend in pool.stats()["backends"]] == [False, True]
+
+    # still down: the health check keeps it out
+    assert pool.check_health()
+    failing.fail = False
+    assert not pool.check_health()
+    pool.chat(model="llama3.1", messages=MESSAGES)
+    assert failing.requests == 1
+    assert [backend["healthy"] for backend in pool.stats()["backends"]] == [True, True]
+
+
+def test_every_backend_down_is_reported(servers):
+    for fake in servers:
+        fake.fail = True
+    pool = make_pool(servers)
+    with pytest.raises(ResponseError):
+        pool.chat(model="llama3.1", messages=MESSAGES)
+    with pytest.raises(BackendUnavailable):
+        pool.acquire()
+
+
+def test_async_waiter_wakes_on_release(servers):
+    pool = make_pool(servers[:1], max_concurrency=1, acquire_timeout=5)
+    busy = pool.acquire()
+
+    async def wait_for_backend():
+        release = threading.Timer(0.05, pool.release, args=(busy,))
+        release.start()
+        start = time.monotonic()
+        backend = await pool.acquire_async()
+        return backend, time.monotonic() - start
+
+    backend, waited = asyncio.run(wait_for_backend())
+    assert backend is busy
+    assert waited < 1
+    assert not pool._async_waiters
+
+
+def test_async_waiter_times_out(servers):
+    pool = make_pool(servers[:1], max_concurrency=1, acquire_timeout=0.1)
+    pool.acquire()
+    with pytest.raises(BackendUnavailable):
+        asyncio.run(pool.acquire_async())
+    assert not pool._async_waiters
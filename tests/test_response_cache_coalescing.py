@@ -0,0 +1,71 @@
+import asyncio
+import threading
+
+import pytest
+
+from services.ai_service import Ollama
+from services.async_ai_service import AsyncOllama
+from services.generation_scheduler import GenerationScheduler
+from services.response_cache import ResponseCache
+
+
+@pytest.fixture
+def scheduler_and_cache(monkeypatch):
+    scheduler = GenerationScheduler(max_concurrent=4, queue_timeout=5)
+    cache = ResponseCache(variants=3)
+    monkeypatch.setattr(GenerationScheduler, "_instance", scheduler)
+    monkeypatch.setattr(ResponseCache, "_instance", cache)
+    return scheduler, cache
+
+
+def test_coalesced_readers_cache_one_variant(scheduler_and_cache, monkeypatch):
+    scheduler, cache = scheduler_and_cache
+    calls = []
+    release = threading.Event()
+
+    def chat_stream(self, messages, options):
+        calls.append(messages)
+        release.wait(5)
+        yield "Buen día, "
+        yield "le ayudo con su crédito."
+    monkeypatch.setattr(Ollama, "chat_stream", chat_stream)
+    monkeypatch.setattr(Ollama, "__init__", lambda self: setattr(self, "temperature", 0.1))
+
+    replies = []
+    threads = [threading.Thread(target=lambda: replies.append("".join(Ollama().initial_greeting_stream())))
+               for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    while scheduler.coalesced < 2:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert replies == ["Buen día, le ayudo con su crédito."] * 3
+    (entry,) = cache._entries.values()
+    assert entry['variants'] == ["Buen día, le ayudo con su crédito."]
+
+
+def test_coalesced_async_readers_cache_one_variant(scheduler_and_cache, monkeypatch):
+    scheduler, cache = scheduler_and_cache
+    calls = []
+
+    async def chat_stream(self, messages, options):
+        calls.append(messages)
+        await asyncio.sleep(0.05)
+        yield "Buen día."
+    monkeypatch.setattr(AsyncOllama, "chat_stream", chat_stream)
+    monkeypatch.setattr(AsyncOllama, "__init__", lambda self: setattr(self, "temperature", 0.1))
+
+    async def greet():
+        return "".join([chunk async for chunk in AsyncOllama().initial_greeting_stream()])
+
+    async def scenario():
+        return await asyncio.gather(*(greet() for _ in range(3)))
+
+    assert asyncio.run(scenario()) == ["Buen día."] * 3
+    assert len(calls) == 1
+    (entry,) = cache._entries.values()
+    assert entry['variants'] == ["Buen día."]
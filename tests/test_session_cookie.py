@@ -0,0 +1,32 @@
+from flask import Flask
+
+from routes.ai_routes import SESSION_COOKIE, SESSION_HEADER, get_session_id, remember_session
+
+
+def make_client():
+    app = Flask(__name__)
+    app.after_request(remember_session)
+
+    @app.post("/chat")
+    def chat():
+        session_id = get_session_id({})
+        return {"session_id": session_id}, 200, {SESSION_HEADER: session_id}
+
+    return app.test_client()
+
+
+def test_issued_id_comes_back_in_the_cookie():
+    client = make_client()
+    first = client.post("/chat", json={}).get_json()["session_id"]
+    assert client.get_cookie(SESSION_COOKIE).value == first
+
+    # a client that ignores the header keeps its session through the cookie
+    assert client.post("/chat", json={}).get_json()["session_id"] == first
+
+
+def test_header_wins_over_the_cookie():
+    client = make_client()
+    client.post("/chat", json={})
+    response = client.post("/chat", json={}, headers={SESSION_HEADER: "from-header"})
+    assert response.get_json()["session_id"] == "from-header"
+    assert client.get_cookie(SESSION_COOKIE).value == "from-header"
@@ -0,0 +1,57 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services.file_tracker import FileTracker
+from services.session_store import InMemorySessionBackend, SQLiteSessionBackend, SessionStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        backend = SQLiteSessionBackend(str(tmp_path / "sessions.db"))
+    else:
+        # few stripes, so concurrent sessions share locks
+        backend = InMemorySessionBackend(stripes=4)
+    return SessionStore(backend, ttl=60)
+
+
+def upload(store, session_id, kinds):
+    tracker = FileTracker(session_id, store=store)
+    for kind in kinds:
+        tracker.set_jpg() if kind == "jpg" else tracker.set_pdf()
+        time.sleep(random.random() / 1000)
+
+
+def test_parallel_sessions_keep_their_own_upload_state(store):
+    rng = random.Random(3)
+    plan = {f"s{i}": rng.choice([["jpg"], ["pdf"], ["jpg", "pdf"], ["pdf", "jpg"], []]) for i in range(200)}
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(lambda item: upload(store, *item), plan.items()))
+
+    for session_id, kinds in plan.items():
+        tracker = FileTracker(session_id, store=store)
+        assert tracker.get_jpg_status() == ("jpg" in kinds), session_id
+        assert tracker.get_pdf_status() == ("pdf" in kinds), session_id
+
+
+def test_concurrent_updates_of_one_session_are_not_lost(store):
+    def increment(_):
+        store.update("shared", lambda state: {"count": (state or {}).get("count", 0) + 1})
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(increment, range(400)))
+    assert store.get("shared") == {"count": 400}
+
+
+def test_expired_sessions_are_gone(store):
+    store.ttl = 0.05
+    store.update("old", lambda state: {"has_jpg_file": True})
+    store.ttl = 60
+    store.update("fresh", lambda state: {"has_pdf_file": True})
+    time.sleep(0.1)
+    assert store.backend.evict_expired() == 1
+    assert store.get("old") is None
+    assert store.get("fresh") == {"has_pdf_file": True}
@@ -0,0 +1,96 @@
+import json
+
+import pytest
+import sqlalchemy
+
+from config.database import DatabaseConnection
+from services.write_behind import WriteBehindQueue
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    monkeypatch.setenv("DB_BACKEND", "sqlite")
+    monkeypatch.setenv("DB_URL", f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setattr(DatabaseConnection, "_engine", None)
+    yield DatabaseConnection.get_engine()
+    DatabaseConnection._engine.dispose()
+
+
+@pytest.fixture
+def queue(tmp_path, database):
+    queue = WriteBehindQueue(tmp_path / "write_behind", interval=0.01, fsync=False, max_backoff=0.05)
+    yield queue
+    queue.close(timeout=5)
+
+
+def names(engine):
+    with engine.connect() as connection:
+        return [row[0] for row in connection.execute(sqlalchemy.text("SELECT full_name FROM id_records"))]
+
+
+def row(name):
+    return {"full_name": name, "address": "", "session_id": name}
+
+
+def test_non_sqlalchemy_error_is_retried(queue, database, monkeypatch):
+    connection = DatabaseConnection.connection.__func__
+    failures = [OSError("connector could not reach the instance"), RuntimeError("creator failed")]
+
+    def flaky(cls):
+        if failures:
+            raise failures.pop(0)
+        return connection(cls)
+    monkeypatch.setattr(DatabaseConnection, "connection", classmethod(flaky))
+
+    queue.put("id_records", row("ANA"))
+    assert queue.flush(timeout=5)
+    assert names(database) == ["ANA"]
+    assert queue.stats()["retries"] == 2
+    assert queue._thread.is_alive()
+
+
+def test_missing_database_setting_is_not_a_row_error(queue, database, monkeypatch):
+    connection = DatabaseConnection.connection.__func__
+    failures = [KeyError("DB_USER"), KeyError("INSTANCE_CONNECTION_NAME")]
+
+    def unconfigured(cls):
+        if failures:
+            raise failures.pop(0)
+        return connection(cls)
+    monkeypatch.setattr(DatabaseConnection, "connection", classmethod(unconfigured))
+
+    queue.put("id_records", row("ANA"))
+    assert queue.flush(timeout=5)
+    assert names(database) == ["ANA"]
+    assert queue.stats()["failed"] == 0
+    assert queue.stats()["retries"] == 2
+
+
+def test_writer_survives_an_error_outside_the_insert(queue, database, monkeypatch):
+    commit = queue._commit
+    failures = [OSError("spool disk full")]
+
+    def failing_commit(sequence):
+        if failures:
+            raise failures.pop(0)
+        commit(sequence)
+    monkeypatch.setattr(queue, "_commit", failing_commit)
+
+    queue.put("id_records", row("ANA"))
+    assert queue.flush(timeout=5)
+    queue.put("id_records", row("LUIS"))
+    assert queue.flush(timeout=5)
+    assert queue._thread.is_alive()
+    assert names(database) == ["ANA", "LUIS"]
+
+
+def test_row_that_cannot_be_inserted_is_set_aside(queue, database):
+    queue.put("id_records", row("ANA"))
+    queue.put("no_such_table", row("LUIS"))
+    queue.put("id_records", row("EVA"))
+    assert queue.flush(timeout=5)
+
+    assert sorted(names(database)) == ["ANA", "EVA"]
+    assert queue.stats()["failed"] == 1
+    failed = [json.loads(line) for line in open(queue.directory / f"{queue.pid}.failed", encoding="utf-8")]
+    assert failed[0]["table"] == "no_such_table"